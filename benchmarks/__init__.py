@@ -0,0 +1,3 @@
+"""
+估值工具的效能基準測試（python -m benchmarks）。
+"""
@@ -0,0 +1,313 @@
+"""
+基準測試用的合成資料，以及取代公開資訊觀測站、維基百科、Goodinfo! 與 yfinance 的離線替身。
+所有資料皆以固定亂數種子產生，每次執行結果相同。
+"""
+import contextlib
+
+import numpy as np
+
+_TW_NAME_CHARS = list("台積電鴻海聯發科中華信國泰富邦玉山兆豐統一大立光華碩廣達緯創仁寶和碩宏碁友達群創南亞塑化鋼鐵台泥亞泥長榮陽明萬海")
+_US_NAME_WORDS = [
+    "Apple", "Micro", "Global", "United", "American", "Energy", "Systems", "Health", "Capital", "Digital",
+    "Pacific", "First", "National", "General", "Dynamics", "Networks", "Foods", "Motors", "Bank", "Semiconductor",
+]
+_US_NAME_SUFFIXES = ["Inc.", "Corp.", "Holdings", "Group", "Co."]
+
+# 合成公式使用的輸入欄位
+FORMULA_INPUT_FIELDS = [f"x{i}" for i in range(20)]
+_FORMULA_TEMPLATES = [
+    "{a} * {b} if {a} and {b} else None",
+    "({a} + {b}) / 2 if {a} is not None and {b} is not None else None",
+    "{a} / {b} if {a} and {b} else None",
+    "{a} * 1.05 ** 3 - {b} if {a} is not None and {b} is not None else None",
+]
+
+
+def synthetic_universe(n, seed=0):
+    """
+    產生 n 檔股票的合成清單（約四成台股、六成美股），回傳 (taiwan_df, us_df)，欄位同股票清單快照。
+    """
+    import pandas as pd
+
+    from valuation_core.search import TW_STOCK_COLUMNS, US_STOCK_COLUMNS
+
+    rng = np.random.default_rng(seed)
+    n_tw = int(n * 0.4)
+    n_us = n - n_tw
+    tw_codes = [str(1000 + i) for i in range(n_tw)]
+    tw_names = ["".join(rng.choice(_TW_NAME_CHARS, size=rng.integers(2, 5))) for _ in range(n_tw)]
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    us_codes = set()
+    while len(us_codes) < n_us:
+        us_codes.add("".join(rng.choice(letters, size=rng.integers(1, 6))))
+    us_names = [
+        " ".join(list(rng.choice(_US_NAME_WORDS, size=rng.integers(1, 4))) + [str(rng.choice(_US_NAME_SUFFIXES))])
+        for _ in range(n_us)
+    ]
+    taiwan_df = pd.DataFrame({TW_STOCK_COLUMNS[0]: tw_codes, TW_STOCK_COLUMNS[1]: tw_names})
+    us_df = pd.DataFrame({US_STOCK_COLUMNS[0]: sorted(us_codes), US_STOCK_COLUMNS[1]: us_names})
+    return taiwan_df, us_df
+
+
+def search_queries(taiwan_df, us_df, seed=0):
+    """
+    由合成清單取出具代表性的搜尋關鍵字：代號前綴、名稱片段，以及打錯字的英文名稱（模糊比對）。
+    """
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(20):
+        code = taiwan_df.iloc[rng.integers(len(taiwan_df))]["股票代號"]
+        name = taiwan_df.iloc[rng.integers(len(taiwan_df))]["公司名稱"]
+        us_name = us_df.iloc[rng.integers(len(us_df))]["Name"]
+        word = us_name.split()[0]
+        queries += [
+            ("台股", code[:2]), ("台股", name[:2]),
+            ("美股", us_df.iloc[rng.integers(len(us_df))]["Symbol"][:2]),
+            ("美股", word[:-1] + "x" if len(word) > 3 else word),
+        ]
+    return queries
+
+
+def synthetic_formulas(n, seed=0):
+    """
+    產生 n 條公式的合成公式集：每條公式依賴輸入欄位或較早的公式，形狀與專業版預設公式相近。
+    """
+    rng = np.random.default_rng(seed)
+    formulas = {}
+    for i in range(n):
+        names = FORMULA_INPUT_FIELDS + list(formulas)
+        # 偏向依賴最近的公式，讓依賴鏈有一定深度
+        recent = names[-min(len(names), 40):]
+        a, b = rng.choice(recent, size=2, replace=False)
+        template = _FORMULA_TEMPLATES[rng.integers(len(_FORMULA_TEMPLATES))]
+        formulas[f"m{i}"] = template.format(a=a, b=b)
+    return formulas
+
+
+def synthetic_inputs(seed=0, n_rows=None):
+    """
+    合成公式的輸入值：n_rows 為 None 時回傳純量 dict，否則回傳每欄一個陣列（約 5% 缺值）。
+    """
+    rng = np.random.default_rng(seed)
+    if n_rows is None:
+        return {k: float(rng.uniform(1, 100)) for k in FORMULA_INPUT_FIELDS}
+    columns = {}
+    for k in FORMULA_INPUT_FIELDS:
+        col = rng.uniform(1, 100, n_rows)
+        col[rng.random(n_rows) < 0.05] = np.nan
+        columns[k] = col
+    return columns
+
+
+def bond_book(n, seed=0):
+    """
+    產生 n 檔債券的合成部位，欄位同專業版債券欄位（殖利率以市價反推）。
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    face = np.full(n, 100.0)
+    coupon = np.round(rng.uniform(0, 8, n), 3)
+    freq = rng.choice([1.0, 2.0, 4.0], size=n)
+    years = rng.integers(1, 31, n).astype(float)
+    ytm = rng.uniform(0.5, 9, n)
+    from valuation_core import bond_price
+
+    return pd.DataFrame({
+        "bond_face_value": face, "bond_coupon_rate": coupon, "bond_coupon_freq": freq, "bond_years": years,
+        "bond_market_price": bond_price(face, coupon, freq, years, ytm),
+    })
+
+
+def screener_fundamentals(n, seed=0):
+    """
+    產生 n 檔股票的合成選股快照（欄位同 ScreenerStore 的快照，約 5% 缺值）。
+    """
+    from valuation_core.screener import SCREENER_FIELDS, universe_tickers
+
+    rng = np.random.default_rng(seed)
+    taiwan_df, us_df = synthetic_universe(n, seed)
+    df = universe_tickers(taiwan_df, us_df)
+    eps = rng.normal(5, 4, n)
+    bvps = rng.uniform(-5, 80, n)
+    price = rng.uniform(5, 800, n)
+    values = {
+        "currentPrice": price, "trailingPE": np.where(eps > 0, price / eps, np.nan), "trailingEps": eps,
+        "bookValue": bvps, "priceToBook": price / bvps, "dividendRate": rng.uniform(0, 20, n),
+        "fiveYearAvgDividendYield": rng.uniform(0, 8, n), "pegRatio": rng.normal(1.5, 1, n),
+    }
+    for field in SCREENER_FIELDS:
+        column = values[field]
+        column[rng.random(n) < 0.05] = np.nan
+        df[field] = column
+    df["fetched_at"] = 0.0
+    return df
+
+
+# --- 離線替身（取代網路資料來源）---
+def mops_html(n):
+    """
+    公開資訊觀測站公司清單頁面（n 家公司）。
+    """
+    taiwan_df, _ = synthetic_universe(int(n / 0.4) + 1)
+    rows = "".join(f"<tr><td>{c}</td><td>{name}</td><td>半導體業</td></tr>" for c, name in taiwan_df.head(n).itertuples(index=False))
+    return f"<table><tr><th>公司代號</th><th>公司名稱</th><th>產業類別</th></tr>{rows}</table>"
+
+
+def wikipedia_html(n):
+    """
+    維基百科 S&P 500 成分股頁面（n 家公司）。
+    """
+    _, us_df = synthetic_universe(int(n / 0.6) + 1)
+    rows = "".join(f"<tr><td>{s}</td><td>{name}</td><td>Information Technology</td></tr>" for s, name in us_df.head(n).itertuples(index=False))
+    return (
+        "<table class='wikitable'><thead><tr><th>Symbol</th><th>Security</th><th>GICS Sector</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>"
+    )
+
+
+def goodinfo_html(years=30, latest=2025):
+    """
+    Goodinfo! 股利政策頁面（latest 年起往前 years 年，多層標題：現金/股票股利各分盈餘、公積、合計）。
+    """
+    rows = []
+    for i in range(years):
+        cash = 10 + (years - i) * 0.5
+        stock = "-" if i % 3 else "0.5"
+        rows.append(
+            f"<tr><td>{latest - i}</td><td>{cash:.2f}</td><td>0</td><td>{cash:.2f}</td>"
+            f"<td>{stock}</td><td>-</td><td>{stock}</td><td>{cash * 1.6:.2f}</td></tr>"
+        )
+    return (
+        '<table class="b1 p4_2 r10 box_shadow"><thead>'
+        "<tr><th rowspan=2>股利發放年度</th><th colspan=3>現金股利</th><th colspan=3>股票股利</th><th rowspan=2>EPS(元)</th></tr>"
+        "<tr><th>盈餘</th><th>公積</th><th>合計</th><th>盈餘</th><th>公積</th><th>合計</th></tr>"
+        f"</thead><tbody>{''.join(rows)}</tbody></table>"
+    )
+
+
+def price_bars(start=None, end=None, first_date="2000-01-03", seed=0):
+    """
+    合成日線（自 first_date 起每個工作日一筆的隨機漫步），取 [start, end] 區間；欄位同 fetch_price_bars。
+    """
+    import pandas as pd
+
+    last = np.datetime64(pd.Timestamp(end or pd.Timestamp.today()).date(), "D")
+    days = np.arange(np.datetime64(first_date, "D"), last + 1)
+    dates = pd.DatetimeIndex(days[np.is_busday(days)].astype("datetime64[ns]"))
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(dates))))
+    bars = pd.DataFrame({
+        "date": dates, "open": close * 0.995, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.integers(1_000, 1_000_000, len(dates)),
+    })
+    if start is not None:
+        bars = bars[bars["date"] >= pd.Timestamp(start)]
+    return bars.reset_index(drop=True)
+
+
+def per_share_statements(first_year=2000, last_year=2025):
+    """
+    合成的每股盈餘/每股淨值歷史（每季一筆），欄位同 fetch_per_share_statements。
+    """
+    import pandas as pd
+
+    dates = pd.date_range(f"{first_year}-03-31", f"{last_year}-12-31", freq="QE")
+    trend = np.linspace(1, 4, len(dates))
+    return pd.DataFrame({"date": dates, "eps": 5 * trend, "bvps": 30 * trend})
+
+
+def financial_statements(last_year=2025):
+    """
+    合成的年度（五年）與季度（八季）財報，格式同 fetch_financial_statements：列為會計科目、欄為期末日期（由新到舊）。
+    """
+    import pandas as pd
+
+    def frame(rows, dates, scale):
+        growth = 1.08 ** np.arange(len(dates))
+        return pd.DataFrame({d: [v * scale * g for v in rows.values()] for d, g in zip(dates, growth)}, index=list(rows)).iloc[:, ::-1]
+
+    income = {"Total Revenue": 2.0e12, "EBITDA": 1.1e12, "EBIT": 8.0e11, "Net Income": 7.0e11, "Diluted EPS": 27.0, "Tax Rate For Calcs": 0.15}
+    balance = {
+        "Stockholders Equity": 3.0e12, "Total Assets": 5.0e12, "Total Liabilities Net Minority Interest": 2.0e12,
+        "Cash And Cash Equivalents": 1.5e12, "Total Debt": 9.0e11, "Ordinary Shares Number": 2.6e10, "Invested Capital": 3.9e12,
+    }
+    cashflow = {"Operating Cash Flow": 1.2e12, "Capital Expenditure": -6.0e11, "Free Cash Flow": 6.0e11}
+    annual = pd.date_range(f"{last_year - 4}-12-31", periods=5, freq="YE")
+    quarterly = pd.date_range(f"{last_year - 1}-03-31", periods=8, freq="QE")
+    return {
+        "income": frame(income, annual, 1), "balance": frame(balance, annual, 1), "cashflow": frame(cashflow, annual, 1),
+        "quarterly_income": frame({k: v if k == "Tax Rate For Calcs" else v / 4 for k, v in income.items()}, quarterly, 1),
+        "quarterly_balance": frame(balance, quarterly, 1),
+        "quarterly_cashflow": frame(cashflow, quarterly, 0.25),
+    }
+
+
+STOCK_INFO = {
+    "currentPrice": 1000.0, "regularMarketPrice": 1000.0, "trailingEps": 40.0, "trailingPE": 25.0, "bookValue": 150.0,
+    "priceToBook": 6.6, "dividendYield": 0.018, "pegRatio": 1.1, "priceToSalesTrailing12Months": 8.0,
+    "revenuePerShare": 120.0, "dividendRate": 18.0, "fiveYearAvgDividendYield": 2.0, "longName": "Offline Co",
+}
+
+
+class OfflineResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.encoding = "utf-8"
+        self.status_code = 200
+
+
+class OfflineSession:
+    """
+    取代 HTTP Session：依網址回傳預先產生的頁面，並記錄呼叫次數。
+    """
+
+    def __init__(self, universe_size=1000):
+        self.pages = {
+            "mops": mops_html(universe_size),
+            "wikipedia": wikipedia_html(min(universe_size, 503)),
+            "goodinfo": goodinfo_html(),
+        }
+        self.calls = 0
+
+    def _respond(self, url):
+        self.calls += 1
+        for key, page in self.pages.items():
+            if key in url:
+                return OfflineResponse(page)
+        return OfflineResponse("")
+
+    def get(self, url, **kwargs):
+        return self._respond(url)
+
+    def post(self, url, **kwargs):
+        return self._respond(url)
+
+
+@contextlib.contextmanager
+def offline_market_data(universe_size=1000):
+    """
+    在此區塊內，valuation_core.market_data 改用離線替身（網頁、yfinance 的股票資訊、日線與財報），並使用全新的資料快取。
+    """
+    from valuation_core import market_data
+
+    session = OfflineSession(universe_size)
+    patched = {
+        "get_http_session": lambda: session,
+        "fetch_stock_info": lambda ticker: dict(STOCK_INFO),
+        "_fetch_price_fields": lambda ticker, fundamentals: {"currentPrice": STOCK_INFO["currentPrice"]},
+        "fetch_price_bars": lambda ticker, start=None: price_bars(start),
+        "fetch_per_share_statements": lambda ticker: per_share_statements(),
+        "fetch_financial_statements": lambda ticker: financial_statements(),
+    }
+    original = {name: getattr(market_data, name) for name in patched}
+    for name, func in patched.items():
+        setattr(market_data, name, func)
+    market_data.get_data_caches.cache_clear()
+    try:
+        yield session
+    finally:
+        for name, func in original.items():
+            setattr(market_data, name, func)
+        market_data.get_data_caches.cache_clear()
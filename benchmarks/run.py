@@ -0,0 +1,594 @@
+"""
+效能基準測試：公式計算、股票搜尋、債券計算、實質選擇權、DCF、圖表、批次選股、同業倍數、財報帶入、預先抓取、市場資料解析與歷史股價。
+
+    python -m benchmarks                      # 執行全部並與 benchmarks/baseline.json 比較
+    python -m benchmarks --quick              # 略過最大的資料規模
+    python -m benchmarks --filter search      # 只執行名稱包含 search 的項目
+    python -m benchmarks --save-baseline      # 將本次結果存為基準
+
+每個項目先暖機一次，再逐次計時（至少 --min-time 秒或 --max-iters 次），回報延遲百分位數；
+另以 tracemalloc 單獨執行一次量測記憶體峰值。網路資料來源一律使用 fixtures 中的離線替身。
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from . import fixtures
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PERCENTILES = (50, 95, 99)
+MIN_ITERS = 3
+
+UNIVERSE_SIZES = (1_000, 10_000, 100_000)
+FORMULA_SET_SIZES = (30, 300, 3_000)
+BOND_BOOK_SIZE = 10_000
+BATCH_ROWS = 10_000
+OPTION_BOOK_SIZE = 10_000
+DCF_YEARS = 30
+SCENARIO_COUNT = 50
+REFRESH_SIZES = (1_000, 10_000)
+SCREENER_SIZES = (3_000, 100_000)
+PEER_COUNT = 1_000
+
+
+# --- 測試項目 ---
+# 每個項目為 (名稱, setup)；setup(stack) 準備資料並回傳要計時的無引數函式，需要離線替身者以 stack 進入其 context。
+def _search_cases(sizes):
+    from valuation_core import SymbolIndex
+
+    for n in sizes:
+        def setup_build(stack, n=n):
+            taiwan_df, us_df = fixtures.synthetic_universe(n)
+            return lambda: SymbolIndex(taiwan_df, us_df)
+
+        def setup_query(stack, n=n):
+            taiwan_df, us_df = fixtures.synthetic_universe(n)
+            index = SymbolIndex(taiwan_df, us_df)
+            queries = itertools.cycle(fixtures.search_queries(taiwan_df, us_df))
+
+            def run():
+                market, keyword = next(queries)
+                return index.search(keyword, market)
+            return run
+
+        def setup_frame(stack, n=n):
+            taiwan_df, us_df = fixtures.synthetic_universe(n)
+            index = SymbolIndex(taiwan_df, us_df)
+            queries = itertools.cycle(fixtures.search_queries(taiwan_df, us_df))
+
+            def run():
+                market, keyword = next(queries)
+                return index.search_frame(keyword, market)
+            return run
+
+        yield f"search.build[{n}]", setup_build
+        yield f"search.query[{n}]", setup_query
+        yield f"search.search_symbol[{n}]", setup_frame
+
+
+def _formula_cases(sizes):
+    from valuation_core import FormulaEngine, compile_formula, topo_evaluate, validate_formulas
+
+    for n in sizes:
+        def setup_topo(stack, n=n):
+            formulas = fixtures.synthetic_formulas(n)
+            inputs = fixtures.synthetic_inputs()
+            return lambda: topo_evaluate(formulas, inputs)
+
+        def setup_incremental(stack, n=n):
+            engine = FormulaEngine(fixtures.synthetic_formulas(n))
+            inputs = fixtures.synthetic_inputs()
+            values = itertools.cycle([inputs["x0"], inputs["x0"] * 1.01])
+
+            def run():
+                inputs["x0"] = next(values)
+                return engine.evaluate(inputs)
+            return run
+
+        def setup_batch(stack, n=n):
+            engine = FormulaEngine(fixtures.synthetic_formulas(n))
+            columns = fixtures.synthetic_inputs(n_rows=BATCH_ROWS)
+            return lambda: engine.evaluate_batch(columns, BATCH_ROWS)
+
+        def setup_validate(stack, n=n):
+            formulas = fixtures.synthetic_formulas(n)
+
+            def run():
+                # 儲存公式時的檢查與編譯（不使用快取）
+                compile_formula.cache_clear()
+                return validate_formulas(formulas)
+            return run
+
+        yield f"formulas.validate[{n}]", setup_validate
+        yield f"formulas.topo_evaluate[{n}]", setup_topo
+        yield f"formulas.incremental[{n}]", setup_incremental
+        yield f"formulas.batch[{n}x{BATCH_ROWS}]", setup_batch
+
+
+def _scenario_cases():
+    from valuation_core import DEFAULT_FIELDS, DEFAULT_FORMULAS, DEFAULT_METHODS, FormulaEngine, ScenarioSet, scenarios
+
+    keys = [f["key"] for f in DEFAULT_FIELDS]
+    rng = np.random.default_rng(0)
+    bond = {"bond_face_value": 100.0, "bond_coupon_rate": 5.0, "bond_coupon_freq": 2.0, "bond_years": 10.0, "bond_ytm": 6.0}
+    # 實質選擇權使用合理的輸入；類型與期數為設定值，不隨情境變動，LSM 路徑數留空（與預設一樣不執行蒙地卡羅）
+    option = {
+        "option_underlying": 100.0, "option_strike": 100.0, "option_years": 1.0, "option_risk_free": 2.0,
+        "option_volatility": 30.0, "option_yield": 0.0, "option_type": 1.0, "option_steps": 200.0, "option_paths": np.nan,
+    }
+    fixed = np.array([k in ("option_type", "option_steps", "option_paths") for k in keys])
+    base = np.array([{**bond, **option}.get(k, 50.0) for k in keys])
+
+    def scenario_set(n):
+        # 各情境為同一組輸入上下變動 ±20%
+        scenario_set = ScenarioSet(keys)
+        for i in range(n):
+            scenario_set.save(f"情境{i}", base * np.where(fixed, 1.0, rng.uniform(0.8, 1.2, len(keys))))
+        return scenario_set
+
+    def setup_switch(stack, cached):
+        engine = FormulaEngine(DEFAULT_FORMULAS)
+        saved = scenario_set(2)
+        values = itertools.cycle([saved.get(name) for name in saved.names])
+
+        def run():
+            if not cached:
+                scenarios._results_cache.clear()
+            return scenarios.evaluate_inputs(engine, keys, next(values))
+        return run
+
+    def setup_compare(stack):
+        engine = FormulaEngine(DEFAULT_FORMULAS)
+        saved = scenario_set(SCENARIO_COUNT)
+
+        def run():
+            scenarios._results_cache.clear()
+            return scenarios.compare_scenarios(engine, keys, DEFAULT_METHODS, saved, saved.names)
+        return run
+
+    yield "scenarios.switch[hit]", lambda stack: setup_switch(stack, True)
+    yield "scenarios.switch[miss]", lambda stack: setup_switch(stack, False)
+    yield f"scenarios.compare[{SCENARIO_COUNT}]", setup_compare
+
+
+def _bond_cases():
+    from valuation_core import (
+        DEFAULT_FORMULAS, FormulaEngine, analyze_bond_book, bond_price, bond_yield_to_maturity, topo_evaluate,
+    )
+
+    n = BOND_BOOK_SIZE
+    bond_pv = {"bond_pv": DEFAULT_FORMULAS["bond_pv"]}
+
+    def book_arrays():
+        book = fixtures.bond_book(n)
+        return book, [book[c].to_numpy() for c in ("bond_face_value", "bond_coupon_rate", "bond_coupon_freq", "bond_years")]
+
+    def setup_formula(stack):
+        inputs = {"bond_face_value": 100.0, "bond_coupon_rate": 5.0, "bond_coupon_freq": 2.0, "bond_years": 10.0, "bond_ytm": 6.0}
+        return lambda: topo_evaluate(bond_pv, inputs)
+
+    def setup_formula_batch(stack):
+        book, _ = book_arrays()
+        columns = {c: book[c].to_numpy() for c in book.columns}
+        columns["bond_ytm"] = np.full(n, 5.0)
+        engine = FormulaEngine(bond_pv)
+        return lambda: engine.evaluate_batch(columns, n)
+
+    def setup_price(stack):
+        _, args = book_arrays()
+        return lambda: bond_price(*args, 5.0)
+
+    def setup_ytm(stack):
+        book, args = book_arrays()
+        price = book["bond_market_price"].to_numpy()
+        return lambda: bond_yield_to_maturity(*args, price)
+
+    def setup_book(stack):
+        book, _ = book_arrays()
+        return lambda: analyze_bond_book(book)
+
+    yield "bonds.bond_pv_formula", setup_formula
+    yield f"bonds.bond_pv_formula_batch[{n}]", setup_formula_batch
+    yield f"bonds.price[{n}]", setup_price
+    yield f"bonds.ytm[{n}]", setup_ytm
+    yield f"bonds.analyze_book[{n}]", setup_book
+
+
+def _option_cases():
+    from valuation_core import DEFAULT_FORMULAS, FormulaEngine, binomial_option, black_scholes, lsm_option
+
+    n = OPTION_BOOK_SIZE
+
+    def option_arrays():
+        rng = np.random.default_rng(0)
+        value = rng.uniform(50, 150, n)
+        strike = rng.uniform(80, 120, n)
+        years = rng.uniform(0.5, 5, n)
+        volatility = rng.uniform(10, 60, n)
+        return value, strike, years, 5.0, volatility, 2.0, -1
+
+    def setup_black_scholes(stack):
+        args = option_arrays()
+        return lambda: black_scholes(*args)
+
+    def setup_binomial(stack):
+        args = option_arrays()
+        return lambda: binomial_option(*args)
+
+    def setup_binomial_single(stack):
+        return lambda: binomial_option(36.0, 40.0, 1.0, 6.0, 20.0, 0.0, -1)
+
+    def setup_lsm_single(stack):
+        return lambda: lsm_option(36.0, 40.0, 1.0, 6.0, 20.0, 0.0, -1)
+
+    def setup_formula_batch(stack):
+        value, strike, years, rate, volatility, dividend_yield, kind = option_arrays()
+        columns = {
+            "option_underlying": value, "option_strike": strike, "option_years": years, "option_risk_free": np.full(n, rate),
+            "option_volatility": volatility, "option_yield": np.full(n, dividend_yield), "option_type": np.full(n, kind, dtype=float),
+            "option_steps": np.full(n, np.nan), "option_paths": np.full(n, np.nan),
+        }
+        engine = FormulaEngine({k: DEFAULT_FORMULAS[k] for k in ("real_option", "real_option_binomial", "real_option_lsm")})
+        return lambda: engine.evaluate_batch(columns, n)
+
+    yield f"options.black_scholes[{n}]", setup_black_scholes
+    yield f"options.binomial[{n}]", setup_binomial
+    yield "options.binomial[1]", setup_binomial_single
+    yield "options.lsm[1]", setup_lsm_single
+    yield f"options.formula_batch[{n}]", setup_formula_batch
+
+
+def _dcf_cases():
+    from valuation_core import DEFAULT_FORMULAS, FormulaEngine, cash_flow_value, eps_dcf_value, monte_carlo_valuation, sensitivity_grid
+
+    n = BATCH_ROWS
+
+    def setup_simple(stack):
+        return lambda: eps_dcf_value(10.0, 0.05, 0.10, 5)
+
+    def setup_grid(stack):
+        discount_rates = np.linspace(0.05, 0.15, 200)
+        growth_rates = np.linspace(0.0, 0.10, 200)
+        return lambda: sensitivity_grid(eps_dcf_value, discount_rates, growth_rates, eps=10.0, years=5)
+
+    def setup_monte_carlo(stack):
+        return lambda: monte_carlo_valuation(eps_dcf_value, 0.10, 0.01, 0.05, 0.02, n_draws=100_000, seed=0, eps=10.0, years=5)
+
+    def setup_multi_stage(stack):
+        rng = np.random.default_rng(0)
+        cash_flows = rng.uniform(50, 150, (n, DCF_YEARS))
+        discount = rng.uniform(0.07, 0.12, n)
+        high_growth = rng.uniform(0.05, 0.2, n)
+        return lambda: cash_flow_value(cash_flows, discount, 0.02, high_growth, 5, 5)
+
+    def setup_formula_batch(stack):
+        rng = np.random.default_rng(0)
+        columns = {f"fcf{i}": rng.uniform(50, 150, n) for i in range(1, 6)}
+        columns.update({
+            "discount_rate": rng.uniform(0.07, 0.12, n), "perpetual_growth": np.full(n, 0.02), "high_growth": rng.uniform(0.05, 0.2, n),
+            "high_growth_years": np.full(n, 5.0), "fade_years": np.full(n, 5.0), "dividend_per_share": rng.uniform(1, 10, n),
+            "dividend_growth": np.full(n, 0.03), "dividend_high_growth": np.full(n, np.nan), "dividend_high_years": np.full(n, np.nan),
+            "dividend_fade_years": np.full(n, np.nan), "shares": np.full(n, 1000.0),
+        })
+        engine = FormulaEngine({k: DEFAULT_FORMULAS[k] for k in ("dcf", "ddm")})
+        return lambda: engine.evaluate_batch(columns, n)
+
+    yield "dcf.simple_tool", setup_simple
+    yield "dcf.sensitivity_grid[200x200]", setup_grid
+    yield "dcf.monte_carlo[100000]", setup_monte_carlo
+    yield f"dcf.multi_stage[{n}x{DCF_YEARS}]", setup_multi_stage
+    yield f"dcf.formula_batch[{n}]", setup_formula_batch
+
+
+def _chart_cases():
+    from valuation_core import charts
+
+    years = np.arange(2016, 2026)
+    cash = np.linspace(10, 20, len(years))
+    stock = np.zeros(len(years))
+
+    def setup_hit(stack):
+        charts.dividend_chart(years, cash, stock)
+        return lambda: charts.dividend_chart(years, cash, stock)
+
+    def setup_miss(stack):
+        # 每次呼叫的資料都不同，必定重新繪圖
+        counter = itertools.count()
+        return lambda: charts.dividend_chart(years, cash + next(counter), stock)
+
+    yield "charts.dividends[hit]", setup_hit
+    yield "charts.dividends[miss]", setup_miss
+
+
+def _screener_cases(sizes):
+    from valuation_core.screener import add_valuation_columns, apply_screen
+
+    for n in sizes:
+        def setup_valuation(stack, n=n):
+            df = fixtures.screener_fundamentals(n)
+            return lambda: add_valuation_columns(df)
+
+        def setup_filter(stack, n=n):
+            df = add_valuation_columns(fixtures.screener_fundamentals(n))
+            ranges = {"trailingPE": (0.0, 25.0), "殖利率%": (2.0, None), "葛拉漢價差%": (0.0, None)}
+            return lambda: apply_screen(df, ranges, keyword="a", sort_by="葛拉漢價差%", ascending=False)
+
+        yield f"screener.valuation_columns[{n}]", setup_valuation
+        yield f"screener.filter_sort[{n}]", setup_filter
+
+
+def _peer_cases():
+    def setup_aggregate(stack):
+        from valuation_core.peers import aggregate_multiples
+
+        rng = np.random.default_rng(0)
+        values = rng.lognormal(2.5, 0.6, (PEER_COUNT, 5))
+        values[rng.random(values.shape) < 0.1] = np.nan
+        return lambda: [aggregate_multiples(values, method) for method in ("median", "mean", "trimmed")]
+
+    def setup_fetch_hit(stack):
+        from valuation_core.peers import fetch_peer_multiples
+
+        # 同業皆已在基本面快取中（例如切換彙總方式後重新抓取）
+        stack.enter_context(fixtures.offline_market_data())
+        tickers = [f"{1000 + i}.TW" for i in range(30)]
+        fetch_peer_multiples(tickers, rate=1e6)
+        return lambda: fetch_peer_multiples(tickers)
+
+    yield f"peers.aggregate[{PEER_COUNT}x5]", setup_aggregate
+    yield "peers.fetch[30,hit]", setup_fetch_hit
+
+
+def _market_data_cases(refresh_sizes):
+    def setup_info_hit(stack):
+        from valuation_core import market_data
+
+        stack.enter_context(fixtures.offline_market_data())
+        market_data.get_stock_info("2330.TW")
+        return lambda: market_data.get_stock_info("2330.TW")
+
+    def setup_info_miss(stack):
+        from valuation_core import market_data
+
+        stack.enter_context(fixtures.offline_market_data())
+
+        def run():
+            market_data.get_data_caches.cache_clear()
+            return market_data.get_stock_info("2330.TW")
+        return run
+
+    def setup_dividends(stack):
+        from valuation_core import dividends
+
+        html = fixtures.goodinfo_html()
+        return lambda: dividends.parse_goodinfo_dividends(html)
+
+    def setup_dividend_update(stack):
+        from valuation_core import dividends
+
+        # 本機已有前一年為止的歷史，重新檢查時只解析新公布的年度並合併寫回
+        stack.enter_context(fixtures.offline_market_data())
+        store = dividends.DividendHistoryStore(directory=stack.enter_context(tempfile.TemporaryDirectory()))
+        history = dividends.parse_goodinfo_dividends(fixtures.goodinfo_html(latest=2024))
+        store.write("2330", history, 0.0)
+        return lambda: store.get("2330", force=True)
+
+    def setup_price_read(stack):
+        from valuation_core import prices
+
+        # 自 2000 年起的日線，讀取最近十年
+        stack.enter_context(fixtures.offline_market_data())
+        store = prices.PriceHistoryStore(directory=stack.enter_context(tempfile.TemporaryDirectory()))
+        store.update("2330.TW")
+        start = (datetime.now() - timedelta(days=3652)).date()
+        return lambda: store.read("2330.TW", start=start)
+
+    def setup_price_update(stack):
+        from valuation_core import prices
+
+        # 本機日線停在一個月前，附加之後的新日線並寫回
+        stack.enter_context(fixtures.offline_market_data())
+        store = prices.PriceHistoryStore(directory=stack.enter_context(tempfile.TemporaryDirectory()))
+        bars = fixtures.price_bars(end=datetime.now() - timedelta(days=30))
+
+        def run():
+            store.write("2330.TW", bars, 0.0)
+            return store.update("2330.TW")
+        return run
+
+    def setup_river(stack):
+        from valuation_core import prices
+
+        bars = fixtures.price_bars(start=(datetime.now() - timedelta(days=3652)).date())
+        basis = fixtures.per_share_statements()
+        return lambda: prices.valuation_bands(bars["date"], basis["date"], basis["eps"], 20.0)
+
+    def setup_statements_map(stack):
+        from valuation_core import statements
+
+        frames = fixtures.financial_statements()
+        return lambda: [statements.map_statements(frames, period) for period in statements.STATEMENT_PERIODS]
+
+    def setup_statements_hit(stack):
+        from valuation_core import statements
+
+        # 同一 ticker 重複帶入：財報與欄位對應皆取自快取
+        stack.enter_context(fixtures.offline_market_data())
+        statements.load_ticker_fields("2330.TW")
+        return lambda: statements.load_ticker_fields("2330.TW")
+
+    def setup_prefetch_warm(stack):
+        from valuation_core import market_data
+        from valuation_core.prefetch import Prefetcher, SearchPrefetch
+
+        # 每次重新執行都會呼叫：候選皆已在快取中時，只檢查快取而不送出工作
+        stack.enter_context(fixtures.offline_market_data())
+        candidates = [("美股", code) for code in ("AAPL", "MSFT", "NVDA")]
+        for _, code in candidates:
+            market_data.get_stock_info(code)
+        search = SearchPrefetch(Prefetcher(workers=1))
+        return lambda: search.update(("美股", "a"), candidates)
+
+    yield "market_data.get_stock_info[hit]", setup_info_hit
+    yield "market_data.get_stock_info[miss]", setup_info_miss
+    yield "prefetch.update[warm]", setup_prefetch_warm
+    yield "statements.map[annual+ttm]", setup_statements_map
+    yield "statements.load_ticker_fields[hit]", setup_statements_hit
+    yield "dividends.parse_goodinfo", setup_dividends
+    yield "dividends.incremental_update", setup_dividend_update
+    yield "prices.read_range[10y]", setup_price_read
+    yield "prices.incremental_update", setup_price_update
+    yield "prices.valuation_bands[10y]", setup_river
+
+    for n in refresh_sizes:
+        def setup_refresh(stack, n=n):
+            from valuation_core import market_data
+
+            stack.enter_context(fixtures.offline_market_data(universe_size=n))
+            path = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "stock_universe.parquet")
+            store = market_data.StockUniverseStore(path=path)
+            return store.refresh
+
+        yield f"market_data.universe_refresh[{n}]", setup_refresh
+
+
+def build_cases(quick=False):
+    universe_sizes = UNIVERSE_SIZES[:-1] if quick else UNIVERSE_SIZES
+    formula_sizes = FORMULA_SET_SIZES[:-1] if quick else FORMULA_SET_SIZES
+    refresh_sizes = REFRESH_SIZES[:-1] if quick else REFRESH_SIZES
+    screener_sizes = SCREENER_SIZES[:-1] if quick else SCREENER_SIZES
+    return list(itertools.chain(
+        _formula_cases(formula_sizes), _scenario_cases(), _search_cases(universe_sizes), _bond_cases(), _option_cases(), _dcf_cases(),
+        _chart_cases(), _screener_cases(screener_sizes), _peer_cases(), _market_data_cases(refresh_sizes),
+    ))
+
+
+# --- 量測 ---
+def measure_latency(fn, min_time=0.5, max_iters=1000):
+    """
+    暖機一次後逐次計時，回傳每次呼叫的秒數陣列。
+    """
+    fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_iters and (len(times) < MIN_ITERS or time.perf_counter() - start < min_time):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return np.array(times)
+
+
+def measure_peak_memory(fn):
+    """
+    以 tracemalloc 量測單次呼叫期間新增的記憶體峰值（MB）。
+    """
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (peak - base) / 1e6
+
+
+def run_case(setup, min_time, max_iters):
+    with contextlib.ExitStack() as stack:
+        fn = setup(stack)
+        times = measure_latency(fn, min_time, max_iters)
+        peak_mb = measure_peak_memory(fn)
+    result = {f"p{p}_ms": float(np.percentile(times, p) * 1e3) for p in PERCENTILES}
+    result.update(mean_ms=float(times.mean() * 1e3), iterations=len(times), peak_mb=peak_mb)
+    return result
+
+
+def environment():
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+        "platform": f"{platform.system()} {platform.machine()}", "cpu_count": os.cpu_count(), "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    與基準比較：p50 延遲或記憶體峰值（且增加超過 1 MB）超過基準 (1 + threshold) 倍者視為退步。
+    回傳 {項目: (p50 變化比例, 記憶體變化比例, 是否退步)}。
+    """
+    comparison = {}
+    for name, result in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        latency_change = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] > 0 else 0.0
+        memory_change = result["peak_mb"] / base["peak_mb"] - 1 if base["peak_mb"] > 0 else 0.0
+        regressed = latency_change > threshold or (memory_change > threshold and result["peak_mb"] - base["peak_mb"] > 1)
+        comparison[name] = (latency_change, memory_change, regressed)
+    return comparison
+
+
+def format_report(results, comparison):
+    header = f"{'項目':<40}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'次數':>7}{'峰值 MB':>10}{'p50 對基準':>12}{'記憶體對基準':>12}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        line = f"{name:<40}{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['p99_ms']:>11.3f}{r['iterations']:>7}{r['peak_mb']:>10.2f}"
+        if name in comparison:
+            latency_change, memory_change, regressed = comparison[name]
+            line += f"{latency_change:>+12.1%}{memory_change:>+12.1%}" + ("  ← 退步" if regressed else "")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="估值工具效能基準測試")
+    parser.add_argument("--quick", action="store_true", help="略過最大的資料規模（100k 股票清單、3000 條公式）")
+    parser.add_argument("--filter", action="append", default=[], help="只執行名稱包含此字串的項目（可重複指定）")
+    parser.add_argument("--min-time", type=float, default=0.5, help="每個項目至少計時的秒數")
+    parser.add_argument("--max-iters", type=int, default=1000, help="每個項目最多計時的次數")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="比較用的基準檔")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_PATH, default=None, help="將本次結果存為基準檔")
+    parser.add_argument("--threshold", type=float, default=0.25, help="視為退步的變化比例（預設 0.25 = 25%%）")
+    parser.add_argument("--json", default=None, help="另將結果寫成 JSON 檔")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup in build_cases(args.quick):
+        if args.filter and not any(f in name for f in args.filter):
+            continue
+        print(f"執行 {name} …", file=sys.stderr, flush=True)
+        results[name] = run_case(setup, args.min_time, args.max_iters)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline) and args.save_baseline != args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    comparison = compare(results, baseline, args.threshold) if baseline else {}
+    print(format_report(results, comparison))
+
+    report = {"environment": environment(), "cases": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已儲存基準：{args.save_baseline}")
+    regressions = [name for name, (_, _, regressed) in comparison.items() if regressed]
+    if baseline:
+        env = baseline.get("environment", {})
+        print(f"基準：{args.baseline}（{env.get('created_at', '?')}，Python {env.get('python', '?')}，{env.get('cpu_count', '?')} 核心）")
+        if regressions:
+            print(f"有 {len(regressions)} 個項目退步超過 {args.threshold:.0%}：{', '.join(regressions)}")
+            return 1
+    return 0
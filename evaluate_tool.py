@@ -1,22 +1,46 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import webbrowser
-from datetime import datetime
-import matplotlib.pyplot as plt
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import importlib.util
 import io
 import json
-import re
+from datetime import datetime
+from requests.exceptions import RequestException
+
+from valuation_core import instrumentation
+from valuation_core import (
+    FormulaEngine, dcf_value, ddm_value, dividend_yield_value, eps_dcf_value, graham_number, monte_carlo_valuation,
+    multiple_band, peg_band, run_batch_valuation, safe_float, sensitivity_grid, summarize_simulation, validate_formulas,
+)
+from valuation_core.charts import chart_cache_stats, dividend_chart, heatmap_chart, river_chart
+from valuation_core.dividends import dividend_statistics
+from valuation_core.prices import as_of, get_per_share_history, get_price_history_store, historical_multiples, valuation_bands
+from valuation_core.peers import (
+    MAX_PEERS, PEER_AGGREGATES, PEER_MULTIPLE_LABELS, fetch_peer_multiples, industry_counts, industry_peers, parse_peer_tickers,
+    peer_summary,
+)
+from valuation_core.prefetch import PREFETCH_TOP, SearchPrefetch, get_prefetcher
+from valuation_core.statements import STATEMENT_PERIODS, TICKER_FIELDS, get_financial_statements, load_ticker_fields, normalize_ticker
+from valuation_core.scenarios import (
+    ScenarioSet, array_to_values, compare_scenarios, evaluate_inputs, format_input, scenario_cache_stats,
+)
+from valuation_core.session import ValuationConfig, default_config, session_memory_report
+from valuation_core.reports import EXPORT_FORMATS, MAX_EXCEL_ROWS, cached_export, excel_report
+from valuation_core.screener import apply_screen, get_screener_store, universe_tickers
+from valuation_core.market_data import (
+    get_data_caches, get_dividends_tw_cached, get_fetch_executor, get_stock_info, get_stock_universe_store,
+)
+from valuation_core.sensitivity import SIMULATION_PERCENTILES
+
 
 # --- 主應用程式設定 ---
-# 備註：此應用程式需要安裝 xlsxwriter 套件才能正常匯出 Excel。
+# 備註：此應用程式需要安裝 xlsxwriter 套件才能正常匯出 Excel（報告於按下匯出時才產生）。
 # 請在您的環境中執行: pip install xlsxwriter
 st.set_page_config(page_title="多功能財務分析工具", layout="wide")
 st.title("📈 多功能財務分析工具")
 
+
 # --- 工具一：股票估值工具 (簡易版) ---
 def run_stock_valuation_app():
     """
@@ -25,145 +49,111 @@ def run_stock_valuation_app():
     st.header("股票估值工具 (簡易版)")
     st.markdown("---")
 
-    @st.cache_data
+    @instrumentation.instrumented("load_stock_list")
     def load_stock_list():
         """
-        載入台灣和美國的股票列表。
+        載入台灣和美國的股票列表（來自本機快照，過期時於背景更新）。
         """
-        # 載入台灣股票列表
-        url_tw = "https://mops.twse.com.tw/mops/web/ajax_t51sb01"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        data = {
-            "encodeURIComponent": "1", "step": "1", "firstin": "1", "off": "1",
-            "queryName": "co_id", "inpuType": "co_id", "TYPEK": "all", "isQuery": "Y"
-        }
-        
-        taiwan_df = pd.DataFrame(columns=["股票代號", "公司名稱"])
-        try:
-            response = requests.post(url_tw, headers=headers, data=data, timeout=10)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-            tables = soup.find_all('table')
-            
-            found_table = False
-            for table in tables:
-                rows = table.find_all('tr')
-                if len(rows) > 1:
-                    header_cols = [th.get_text(strip=True) for th in rows[0].find_all(['th', 'td'])]
-                    if '公司代號' in header_cols and '公司名稱' in header_cols:
-                        data_rows = []
-                        for row in rows[1:]:
-                            cols = row.find_all('td')
-                            if len(cols) >= 2:
-                                stock_id = cols[0].get_text(strip=True)
-                                company_name = cols[1].get_text(strip=True)
-                                data_rows.append([stock_id, company_name])
-                        
-                        if data_rows:
-                            taiwan_df = pd.DataFrame(data_rows, columns=["股票代號", "公司名稱"])
-                            found_table = True
-                            break
-            
-            if not found_table:
-                st.warning("無法從公開資訊觀測站取得台股資料的表格。這可能是網站結構改變或網路問題。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
-                
-        except requests.exceptions.RequestException as e:
-            st.error(f"載入台股列表時發生網路錯誤: {e}。請檢查您的網路連線或稍後再試。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
-        except Exception as e:
-            st.error(f"載入台股列表時發生解析錯誤: {e}。這可能是網站結構改變導致。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
-
-        # 載入美國股票列表 (S&P 500 成分股)
-        us_df = pd.DataFrame(columns=["Symbol", "Name"])
-        try:
-            us_url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-            tables = pd.read_html(us_url)
-            if tables:
-                temp_us_df = tables[0]
-                if 'Symbol' in temp_us_df.columns and 'Security' in temp_us_df.columns:
-                    us_df = temp_us_df.rename(columns={'Security': 'Name'})
-                    us_df = us_df[['Symbol', 'Name']]
-                else:
-                    st.warning("載入美股列表成功，但缺少預期的 'Symbol' 或 'Security' 欄位。這可能是維基百科表格格式改變。")
-            else:
-                st.warning("從維基百科載入美股列表時，未找到任何表格。")
-
-        except requests.exceptions.RequestException as e:
-            st.error(f"載入美股列表時發生網路錯誤: {e}。請檢查您的網路連線或稍後再試。")
-        except ImportError:
-            st.error("載入美股列表失敗：缺少必要的 'lxml' 函式庫。請在您的 Streamlit 環境中執行以下指令安裝：`pip install lxml` 或 `conda install lxml`。")
-        except Exception as e:
-            st.error(f"載入美股列表時發生解析錯誤: {e}。這可能是維基百科表格結構改變。")
-            
+        store = get_stock_universe_store()
+        taiwan_df, us_df = store.load()
+        for level, msg in store.messages:
+            if taiwan_df.empty or us_df.empty:
+                getattr(st, level)(msg)
         return taiwan_df, us_df
 
+    def show_stock_list_status():
+        store = get_stock_universe_store()
+        with st.expander("股票清單資料來源與更新", expanded=False):
+            if store.updated_at is not None:
+                st.caption(f"股票清單更新時間：{store.updated_at:%Y-%m-%d %H:%M:%S}（來源：{store.source}）")
+            if store.refreshing:
+                st.caption("股票清單正在背景更新中…")
+            for level, msg in store.messages:
+                st.caption(msg)
+            if st.button("立即更新股票清單", key="stock_list_refresh"):
+                with st.spinner("更新股票清單中…"):
+                    if store.refresh():
+                        st.success("股票清單已更新。")
+                    else:
+                        st.error("更新失敗，仍使用原有的股票清單。")
+            seed_file = st.file_uploader(
+                "無網路時可上傳股票清單檔建立快照（CSV/Excel/Parquet）",
+                type=["csv", "xlsx", "xls", "parquet"], key="stock_list_seed"
+            )
+            if seed_file and st.button("以上傳檔案建立股票清單", key="stock_list_seed_apply"):
+                try:
+                    store.seed_from_file(seed_file, seed_file.name)
+                    st.success("已以上傳檔案建立股票清單快照。")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"讀取股票清單檔時發生錯誤: {e}")
+
     def search_symbol(keyword, market, tw_df, us_df):
         if market == "台股":
             if tw_df.empty:
                 st.info("台股列表資料未載入，無法搜尋。請檢查上方錯誤訊息。")
                 return pd.DataFrame(columns=["股票代號", "公司名稱"])
-            
-            if keyword.isdigit():
-                results = tw_df[tw_df["股票代號"].astype(str).str.contains(keyword)]
-            else:
-                results = tw_df[tw_df["公司名稱"].astype(str).str.contains(keyword, case=False)]
-            return results[["股票代號", "公司名稱"]]
         else: # 美股
             if us_df.empty:
                 st.info("美股列表資料未載入，無法搜尋。請檢查上方錯誤訊息。")
                 return pd.DataFrame(columns=["Symbol", "Name"])
-            return us_df[us_df["Name"].astype(str).str.contains(keyword, case=False) | us_df["Symbol"].astype(str).str.contains(keyword, case=False)]
+        return get_stock_universe_store().index.search_frame(keyword, market)
 
-    def get_dividends_tw(stock_id):
-        url = f"https://goodinfo.tw/tw/StockDividendPolicy.asp?STOCK_ID={stock_id}"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        
+    def get_dividends_tw(stock_id, div_future=None):
         div_df = pd.DataFrame()
         try:
-            r = requests.get(url, headers=headers, timeout=10)
-            r.encoding = 'utf-8'
-            soup = BeautifulSoup(r.text, "html.parser")
-            table = soup.find("table", class_="b1 p4_2 r10 box_shadow")
-            if table:
-                dfs_from_html = pd.read_html(str(table))
-                if dfs_from_html:
-                    df = dfs_from_html[0]
-                    df.columns = df.columns.droplevel(0)
-                    df = df.rename(columns={"年度": "Year", "現金股利": "Cash", "股票股利": "Stock"})
-                    df = df[["Year", "Cash", "Stock"]].dropna()
-                    df = df.head(3)
-                    df[["Cash", "Stock"]] = df[["Cash", "Stock"]].replace("--", 0).astype(float)
-                    div_df = df
-                else:
-                    st.warning(f"從 Goodinfo! 取得 {stock_id} 的股利資料，但未找到有效的表格數據。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
-            else:
+            result = div_future.result() if div_future is not None else get_dividends_tw_cached(stock_id)
+            if result is None:
                 st.warning(f"無法從 Goodinfo! 取得 {stock_id} 的股利資料表格。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
-        except requests.exceptions.RequestException as e:
+            elif result.empty:
+                st.warning(f"從 Goodinfo! 取得 {stock_id} 的股利資料，但未找到有效的表格數據。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
+            else:
+                div_df = result
+        except RequestException as e:
             st.error(f"取得股利資料時發生網路錯誤: {e}。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
         except Exception as e:
             st.error(f"解析股利資料時發生錯誤: {e}。**台股資料來源為網頁爬蟲，易受網站更新影響。**")
         return div_df
 
+    # 圖表依資料雜湊快取 PNG，資料未變的重新執行不會重新繪圖
+    @instrumentation.instrumented("show_dividend_chart")
     def show_dividend_chart(div_df):
-        fig, ax = plt.subplots(figsize=(5,3))
-        ax.bar(div_df["Year"], div_df["Cash"], label="現金股利")
-        ax.bar(div_df["Year"], div_df["Stock"], bottom=div_df["Cash"], label="股票股利")
-        ax.set_ylabel("股利")
-        ax.set_title("近三年股利政策")
-        ax.legend()
-        st.pyplot(fig)
+        st.image(dividend_chart(div_df["Year"], div_df["Cash"], div_df["Stock"]))
+
+    @instrumentation.instrumented("show_valuation_river")
+    def show_valuation_river(bars, bands, labels, title):
+        st.image(river_chart(bars["date"], bars["close"], bands, labels, title))
+
+    def show_dividend_statistics(div_df, price):
+        stats = dividend_statistics(div_df, price=price)
+        if not stats:
+            return
+        st.write(f"**配息統計（{stats['first_year']}–{stats['last_year']}，共 {stats['years']} 年）**")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("連續配發現金股利", f"{stats['consecutive_years']} 年")
+        c2.metric("平均現金股利", f"{stats['avg_cash']:.2f}")
+        c3.metric("平均殖利率（以目前股價）", "-" if np.isnan(stats["avg_yield_pct"]) else f"{stats['avg_yield_pct']:.2f}%")
+        c1.metric("現金股利年複合成長率", "-" if np.isnan(stats["cash_cagr"]) else f"{stats['cash_cagr'] * 100:.2f}%")
+        c2.metric("現金股利變異係數", "-" if np.isnan(stats["cash_cv"]) else f"{stats['cash_cv']:.2f}")
+        c3.metric("平均盈餘配發率", "-" if np.isnan(stats["avg_payout_ratio"]) else f"{stats['avg_payout_ratio'] * 100:.1f}%")
 
     # --- UI 介面 ---
     taiwan_df, us_df = load_stock_list()
+    show_stock_list_status()
 
     market = st.radio("選擇市場：", ["台股", "美股"], horizontal=True, key="stock_market_selector")
     keyword = st.text_input("輸入股票代號或名稱：", key="stock_keyword_input")
 
+    if "stock_prefetch" not in st.session_state:
+        st.session_state.stock_prefetch = SearchPrefetch()
+    if not keyword:
+        st.session_state.stock_prefetch.update(None, [])
+
     if keyword:
         result = search_symbol(keyword, market, taiwan_df, us_df)
         if not result.empty:
+            # 使用者選擇時，先於背景取得前幾個候選的股票資訊與股利；關鍵字改變時取消尚未開始者
+            st.session_state.stock_prefetch.update((market, keyword), [(market, str(c)) for c in result.iloc[:PREFETCH_TOP, 0]])
             if market == "台股":
                 selection_options = result.values.tolist()
                 format_func = lambda x: f"{x[0]} - {x[1]}"
@@ -182,9 +172,29 @@ def run_stock_valuation_app():
                 ticker = code
                 st.markdown(f"[🔗 Google 財經連結](https://www.google.com/finance/quote/{code}:NASDAQ?hl=zh-TW)")
 
-            stock = yf.Ticker(ticker)
+            # 股票資訊與股利資料彼此獨立，同時發出請求，等待時間取決於最慢的一個；
+            # 兩者皆有快取，調整滑桿或切換分頁時不會重新連網。預先抓取中的請求直接沿用，不重複連網
+            prefetcher = get_prefetcher()
+            info_future = prefetcher.pending(("info", ticker)) or instrumentation.submit(get_fetch_executor(), get_stock_info, ticker)
+            div_future = None
+            if market == "台股":
+                div_future = prefetcher.pending(("dividends", code)) or instrumentation.submit(get_fetch_executor(), get_dividends_tw_cached, code)
+            # 河流圖所需的日線與財報、帶入專業版所需的完整財報也先在背景取得，結果存入本機檔案與快取；
+            # 每個 session 每個 ticker 只送出一次（不隨每次重新執行重複送出），同一工作已在進行中時併入
+            prefetched = st.session_state.setdefault("history_prefetched", set())
+            if ticker not in prefetched:
+                futures = [
+                    prefetcher.submit((kind, ticker), func, ticker) for kind, func in (
+                        ("price_history", get_price_history_store().update),
+                        ("per_share", get_per_share_history),
+                        ("financials", get_financial_statements),
+                    )
+                ]
+                # 因達到預先抓取上限而略過時，下次重新執行再送出
+                if all(future is not None for future in futures):
+                    prefetched.add(ticker)
             try:
-                info = stock.info
+                info = info_future.result()
                 if not info or 'currentPrice' not in info:
                     st.error(f"無法取得 {ticker} 的股票資訊，請確認代號是否正確或稍後再試。")
                     st.stop()
@@ -193,6 +203,9 @@ def run_stock_valuation_app():
                 st.stop()
 
             st.subheader(f"📊 {info.get('longName', '未知公司')} 基本資料")
+            st.button(
+                "帶入專業版評價（以財報自動填入欄位）", key="stock_to_comp", on_click=open_in_comprehensive_app, args=(ticker,),
+            )
             col1, col2 = st.columns(2)
             with col1:
                 st.write(f"目前價格：{info.get('currentPrice', '-')}")
@@ -216,10 +229,14 @@ def run_stock_valuation_app():
 
 
             if market == "台股":
-                div_df = get_dividends_tw(code)
+                div_df = get_dividends_tw(code, div_future)
                 if not div_df.empty:
+                    year_options = [n for n in (3, 5, 10, 20) if n < len(div_df)] + ["全部"]
+                    n_years = st.radio("股利歷史年數：", year_options, index=min(1, len(year_options) - 1), horizontal=True, key="dividend_years")
+                    recent_div_df = div_df if n_years == "全部" else div_df.sort_values("Year", ascending=False).head(n_years)
                     with col1: # 這裡可以考慮調整排版，讓圖表更清晰
-                        show_dividend_chart(div_df)
+                        show_dividend_chart(recent_div_df)
+                    show_dividend_statistics(recent_div_df, info.get("currentPrice"))
                 else:
                     st.info("台股股利資料可能無法取得或不存在。")
 
@@ -234,12 +251,8 @@ def run_stock_valuation_app():
                 if pe is None or eps is None or price is None:
                     st.warning("無法取得完整的 PE、EPS 或目前價格資料，無法計算 PE 合理價。")
                 else:
-                    pe = float(pe)
-                    eps = float(eps)
-                    price = float(price)
-                    pe_range = [pe * 0.8, pe, pe * 1.2]
-                    fair_price = eps * np.array(pe_range)
-                    df_pe = pd.DataFrame({"PE": pe_range, "估算價格": fair_price, "價差%": (fair_price - price)/price*100})
+                    pe_range, fair_price, gap = multiple_band(float(pe), float(eps), float(price))
+                    df_pe = pd.DataFrame({"PE": pe_range, "估算價格": fair_price, "價差%": gap})
                     st.dataframe(df_pe.round(2))
             except Exception as e:
                 st.warning(f"計算 PE 合理價時發生錯誤: {e}")
@@ -255,12 +268,8 @@ def run_stock_valuation_app():
                 if ps is None or sps is None or price is None:
                     st.info("無法取得完整的 P/S 或 每股營收 資料，無法計算 P/S 合理價。")
                 else:
-                    ps = float(ps)
-                    sps = float(sps)
-                    price = float(price)
-                    ps_range = [ps * 0.8, ps, ps * 1.2]
-                    fair_price_ps = sps * np.array(ps_range)
-                    df_ps = pd.DataFrame({"P/S": ps_range, "估算價格": fair_price_ps, "價差%": (fair_price_ps - price)/price*100})
+                    ps_range, fair_price_ps, gap_ps = multiple_band(float(ps), float(sps), float(price))
+                    df_ps = pd.DataFrame({"P/S": ps_range, "估算價格": fair_price_ps, "價差%": gap_ps})
                     st.dataframe(df_ps.round(2))
             except Exception as e:
                 st.warning(f"計算 P/S 合理價時發生錯誤: {e}")
@@ -308,11 +317,10 @@ def run_stock_valuation_app():
                     # 合理價格 = (目標PEG / 當前PEG) * 當前價格
                     # 這種方法假設了市場對成長的評價是線性的，並將當前價格作為基準。
                     
-                    # 假設目標PEG範圍為 [0.8, 1.0, 1.2]
-                    target_peg_range = [0.8, 1.0, 1.2]
+                    # 假設目標PEG範圍為 [0.8, 1.0, 1.2]（valuation_core.metrics.TARGET_PEG_RANGE）
                     if peg > 0: # 避免除以零
-                        fair_price_peg = (np.array(target_peg_range) / peg) * price
-                        df_peg = pd.DataFrame({"目標PEG": target_peg_range, "估算價格": fair_price_peg, "價差%": (fair_price_peg - price)/price*100})
+                        target_peg_range, fair_price_peg, gap_peg = peg_band(peg, price)
+                        df_peg = pd.DataFrame({"目標PEG": target_peg_range, "估算價格": fair_price_peg, "價差%": gap_peg})
                         st.dataframe(df_peg.round(2))
                     else:
                         st.info("PEG 為零或負值，無法計算 PEG 合理價。")
@@ -331,8 +339,7 @@ def run_stock_valuation_app():
                     eps = info.get('trailingEps')
                     bvps = info.get('bookValue')
                     if eps is not None and bvps is not None and eps > 0 and bvps > 0:
-                        graham_number = np.sqrt(22.5 * eps * bvps)
-                        st.metric(label="葛拉漢數字", value=f"{graham_number:.2f}")
+                        st.metric(label="葛拉漢數字", value=f"{graham_number(eps, bvps):.2f}")
                         st.caption("衡量合理價的保守指標，適用於穩定獲利公司。")
                     else:
                         st.info("EPS 或每股淨值為負或缺失，不適用葛拉漢數字。")
@@ -347,7 +354,7 @@ def run_stock_valuation_app():
                     avg_div_yield = info.get('fiveYearAvgDividendYield') # This is in percent, e.g., 2.5 for 2.5%
 
                     if div_rate is not None and avg_div_yield is not None and avg_div_yield > 0:
-                        fair_value_div = div_rate / (avg_div_yield / 100)
+                        fair_value_div = dividend_yield_value(div_rate, avg_div_yield)
                         st.metric(label="五年平均股息回推價", value=f"{fair_value_div:.2f}")
                         st.caption("以五年平均殖利率回推的價值，適用於穩定發放股利的公司。")
                     else:
@@ -356,6 +363,44 @@ def run_stock_valuation_app():
                     st.warning(f"計算股利回推價值時出錯: {e}")
 
 
+            st.subheader("🌊 本益比／股價淨值比河流圖")
+            river_kind = st.radio("河流圖：", ["本益比 (PE)", "股價淨值比 (PB)"], horizontal=True, key="river_kind")
+            col_r1, col_r2 = st.columns(2)
+            river_period = col_r1.radio("期間：", ["1年", "3年", "5年", "10年", "全部"], index=3, horizontal=True, key="river_period")
+            river_basis = col_r2.radio("倍數帶：", ["目前倍數 ×0.8/1.0/1.2", "期間內歷史倍數 P10/P50/P90"], horizontal=True, key="river_basis")
+            try:
+                is_pe = river_kind.startswith("本益比")
+                column, current_multiple, current_per_share = (
+                    ("eps", info.get("trailingPE"), info.get("trailingEps")) if is_pe
+                    else ("bvps", info.get("priceToBook"), info.get("bookValue"))
+                )
+                start = None if river_period == "全部" else (pd.Timestamp.today() - pd.DateOffset(years=int(river_period[:-1]))).date()
+                # 日線只在有新交易日時附加；讀取時只載入所選期間
+                bars = get_price_history_store().get(ticker, start=start)
+                basis = get_per_share_history(ticker)[["date", column]]
+                if current_per_share:
+                    # 最新一段以目前的 EPS／每股淨值為準
+                    basis = pd.concat([basis, pd.DataFrame({"date": [pd.Timestamp.today().normalize()], column: [float(current_per_share)]})])
+                basis = basis.dropna()
+                if bars is None or bars.empty:
+                    st.info(f"無法取得 {ticker} 的歷史股價。")
+                elif basis.empty:
+                    st.info("缺少歷史 EPS／每股淨值資料，無法繪製河流圖。")
+                elif river_basis.startswith("目前倍數") and not current_multiple:
+                    st.info("缺少目前的本益比／股價淨值比，請改用歷史倍數。")
+                else:
+                    if river_basis.startswith("目前倍數"):
+                        multiples, bands = valuation_bands(bars["date"], basis["date"], basis[column], float(current_multiple))
+                    else:
+                        per_share = as_of(bars["date"], basis["date"], basis[column])
+                        multiples, bands = valuation_bands(bars["date"], basis["date"], basis[column], 1.0, historical_multiples(bars["close"], per_share))
+                    label = "PE" if is_pe else "PB"
+                    show_valuation_river(bars, bands, [f"{label} {m:.1f}倍" for m in multiples], f"{ticker} {label} 河流圖")
+                    st.caption(f"{bars['date'].iloc[0]:%Y-%m-%d} 至 {bars['date'].iloc[-1]:%Y-%m-%d}，共 {len(bars):,} 個交易日；"
+                               "每股數值取各日期當時最近一期財報（台股較早年份取自 Goodinfo! 股利政策表的 EPS），股價為未還原權息的收盤價。")
+            except Exception as e:
+                st.warning(f"繪製河流圖時發生錯誤: {e}")
+
             st.subheader("🔍 手動估值試算")
             tab1, tab2, tab3 = st.tabs(["PE 法", "PB 法", "DCF (簡版)"])
             
@@ -390,21 +435,251 @@ def run_stock_valuation_app():
                         st.warning("無法取得有效的 EPS，無法進行 DCF 估值。")
                     else:
                         future_eps_growth = st.number_input("每年 EPS 成長率 (%)", value=5.0, format="%.2f", key="dcf_growth")
-                        years = st.slider("預估年數", 1, 10, 5, key="dcf_years")
+                        years = st.slider("預估年數", 1, 30, 5, key="dcf_years")
                         discount = st.slider("折現率 (%)", 5.0, 15.0, 10.0, step=0.1, key="dcf_discount")
-                        
-                        eps_list = [default_eps * ((1 + future_eps_growth / 100) ** i) for i in range(1, years + 1)]
+                        include_terminal = st.checkbox("加計永續價值", value=True, key="dcf_terminal")
+                        terminal_growth, fade_years = None, 0
+                        if include_terminal:
+                            tv_col1, tv_col2 = st.columns(2)
+                            with tv_col1:
+                                terminal_growth = st.number_input("永續成長率 (%)", value=2.0, format="%.2f", key="dcf_terminal_growth") / 100
+                            with tv_col2:
+                                fade_years = st.slider("衰退期年數（成長率遞減至永續成長率）", 0, 20, 0, key="dcf_fade_years")
                         discount_rate = discount / 100
-                        
-                        dcf = sum([e / ((1 + discount_rate) ** (i + 1)) for i, e in enumerate(eps_list)])
-                        st.write(f"📌 DCF 預估價值：約 {dcf:.2f}")
+                        dcf_kwargs = {"eps": default_eps, "years": years, "terminal_growth": terminal_growth, "fade_years": fade_years}
+
+                        dcf = float(eps_dcf_value(growth=future_eps_growth / 100, discount=discount_rate, **dcf_kwargs))
+                        if np.isnan(dcf):
+                            st.warning("折現率須大於永續成長率才能計算永續價值。")
+                        else:
+                            st.write(f"📌 DCF 預估價值：約 {dcf:.2f}")
+
+                        if st.checkbox("敏感度分析（折現率 × 成長率）", key="dcf_sensitivity"):
+                            grid_size = st.slider("網格解析度", 20, 400, 200, step=10, key="dcf_grid_size")
+                            discount_rates = np.linspace(0.05, 0.15, grid_size)
+                            growth_rates = np.linspace(future_eps_growth / 100 - 0.05, future_eps_growth / 100 + 0.05, grid_size)
+                            grid = sensitivity_grid(eps_dcf_value, discount_rates, growth_rates, **dcf_kwargs)
+                            show_sensitivity_heatmap(grid, discount_rates, growth_rates, "EPS DCF sensitivity")
+
+                        if st.checkbox("蒙地卡羅模擬", key="dcf_monte_carlo"):
+                            mc_col1, mc_col2, mc_col3 = st.columns(3)
+                            with mc_col1:
+                                growth_std = st.number_input("成長率標準差 (%)", value=2.0, min_value=0.0, format="%.2f", key="dcf_mc_growth_std")
+                            with mc_col2:
+                                discount_std = st.number_input("折現率標準差 (%)", value=1.0, min_value=0.0, format="%.2f", key="dcf_mc_discount_std")
+                            with mc_col3:
+                                n_draws = st.select_slider("模擬次數", [100_000, 200_000, 500_000, 1_000_000], value=100_000, key="dcf_mc_draws")
+                            values = monte_carlo_valuation(
+                                eps_dcf_value, discount_rate, discount_std / 100, future_eps_growth / 100, growth_std / 100,
+                                n_draws=n_draws, seed=0, **dcf_kwargs,
+                            )
+                            show_simulation_summary(values)
                 except Exception as e:
                     st.warning(f"DCF 計算錯誤: {e}")
         else:
             st.info("找不到符合條件的股票，請嘗試其他關鍵字。")
 
 
+# --- 敏感度分析與蒙地卡羅模擬 ---
+def show_sensitivity_heatmap(grid, discount_rates, growth_rates, title, percent=True):
+    """
+    以熱度圖顯示敏感度網格（橫軸成長率、縱軸折現率），並列出目前網格的估值範圍。
+    """
+    scale = 100 if percent else 1
+    st.image(heatmap_chart(
+        grid, np.asarray(growth_rates) * scale, np.asarray(discount_rates) * scale, title,
+        "Growth rate (%)" if percent else "Growth rate", "Discount rate (%)" if percent else "Discount rate",
+    ))
+    finite = grid[np.isfinite(grid)]
+    if len(finite):
+        st.caption(f"網格大小 {grid.shape[0]}×{grid.shape[1]}，估值範圍 {finite.min():,.2f} ～ {finite.max():,.2f}（折現率不大於成長率的組合不計）。")
+
+
+def show_simulation_summary(values):
+    """
+    顯示蒙地卡羅模擬的百分位數表與直方圖。
+    """
+    summary, histogram = summarize_simulation(values)
+    if histogram is None:
+        st.warning("所有模擬情境皆無效（折現率不大於成長率），請調整分配參數。")
+        return
+    st.dataframe(pd.DataFrame(
+        [("有效情境比例", f"{summary['valid_ratio']:.1%}"), ("平均", f"{summary['mean']:,.2f}"), ("標準差", f"{summary['std']:,.2f}")]
+        + [(f"P{p}", f"{summary[f'p{p}']:,.2f}") for p in SIMULATION_PERCENTILES],
+        columns=["統計量", "估值"],
+    ), hide_index=True)
+    counts, edges = histogram
+    st.bar_chart(pd.DataFrame({"次數": counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 2)))
+
+
+# --- 效能監控 ---
+def show_instrumentation_panel():
+    """
+    管理員面板：效能量測開關、最近各次重新執行的階段耗時、網路請求與快取命中率。
+    """
+    st.subheader("效能量測")
+    enabled = st.checkbox(
+        "啟用效能量測（整個伺服器共用；另可設定 EVALUATE_TOOL_PERF_LOG 輸出 JSON 記錄行）",
+        value=instrumentation.is_enabled(), key="comp_perf_enabled"
+    )
+    instrumentation.set_enabled(enabled)
+    runs = instrumentation.history()
+    if not runs:
+        st.caption("尚無量測紀錄。啟用後，之後每次重新執行頁面都會記錄一筆。")
+    else:
+        latest = runs[-1]
+        st.write(f"最近一次重新執行（{latest['name']}）：{latest['ms']:,.1f} ms")
+        st.dataframe(pd.DataFrame([
+            {"階段": stage, "次數": stats["count"], "總耗時 ms": stats["total_ms"], "最長 ms": stats["max_ms"]}
+            for stage, stats in latest["stages"].items()
+        ]), hide_index=True)
+        st.write(f"最近 {len(runs)} 次重新執行的各階段耗時：")
+        st.dataframe(pd.DataFrame([
+            {"階段": stage, "次數": stats["runs"], "p50 ms": stats["p50_ms"], "p95 ms": stats["p95_ms"]}
+            for stage, stats in instrumentation.stage_percentiles(runs).items()
+        ]), hide_index=True)
+
+        counters = {}
+        for run in runs:
+            for key, n in run["counters"].items():
+                counters[key] = counters.get(key, 0) + n
+        network = {}
+        for key, n in counters.items():
+            if key.startswith("net."):
+                source, metric = key[4:].rsplit(".", 1)
+                network.setdefault(source, {"來源": source, "請求次數": 0, "位元組": 0})
+                network[source]["請求次數" if metric == "calls" else "位元組"] += n
+        if network:
+            st.write("網路請求（最近各次重新執行合計）：")
+            st.dataframe(pd.DataFrame(list(network.values())), hide_index=True)
+        if st.button("清除量測紀錄", key="comp_perf_clear"):
+            instrumentation.clear_history()
+            st.rerun()
+
+    st.write("資料快取（伺服器啟動以來）：")
+    st.dataframe(pd.DataFrame([
+        {"快取": name, "筆數": s["size"], "命中": s["hits"], "未命中": s["misses"], "命中率": f"{s['hit_rate']:.1%}", "淘汰": s["evictions"]}
+        for name, s in [(name, cache.stats()) for name, cache in get_data_caches().items()]
+        + [("charts", chart_cache_stats()), ("scenarios", scenario_cache_stats())]
+    ]), hide_index=True)
+    prefetch = get_prefetcher().stats()
+    st.caption(f"搜尋結果預先抓取：進行中 {prefetch['outstanding']} / {prefetch['max_outstanding']}，"
+               f"已送出 {prefetch['submitted']:,}、因達上限略過 {prefetch['skipped']:,}、關鍵字改變而取消 {prefetch['cancelled']:,}。")
+
+
 # --- 工具二：公司&債券評價全功能工具 (專業版) ---
+def reset_comp_inputs(values=None):
+    """
+    以 values（依欄位順序的陣列，省略時全部清空）取代專業版的輸入，並清除各輸入框的文字狀態，重新建立時即顯示新的值。
+    """
+    config = st.session_state.comp_config
+    st.session_state.comp_values = config.empty_inputs() if values is None else np.array(values, dtype=float)
+    for key in config.field_keys:
+        st.session_state.pop(f"comp_{key}", None)
+
+
+def open_in_comprehensive_app(ticker):
+    """
+    切換到專業版，並於專業版載入時以 ticker 的財報帶入欄位。
+    """
+    st.session_state.comp_pending_ticker = ticker
+    st.session_state.app_choice = "公司&債券評價工具 (專業版)"
+
+
+def load_comp_ticker(ticker, period="annual"):
+    """
+    以 ticker 的財報與股價帶入專業版的欄位（FCF 依設定中的 fcf1、fcf2… 欄位數帶入歷年自由現金流），結果訊息存於 comp_load_message。
+    """
+    config = st.session_state.comp_config
+    fcf_keys = [k for k in config.field_keys if k.startswith("fcf") and k[3:].isdigit()]
+    try:
+        values, period_end = load_ticker_fields(ticker, period, len(fcf_keys))
+    except Exception as e:
+        st.session_state.comp_load_message = ("error", f"取得 {ticker} 財報時發生錯誤: {e}")
+        return
+    if not values:
+        st.session_state.comp_load_message = ("warning", f"無法取得 {ticker} 的財報資料，請確認代號是否正確或稍後再試。")
+        return
+    updates = {k: x for k, x in values.items() if k in config.field_index}
+    update_comp_inputs({**dict.fromkeys([*TICKER_FIELDS, *fcf_keys], np.nan), **updates})
+    end = f"（期末 {period_end:%Y-%m-%d}）" if period_end is not None else ""
+    st.session_state.comp_load_message = (
+        "success", f"已帶入 {ticker} {STATEMENT_PERIODS[period]}{end}財報的 {len(updates)} 個欄位；FCF_1～FCF_N 為歷年自由現金流（由舊到新），請依預期調整。"
+    )
+
+
+def update_comp_inputs(updates):
+    """
+    以 {欄位: 數值} 更新專業版的部分輸入（設定中沒有的欄位略過），並清除對應輸入框的文字狀態。
+    """
+    config = st.session_state.comp_config
+    for key, value in updates.items():
+        i = config.field_index.get(key)
+        if i is not None:
+            st.session_state.comp_values[i] = value
+            st.session_state.pop(f"comp_{key}", None)
+
+
+def show_peer_multiples(config):
+    """
+    同業倍數：抓取同業（自訂代號或股票清單中的同產業公司）的估值倍數，彙總後帶入同業評價法的倍數欄位。
+    """
+    source = st.radio("同業來源", ["輸入代號", "依產業（股票清單）"], horizontal=True, key="comp_peer_source")
+    if source == "輸入代號":
+        text = st.text_area("同業代號（以逗號、空白或換行分隔；台股可只填數字代號）", key="comp_peer_tickers",
+                            placeholder="例如：2330, 2303, 2454 或 AAPL MSFT NVDA")
+        tickers = parse_peer_tickers(text)
+    else:
+        universe = universe_tickers(*get_stock_universe_store().load())
+        counts = industry_counts(universe)
+        if not counts:
+            st.info("股票清單沒有產業資料，請先於簡易版的「股票清單資料來源與更新」重新更新股票清單。")
+            return
+        market, industry, _ = st.selectbox(
+            "產業", counts, format_func=lambda c: f"{c[0]}｜{c[1]}（{c[2]:,} 家）", key="comp_peer_industry"
+        )
+        exclude = parse_peer_tickers(st.text_input("排除的代號（例如評價對象本身）", key="comp_peer_exclude"))
+        tickers = industry_peers(universe, industry, market, exclude)["ticker"].tolist()
+    st.caption(f"同業 {len(tickers):,} 家（上限 {MAX_PEERS:,} 家）；已快取的公司不再重新抓取。")
+    if st.button("抓取同業倍數", key="comp_peer_fetch", disabled=not tickers):
+        with st.spinner(f"抓取 {len(tickers):,} 家同業的估值倍數中…"):
+            try:
+                st.session_state.comp_peer_table, failed = fetch_peer_multiples(tickers)
+            except RequestException as e:
+                st.error(f"抓取同業資料時發生網路錯誤: {e}")
+                return
+        if failed:
+            st.warning(f"以下代號無法取得資料：{', '.join(failed)}")
+
+    table = st.session_state.get("comp_peer_table")
+    if table is None or table.empty:
+        return
+    st.dataframe(table.rename(columns={"ticker": "代號", "name": "名稱", **PEER_MULTIPLE_LABELS}).round(2), hide_index=True)
+    summary = peer_summary(table)
+    st.dataframe(summary.rename(columns=PEER_MULTIPLE_LABELS).round(2))
+    method = st.radio("帶入方式", list(PEER_AGGREGATES), format_func=PEER_AGGREGATES.get, horizontal=True, key="comp_peer_method")
+    values = summary.loc[PEER_AGGREGATES[method]]
+    updates = {key: round(float(x), 4) for key, x in values.items() if key in config.field_index and np.isfinite(x)}
+    st.caption("虧損或缺值的公司不列入該倍數；截尾平均兩端各去除 10%。")
+    st.button(
+        f"以{PEER_AGGREGATES[method]}帶入 {len(updates)} 個倍數欄位", key="comp_peer_apply", disabled=not updates,
+        on_click=update_comp_inputs, args=(updates,),
+    )
+
+
+def show_session_memory():
+    """
+    管理員面板：估計本 session 各項目佔用的記憶體（共用的預設設定與已編譯的公式不計入）。
+    """
+    st.subheader("Session 記憶體用量")
+    rows, shared_bytes = session_memory_report(st.session_state.to_dict())
+    st.caption(f"本 session 約 {sum(r['bytes'] for r in rows) / 1024:,.1f} KB；"
+               f"預設設定 {shared_bytes / 1024:,.1f} KB 由所有 session 共用，不計入。")
+    st.dataframe(pd.DataFrame([
+        {"項目": r["key"], "型別": r["type"], "KB": round(r["bytes"] / 1024, 1)} for r in rows
+    ]), hide_index=True)
+
+
 def run_comprehensive_valuation_app():
     """
     執行專業版的公司與債券評價工具。
@@ -415,194 +690,106 @@ def run_comprehensive_valuation_app():
     # 將管理員密碼改為 TBB1840 (大寫)
     ADMIN_PASSWORD = "TBB1840"
 
-    # ====== 預設欄位、公式、評價方法 ======
-    default_fields = [
-        {"name": "股價", "key": "stock_price"}, {"name": "流通股數", "key": "shares"},
-        {"name": "EPS（每股盈餘）", "key": "eps"}, {"name": "淨利（Net Income）", "key": "net_income"},
-        {"name": "本益比（PE倍數）", "key": "pe_ratio"}, {"name": "每股帳面價值", "key": "bvps"},
-        {"name": "股東權益（Equity）", "key": "equity"}, {"name": "本淨比（PB倍數）", "key": "pb_ratio"},
-        {"name": "EBITDA（稅息折舊攤提前獲利）", "key": "ebitda"}, {"name": "EV/EBITDA倍數", "key": "ev_ebitda_ratio"},
-        {"name": "現金（Cash）", "key": "cash"}, {"name": "有息負債（Debt）", "key": "debt"},
-        {"name": "併購價格/案例參考", "key": "precedent_price"},
-        # 新增欄位：預期成長率 (用於 PEG)
-        {"name": "預期成長率（%）", "key": "growth_rate_forward"},
-        # 新增欄位：股價營收比 (P/S)
-        {"name": "股價營收比（P/S 倍數）", "key": "ps_ratio"},
-        # 新增欄位：企業價值/銷售收入比 (EV/Sales)
-        {"name": "企業價值/銷售收入比（EV/Sales 倍數）", "key": "ev_sales_ratio"},
-        # DCF
-        {"name": "FCF_1（第1年自由現金流）", "key": "fcf1"}, {"name": "FCF_2（第2年自由現金流）", "key": "fcf2"},
-        {"name": "FCF_3（第3年自由現金流）", "key": "fcf3"}, {"name": "FCF_4（第4年自由現金流）", "key": "fcf4"},
-        {"name": "FCF_5（第5年自由現金流）", "key": "fcf5"}, {"name": "折現率（Discount Rate, r）", "key": "discount_rate"},
-        {"name": "永續成長率（Perpetual Growth, g）", "key": "perpetual_growth"},
-        # EVA
-        {"name": "稅後營運利潤（NOPAT）", "key": "nopat"}, {"name": "投入資本（Capital）", "key": "capital"},
-        {"name": "資本成本率（Cost of Capital）", "key": "cost_of_capital"},
-        # 盈餘資本化
-        {"name": "預期盈餘", "key": "expected_earnings"}, {"name": "資本化率", "key": "capitalization_rate"},
-        # DDM
-        {"name": "每股股利", "key": "dividend_per_share"}, {"name": "股利成長率", "key": "dividend_growth"},
-        # 資產法
-        {"name": "資產總額", "key": "assets"}, {"name": "負債總額", "key": "liabilities"},
-        {"name": "資產重估值", "key": "revalued_assets"},
-        # 清算
-        {"name": "清算資產", "key": "liquidation_assets"}, {"name": "清算負債", "key": "liquidation_liabilities"},
-        # 創投/私募/特殊
-        {"name": "預期退出市值", "key": "future_valuation"}, {"name": "目標年化報酬率（%）", "key": "target_return_rate"},
-        {"name": "投資年數", "key": "years"}, {"name": "投資金額", "key": "investment"},
-        {"name": "目標倍數", "key": "target_multiple"}, {"name": "換得股權比例（0~1）", "key": "ownership"},
-        {"name": "預期未來每股價", "key": "future_stock_price"},
-        # 分段混合/子事業
-        {"name": "子事業價值1（例：A事業部）", "key": "sub_value1"}, {"name": "子事業價值2（例：B事業部）", "key": "sub_value2"},
-        {"name": "子事業價值3（例：C事業部）", "key": "sub_value3"},
-        # 行業自定
-        {"name": "自定行業指標（例：SaaS_LTV/CAC）", "key": "custom_metric"},
-        # 債券
-        {"name": "債券面額（Face Value）", "key": "bond_face_value"}, {"name": "年票面利率（%）", "key": "bond_coupon_rate"},
-        {"name": "債券現價", "key": "bond_market_price"}, {"name": "每年付息次數", "key": "bond_coupon_freq"},
-        {"name": "到期年數", "key": "bond_years"}, {"name": "市場折現率（YTM, %）", "key": "bond_ytm"},
-        # 互斥防呆專用
-        {"name": "每股營收", "key": "sales_per_share"}, {"name": "營收總額", "key": "sales_total"},
-    ]
+    # 初始化 session_state：設定預設為整個程序共用的唯讀物件，管理員修改時才建立本 session 自己的設定；
+    # 輸入值以依欄位順序排列的 float64 陣列保存
+    if "comp_config" not in st.session_state:
+        st.session_state.comp_config = default_config()
+    config = st.session_state.comp_config
+    field_keys = config.field_keys
+    if "comp_values" not in st.session_state or len(st.session_state.comp_values) != len(field_keys):
+        st.session_state.comp_values = config.empty_inputs()
+    input_values = st.session_state.comp_values
+    if "comp_admin_mode" not in st.session_state:
+        st.session_state.comp_admin_mode = False
+    if "comp_engine" not in st.session_state:
+        st.session_state.comp_engine = FormulaEngine()
+    if "comp_scenarios" not in st.session_state:
+        st.session_state.comp_scenarios = ScenarioSet(field_keys)
+    scenarios = st.session_state.comp_scenarios
+    scenarios.align(field_keys)
 
-    default_formulas = {
-        "market_price": "stock_price * shares if stock_price and shares else None",
-        "pe_comp": "pe_ratio * net_income if pe_ratio and net_income else None",
-        "pb_comp": "pb_ratio * equity if pb_ratio and equity else None",
-        "ev_ebitda_comp": "ev_ebitda_ratio * ebitda + cash - debt if ev_ebitda_ratio and ebitda and cash is not None and debt is not None else None",
-        "precedent_trans": "precedent_price if precedent_price else None",
-        # 新增公式：本益成長比 (PEG)
-        "peg_comp": "(peg_ratio * growth_rate_forward / 100 * eps) if peg_ratio and growth_rate_forward is not None and eps else None",
-        # 新增公式：股價營收比 (P/S)
-        "ps_comp": "ps_ratio * sales_total if ps_ratio and sales_total else None",
-        # 新增公式：企業價值/銷售收入比 (EV/Sales)
-        "ev_sales_comp": "ev_sales_ratio * sales_total if ev_sales_ratio and sales_total else None",
-        "dcf": "sum([fcf1/(1+discount_rate)**1, fcf2/(1+discount_rate)**2, fcf3/(1+discount_rate)**3, fcf4/(1+discount_rate)**4, fcf5/(1+discount_rate)**5]) + (fcf5*(1+perpetual_growth)/(discount_rate-perpetual_growth))/(1+discount_rate)**5 if all(x is not None for x in [fcf1, fcf2, fcf3, fcf4, fcf5, discount_rate, perpetual_growth]) and (discount_rate > perpetual_growth) else None",
-        "eva": "(nopat - capital*cost_of_capital) if nopat and capital and cost_of_capital else None",
-        "cap_earnings": "expected_earnings / capitalization_rate if expected_earnings and capitalization_rate else None",
-        "ddm": "dividend_per_share / (discount_rate - dividend_growth) * shares if dividend_per_share and discount_rate and dividend_growth and shares and (discount_rate > dividend_growth) else None",
-        "book_asset": "assets - liabilities if assets is not None and liabilities is not None else None",
-        "asset_reval": "revalued_assets - liabilities if revalued_assets is not None and liabilities is not None else None",
-        "liquidation": "liquidation_assets - liquidation_liabilities if liquidation_assets is not None and liquidation_liabilities is not None else None",
-        "vc_exit": "future_valuation / (1 + target_return_rate/100)**years if future_valuation and target_return_rate and years else None",
-        "vc_multiple": "investment * target_multiple if investment and target_multiple else None",
-        "vc_equity": "investment / ownership if investment and ownership else None",
-        "vc_rev_valuation": "future_stock_price * shares / (1 + target_return_rate/100)**years if future_stock_price and shares and target_return_rate and years else None",
-        "real_option": "None",
-        "sotp": "sum(filter(None, [sub_value1, sub_value2, sub_value3]))",
-        "custom_industry": "custom_metric if custom_metric else None",
-        "bond_pv": "(sum([bond_face_value * bond_coupon_rate / bond_coupon_freq / 100 / (1 + bond_ytm/100/bond_coupon_freq) ** (i+1) for i in range(int(bond_years * bond_coupon_freq))]) + bond_face_value / (1 + bond_ytm/100/bond_coupon_freq) ** (bond_years * bond_coupon_freq)) if all(x is not None for x in [bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_ytm, bond_years]) else None",
-        "bond_current_yield": "(bond_face_value * bond_coupon_rate / 100) / bond_market_price if bond_face_value and bond_coupon_rate and bond_market_price else None",
-        "bond_par_value": "bond_face_value if bond_face_value else None",
-        "bond_ytm_info": "'到期殖利率(YTM)為使債券現值等於市價時的折現率，通常需用專業計算器或Excel IRR求解'",
-        "sales_total_autofill": "sales_per_share * shares if sales_per_share and shares and not sales_total else sales_total if sales_total else None",
-    }
+    # ====== 情境管理 ======
+    def save_scenario():
+        name = st.session_state.comp_scenario_name.strip()
+        if name:
+            scenarios.save(name, input_values)
+            st.session_state.comp_scenario_selected = name
+            compared = st.session_state.get("comp_scenario_compare")
+            if compared is not None and name not in compared:
+                st.session_state.comp_scenario_compare = compared + [name]
 
-    default_methods = [
-        {"name": "市價法", "key": "market_price"}, {"name": "同業PE倍數法", "key": "pe_comp"},
-        {"name": "同業PB倍數法", "key": "pb_comp"}, {"name": "同業EV/EBITDA", "key": "ev_ebitda_comp"},
-        # 新增方法：本益成長比法 (PEG)
-        {"name": "本益成長比法（PEG）", "key": "peg_comp"},
-        # 新增方法：股價營收比法 (P/S)
-        {"name": "股價營收比法（P/S）", "key": "ps_comp"},
-        # 新增方法：企業價值/銷售收入比法 (EV/Sales)
-        {"name": "企業價值/銷售收入比法（EV/Sales）", "key": "ev_sales_comp"},
-        {"name": "併購交易法", "key": "precedent_trans"}, {"name": "DCF現金流折現法", "key": "dcf"},
-        {"name": "EVA經濟附加價值法", "key": "eva"}, {"name": "盈餘資本化法", "key": "cap_earnings"},
-        {"name": "股利折現法(DDM)", "key": "ddm"}, {"name": "帳面資產法", "key": "book_asset"},
-        {"name": "資產重估法", "key": "asset_reval"}, {"name": "清算價值法", "key": "liquidation"},
-        {"name": "創投-回推法", "key": "vc_exit"}, {"name": "創投-倍數法", "key": "vc_multiple"},
-        {"name": "創投-股權分割法", "key": "vc_equity"}, {"name": "創投-市值倒推法", "key": "vc_rev_valuation"},
-        {"name": "選擇權定價法", "key": "real_option"}, {"name": "分段混合法SOTP", "key": "sotp"},
-        {"name": "行業自定指標", "key": "custom_industry"},
-        # 債券
-        {"name": "債券現值法（DCF）", "key": "bond_pv"}, {"name": "當期殖利率法", "key": "bond_current_yield"},
-        {"name": "平價法", "key": "bond_par_value"}, {"name": "YTM說明", "key": "bond_ytm_info"},
-        # 新增：營收總額自動計算結果也展示
-        {"name": "營收總額(自動計算)", "key": "sales_total_autofill"},
-    ]
+    def load_scenario():
+        reset_comp_inputs(scenarios.get(st.session_state.comp_scenario_selected))
 
-    # 初始化 session_state
-    if "comp_fields" not in st.session_state:
-        st.session_state.comp_fields = default_fields.copy()
-    if "comp_formulas" not in st.session_state:
-        st.session_state.comp_formulas = default_formulas.copy()
-    if "comp_methods" not in st.session_state:
-        st.session_state.comp_methods = default_methods.copy()
-    if "comp_inputs" not in st.session_state:
-        st.session_state.comp_inputs = {f['key']: "" for f in st.session_state.comp_fields}
-    if "comp_admin_mode" not in st.session_state:
-        st.session_state.comp_admin_mode = False
+    def delete_scenario():
+        name = st.session_state.comp_scenario_selected
+        scenarios.delete(name)
+        compared = st.session_state.get("comp_scenario_compare")
+        if compared is not None:
+            st.session_state.comp_scenario_compare = [n for n in compared if n != name]
 
-    def safe_float(val):
-        try:
-            return float(str(val).replace(',', '').replace(' ', ''))
-        except (ValueError, TypeError):
-            return None
+    # ====== 由股票代號帶入財報 ======
+    # 自簡易版切換過來時，於建立輸入框之前先帶入財報
+    pending = st.session_state.pop("comp_pending_ticker", None)
+    if pending:
+        st.session_state.comp_load_ticker = pending
+        with st.spinner(f"載入 {pending} 的財報中…"):
+            load_comp_ticker(pending, st.session_state.get("comp_load_period", "annual"))
+
+    def load_ticker():
+        ticker = normalize_ticker(st.session_state.comp_load_ticker)
+        if ticker:
+            load_comp_ticker(ticker, st.session_state.comp_load_period)
 
-    # ====== 欄位輸入 ======
     st.sidebar.header("專業版：請輸入評價資料")
-    for f in st.session_state.comp_fields:
-        val = st.sidebar.text_input(
-            f['name'],
-            value=st.session_state.comp_inputs.get(f['key'], ""),
-            key=f"comp_{f['key']}"
-        )
-        st.session_state.comp_inputs[f['key']] = val
+    with st.sidebar.expander("由股票代號帶入財報", expanded=bool(pending)):
+        st.text_input("股票代號（台股可只填數字代號）", key="comp_load_ticker", placeholder="例如：2330 或 AAPL")
+        st.radio("財報期間", list(STATEMENT_PERIODS), format_func=STATEMENT_PERIODS.get, horizontal=True, key="comp_load_period")
+        st.button("帶入財報", key="comp_load_apply", on_click=load_ticker)
+        message = st.session_state.get("comp_load_message")
+        if message:
+            getattr(st, message[0])(message[1])
+    with st.sidebar.expander("情境管理（基本/樂觀/悲觀等）", expanded=False):
+        st.text_input("情境名稱", key="comp_scenario_name", placeholder="例如：基本、樂觀、悲觀")
+        st.button("將目前輸入存為情境", key="comp_scenario_save", on_click=save_scenario)
+        if len(scenarios):
+            st.selectbox("已存情境", scenarios.names, key="comp_scenario_selected")
+            load_col, delete_col = st.columns(2)
+            with load_col:
+                st.button("載入", key="comp_scenario_load", on_click=load_scenario)
+            with delete_col:
+                st.button("刪除", key="comp_scenario_delete", on_click=delete_scenario)
+
+    # ====== 欄位輸入 ======
+    # 輸入框的文字由 Streamlit 保存；每次重新執行時解析並直接寫入輸入陣列
+    for i, f in enumerate(config.fields):
+        widget_key = f"comp_{f['key']}"
+        if widget_key not in st.session_state:
+            st.session_state[widget_key] = format_input(input_values[i])
+        x = safe_float(st.sidebar.text_input(f['name'], key=widget_key))
+        input_values[i] = np.nan if x is None else x
+    v = array_to_values(field_keys, input_values)
 
     # ====== 互斥防呆提醒 ======
-    if (st.session_state.comp_inputs.get("sales_per_share") and st.session_state.comp_inputs.get("sales_total")):
+    if v.get("sales_per_share") and v.get("sales_total"):
         st.warning("⚠️ 請勿同時填寫『每股營收』與『營收總額』，僅需擇一輸入！如都填將以『營收總額』為主計算。")
-    elif (st.session_state.comp_inputs.get("sales_per_share") and st.session_state.comp_inputs.get("shares")):
-        try:
-            auto_sales_total = float(st.session_state.comp_inputs["sales_per_share"]) * float(st.session_state.comp_inputs["shares"])
-            st.info(f"自動計算營收總額：{auto_sales_total:,.0f}（僅供參考，如已填『營收總額』則以輸入值為主）")
-        except:
-            pass
+    elif v.get("sales_per_share") and v.get("shares"):
+        auto_sales_total = v["sales_per_share"] * v["shares"]
+        st.info(f"自動計算營收總額：{auto_sales_total:,.0f}（僅供參考，如已填『營收總額』則以輸入值為主）")
 
     # ====== 公式計算 ======
-    def parse_variables(expr):
-        reserved = set(['if', 'else', 'None', 'sum', 'lambda', 'range', 'float', 'int', 'str', 'for', 'in', 'True', 'False', 'filter'])
-        found = set(re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', expr))
-        return found - reserved
-
-    v = {f['key']: safe_float(st.session_state.comp_inputs.get(f['key'], "")) for f in st.session_state.comp_fields}
-    
-    formulas = st.session_state.comp_formulas.copy()
-    dependencies = {k: parse_variables(expr) for k, expr in formulas.items()}
-
-    def topo_evaluate(formulas, v):
-        result = v.copy()
-        pending = set(formulas.keys())
-        error_msgs = {}
-        max_iter = len(formulas) + 5
-        iter_count = 0
-        while pending and iter_count < max_iter:
-            evaluated_this_round = False
-            for k in list(pending):
-                deps = dependencies.get(k, set())
-                if deps.issubset(result.keys()):
-                    try:
-                        result[k] = eval(formulas[k], {"__builtins__": {}}, result)
-                        evaluated_this_round = True
-                    except Exception as e:
-                        result[k] = None
-                        error_msgs[k] = f"公式錯誤：{str(e)}"
-                    pending.remove(k)
-            if not evaluated_this_round and pending: # 避免無限循環
-                break
-            iter_count += 1
-        for k in pending:
-            error_msgs[k] = "欄位依賴未解決（可能有循環或公式錯誤/不存在欄位）"
-            result[k] = None
-        return result, error_msgs
-
-    results, error_msgs = topo_evaluate(formulas, v)
+    # 公式引擎保存在 session 中，公式只編譯一次，並只重算受輸入變動影響的公式；
+    # 相同公式與輸入（例如切換回先前的情境）的結果直接取自快取
+    engine = st.session_state.comp_engine
+    engine.set_formulas(config.formulas)
+    formulas_key = config.formulas_key
+    with instrumentation.timed("topo_evaluate"):
+        results, error_msgs = evaluate_inputs(engine, field_keys, input_values, formulas_key)
 
     st.subheader("公司與債券評價方法總覽")
     df = pd.DataFrame([
         {"評價方法": m["name"], "估值（元/比率/說明）": (f"{results.get(m['key']):,.4f}" if isinstance(results.get(m['key']), (int, float)) else str(results.get(m['key'], '')))}
-        for m in st.session_state.comp_methods
+        for m in config.methods
     ])
     st.table(df)
 
@@ -611,31 +798,135 @@ def run_comprehensive_valuation_app():
         for k, msg in error_msgs.items():
             st.write(f"【{k}】：{msg}")
 
+    # ====== 情境比較 ======
+    if len(scenarios):
+        with st.expander(f"情境比較（已存 {len(scenarios)} 個情境）", expanded=False):
+            if "comp_scenario_compare" not in st.session_state:
+                st.session_state.comp_scenario_compare = scenarios.names
+            compare_names = st.multiselect("比較的情境", scenarios.names, key="comp_scenario_compare")
+            if compare_names:
+                table, _ = compare_scenarios(engine, field_keys, config.methods, scenarios, compare_names, formulas_key)
+                st.dataframe(table.map(
+                    lambda x: "" if x is None or (isinstance(x, float) and np.isnan(x)) else (f"{x:,.4f}" if isinstance(x, (int, float)) else str(x))
+                ))
+
+    # ====== 同業倍數 ======
+    with st.expander("同業倍數（自動帶入同業 PE/PB/EV/EBITDA/P/S/EV/Sales 倍數）", expanded=False):
+        show_peer_multiples(config)
+
     # ====== 功能按鈕 ======
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("一鍵清除所有輸入", key="comp_clear"):
-            st.session_state.comp_inputs = {f['key']: "" for f in st.session_state.comp_fields}
-            st.rerun()
+        st.button("一鍵清除所有輸入", key="comp_clear", on_click=reset_comp_inputs)
     with col2:
-        output = io.BytesIO()
-        try:
-            with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-                df_input = pd.DataFrame([(f['name'], st.session_state.comp_inputs.get(f['key'], "")) for f in st.session_state.comp_fields], columns=["項目", "輸入值"])
-                df_out = df.copy()
-                df_input.to_excel(writer, sheet_name="輸入數據", index=False)
-                df_out.to_excel(writer, sheet_name="評價總表", index=False)
-            
+        if importlib.util.find_spec("xlsxwriter") is None:
+            st.error("匯出 Excel 需要 'xlsxwriter' 套件。請執行 `pip install xlsxwriter` 安裝。")
+        else:
+            df_input = pd.DataFrame([(f['name'], format_input(x)) for f, x in zip(config.fields, input_values)], columns=["項目", "輸入值"])
+            df_out = df.copy()
+            # 報告於按下按鈕時才產生，並依內容雜湊快取
             st.download_button(
                 label="匯出Excel報告",
-                data=output.getvalue(),
+                data=lambda: excel_report({"輸入數據": df_input, "評價總表": df_out}),
                 file_name="公司債券評價結果.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                mime=EXPORT_FORMATS["xlsx"][0]
             )
-        except ImportError:
-            st.error("匯出 Excel 需要 'xlsxwriter' 套件。請執行 `pip install xlsxwriter` 安裝。")
-        except Exception as e:
-            st.error(f"匯出 Excel 時發生錯誤: {e}")
+
+    # ====== 敏感度分析與蒙地卡羅模擬 ======
+    with st.expander("DCF / DDM 敏感度分析與蒙地卡羅模擬", expanded=False):
+        model = st.radio("模型", ["DCF現金流折現法", "股利折現法(DDM)"], horizontal=True, key="comp_sens_model")
+        base_r = v.get("discount_rate")
+        if model == "DCF現金流折現法":
+            base_g = v.get("perpetual_growth")
+            ready = v.get("fcf1") is not None and base_r is not None and base_g is not None
+            # 依年度取 fcf1、fcf2…（可只填前幾年；新增 fcf6 等欄位即延長預測期），之後接續多階段成長
+            fcf_keys = sorted((k for k in field_keys if k.startswith("fcf") and k[3:].isdigit()), key=lambda k: int(k[3:]))
+            cash_flows = [v.get(k) for k in fcf_keys]
+            value_func, kwargs = dcf_value, {
+                "cash_flows": np.array([np.nan if x is None else x for x in cash_flows], dtype=float),
+                "high_growth": v.get("high_growth"), "high_years": v.get("high_growth_years"), "fade_years": v.get("fade_years"),
+            }
+        else:
+            base_g = v.get("dividend_growth")
+            ready = all(x is not None for x in [v.get("dividend_per_share"), v.get("shares"), base_r, base_g])
+            value_func, kwargs = ddm_value, {
+                "dividend": v.get("dividend_per_share"), "shares": v.get("shares"), "high_growth": v.get("dividend_high_growth"),
+                "high_years": v.get("dividend_high_years"), "fade_years": v.get("dividend_fade_years"),
+            }
+        if not ready:
+            st.info("請先在左側填寫此模型所需的欄位（DCF：至少 FCF_1、折現率、永續成長率；DDM：每股股利、流通股數、折現率、股利成長率；高成長期與衰退期可選填）。")
+        else:
+            sens_tab, mc_tab = st.tabs(["敏感度網格", "蒙地卡羅模擬"])
+            with sens_tab:
+                grid_col1, grid_col2 = st.columns(2)
+                with grid_col1:
+                    spread = st.number_input("上下變動幅度（小數，例如 0.03）", value=0.03, min_value=0.001, format="%.3f", key="comp_sens_spread")
+                with grid_col2:
+                    grid_size = st.slider("網格解析度", 20, 400, 200, step=10, key="comp_sens_grid_size")
+                discount_rates = np.linspace(base_r - spread, base_r + spread, grid_size)
+                growth_rates = np.linspace(base_g - spread, base_g + spread, grid_size)
+                grid = sensitivity_grid(value_func, discount_rates, growth_rates, **kwargs)
+                show_sensitivity_heatmap(grid, discount_rates, growth_rates, "DCF sensitivity" if value_func is dcf_value else "DDM sensitivity")
+            with mc_tab:
+                mc_col1, mc_col2, mc_col3 = st.columns(3)
+                with mc_col1:
+                    discount_std = st.number_input("折現率標準差（小數）", value=0.01, min_value=0.0, format="%.4f", key="comp_mc_discount_std")
+                with mc_col2:
+                    growth_std = st.number_input("成長率標準差（小數）", value=0.005, min_value=0.0, format="%.4f", key="comp_mc_growth_std")
+                with mc_col3:
+                    n_draws = st.select_slider("模擬次數", [100_000, 200_000, 500_000, 1_000_000], value=100_000, key="comp_mc_draws")
+                values = monte_carlo_valuation(value_func, base_r, discount_std, base_g, growth_std, n_draws=n_draws, seed=0, **kwargs)
+                show_simulation_summary(values)
+
+    # ====== 批次評價 ======
+    with st.expander("批次評價（上傳多家公司 CSV/Excel）", expanded=False):
+        st.caption("每一列為一家公司，欄位名稱請使用欄位代碼（如 stock_price）或左側欄位中文名稱；其他欄位（如公司名稱）會原樣保留在結果表。")
+        st.caption("大量資料（數十萬筆以上）請使用命令列：`python -m valuation_core batch --config 設定檔.json --input 公司清單.csv --output 結果.csv`")
+        template_csv = ",".join(field_keys) + "\n"
+        st.download_button(
+            label="下載批次輸入範本",
+            data=template_csv.encode("utf-8-sig"),
+            file_name="批次評價範本.csv",
+            mime="text/csv",
+            key="comp_batch_template"
+        )
+        batch_file = st.file_uploader("上傳公司清單", type=["csv", "xlsx", "xls"], key="comp_batch_upload")
+        if batch_file:
+            try:
+                # 批次結果依上傳內容與設定的雜湊保存於 session，調整其他元件時不重新計算
+                batch_key = hashlib.sha256(batch_file.getvalue() + json.dumps(config.to_dict(), ensure_ascii=False).encode("utf-8")).hexdigest()
+                cached = st.session_state.get("comp_batch_cache")
+                if cached and cached[0] == batch_key:
+                    batch_results, batch_errors = cached[1], cached[2]
+                else:
+                    if batch_file.name.lower().endswith(".csv"):
+                        batch_df = pd.read_csv(batch_file)
+                    else:
+                        batch_df = pd.read_excel(batch_file)
+                    batch_results, batch_errors = run_batch_valuation(batch_df, config.fields, config.formulas, config.methods)
+                    st.session_state.comp_batch_cache = (batch_key, batch_results, batch_errors)
+                st.write(f"共 {len(batch_results):,} 家公司完成評價。")
+                st.dataframe(batch_results)
+                if batch_errors and st.session_state.comp_admin_mode:
+                    st.error("⚠️ 有公式錯誤或依賴問題如下：")
+                    for k, msg in batch_errors.items():
+                        st.write(f"【{k}】：{msg}")
+                export_options = {"CSV": "csv", "Excel": "xlsx", "Parquet": "parquet"}
+                if len(batch_results) >= MAX_EXCEL_ROWS:
+                    export_options.pop("Excel")
+                    st.caption(f"結果超過 Excel 上限 {MAX_EXCEL_ROWS - 1:,} 筆，請以 CSV 或 Parquet 下載。")
+                export_label = st.radio("下載格式", list(export_options), horizontal=True, key="comp_batch_format")
+                export_format = export_options[export_label]
+                # 檔案於按下下載時才產生
+                st.download_button(
+                    label=f"下載批次評價結果({export_label})",
+                    data=lambda: cached_export(batch_results, export_format),
+                    file_name=f"批次評價結果.{EXPORT_FORMATS[export_format][1]}",
+                    mime=EXPORT_FORMATS[export_format][0],
+                    key="comp_batch_download"
+                )
+            except Exception as e:
+                st.error(f"批次評價時發生錯誤: {e}")
 
     # ====== 管理員功能 ======
     with st.expander("管理員功能（欄位/公式/匯出/還原）", expanded=False):
@@ -659,26 +950,31 @@ def run_comprehensive_valuation_app():
             
             st.markdown("### 欄位與公式管理")
             # 編輯公式
-            st.subheader("公式管理（可即時修改）")
-            for k in st.session_state.comp_formulas:
-                new_formula = st.text_area(f"{k} 公式", value=st.session_state.comp_formulas[k], key=f"formula_{k}", height=50)
-                st.session_state.comp_formulas[k] = new_formula
-            
+            st.subheader("公式管理（儲存時檢查）")
+            st.caption("公式僅可使用運算式、條件式、串列與 sum/all/filter/range/int 等白名單函式；屬性存取、索引與 lambda 等語法會被拒絕。")
+            draft_formulas = {}
+            for k in config.formulas:
+                draft_formulas[k] = st.text_area(f"{k} 公式", value=config.formulas[k], key=f"formula_{k}", height=50)
+
             if st.button("儲存所有公式變更", key="comp_save_formulas"):
-                st.success("已更新公式！")
-                st.rerun()
+                # 公式於儲存時即檢查並編譯，未通過檢查的公式不會寫入設定
+                formula_errors = validate_formulas(draft_formulas)
+                if formula_errors:
+                    st.error("以下公式未通過檢查，所有變更皆未儲存：")
+                    for k, msg in formula_errors.items():
+                        st.write(f"【{k}】：{msg}")
+                else:
+                    # 修改時才建立本 session 自己的設定，欄位與評價方法仍沿用原物件
+                    st.session_state.comp_config = config.with_formulas(draft_formulas)
+                    st.success("已更新公式！")
+                    st.rerun()
 
             st.markdown("---")
             # 匯出/還原設定
             st.subheader("設定檔匯出與還原")
             now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
             
-            config_data = {
-                "fields": st.session_state.comp_fields,
-                "formulas": st.session_state.comp_formulas,
-                "methods": st.session_state.comp_methods
-            }
-            config_json = json.dumps(config_data, ensure_ascii=False, indent=2)
+            config_json = json.dumps(config.to_dict(), ensure_ascii=False, indent=2)
             st.download_button(
                 label=f"下載當前完整設定檔",
                 data=io.BytesIO(config_json.encode("utf-8")),
@@ -690,12 +986,15 @@ def run_comprehensive_valuation_app():
             if uploaded_file:
                 try:
                     data = json.load(uploaded_file)
-                    if "fields" in data and "formulas" in data and "methods" in data:
-                        st.session_state.comp_fields = data["fields"]
-                        st.session_state.comp_formulas = data["formulas"]
-                        st.session_state.comp_methods = data["methods"]
+                    formula_errors = validate_formulas(data.get("formulas", {}))
+                    if formula_errors:
+                        st.error("設定檔中的公式未通過檢查，未還原：")
+                        for k, msg in formula_errors.items():
+                            st.write(f"【{k}】：{msg}")
+                    elif "fields" in data and "formulas" in data and "methods" in data:
+                        st.session_state.comp_config = ValuationConfig(data["fields"], data["formulas"], data["methods"])
                         # 重置輸入以匹配新欄位
-                        st.session_state.comp_inputs = {f['key']: "" for f in st.session_state.comp_fields}
+                        reset_comp_inputs()
                         st.success("設定檔已成功還原！頁面將重新整理。")
                         st.rerun()
                     else:
@@ -704,13 +1003,110 @@ def run_comprehensive_valuation_app():
                     st.error(f"上傳或解析錯誤：{e}")
 
             if st.button("還原為系統預設值", key="comp_restore_default"):
-                st.session_state.comp_fields = default_fields.copy()
-                st.session_state.comp_formulas = default_formulas.copy()
-                st.session_state.comp_methods = default_methods.copy()
-                st.session_state.comp_inputs = {f['key']: "" for f in st.session_state.comp_fields}
+                st.session_state.comp_config = default_config()
+                reset_comp_inputs()
                 st.success("已還原為系統預設值！")
                 st.rerun()
 
+            st.markdown("---")
+            show_session_memory()
+            show_instrumentation_panel()
+
+# --- 工具三：批次選股 ---
+# 快照表欄位的顯示名稱
+SCREENER_LABELS = {
+    "market": "市場", "code": "代號", "name": "名稱", "currentPrice": "股價", "trailingPE": "本益比",
+    "trailingEps": "EPS", "bookValue": "每股淨值", "priceToBook": "股價淨值比", "dividendRate": "每股股利",
+    "fiveYearAvgDividendYield": "五年平均殖利率%", "pegRatio": "PEG",
+}
+
+
+def run_screener_app():
+    """
+    執行批次選股：抓取整份股票清單的基本面並計算估值欄位，於本機快照上即時篩選與排序。
+    """
+    st.header("批次選股 (台股＋S&P 500)")
+    st.markdown("---")
+
+    taiwan_df, us_df = get_stock_universe_store().load()
+    screener = get_screener_store()
+    markets = st.multiselect("市場：", ["台股", "美股"], default=["台股", "美股"], key="screener_markets")
+    universe = universe_tickers(taiwan_df, us_df, markets)
+
+    @st.fragment(run_every=2)
+    def show_refresh_status():
+        # 背景更新期間每兩秒更新進度；更新結束時重新執行整頁以顯示最新結果
+        if screener.refreshing:
+            done, total = screener.progress
+            st.progress(done / total if total else 0.0, text=f"抓取基本面中… {done:,} / {total:,}（失敗 {screener.errors:,} 檔）")
+            if st.button("停止更新", key="screener_cancel"):
+                screener.cancel()
+            st.session_state.screener_was_refreshing = True
+        elif st.session_state.get("screener_was_refreshing"):
+            st.session_state.screener_was_refreshing = False
+            st.rerun(scope="app")
+
+    table = screener.load()
+    stale = screener.stale_tickers(universe)
+    if screener.updated_at is not None:
+        st.caption(f"快照共 {len(table):,} 檔，最後更新：{datetime.fromtimestamp(screener.updated_at):%Y-%m-%d %H:%M:%S}；"
+                   f"所選市場中 {len(stale):,} 檔尚未抓取或已過期。")
+    else:
+        st.caption(f"尚未建立基本面快照；所選市場共 {len(universe):,} 檔。")
+    col_a, col_b = st.columns(2)
+    if col_a.button(f"更新過期的基本面（{len(stale):,} 檔）", disabled=screener.refreshing or stale.empty, key="screener_refresh_stale"):
+        screener.refresh_async(stale)
+        st.rerun()
+    if col_b.button("全部重新抓取", disabled=screener.refreshing or universe.empty, key="screener_refresh_all"):
+        screener.refresh_async(universe)
+        st.rerun()
+    st.caption("基本面來自 yfinance，逐檔抓取並限制每秒請求數；數千檔約需數分鐘，完成的部分會逐步出現在下表。")
+    show_refresh_status()
+
+    if table.empty:
+        st.info("快照中尚無資料，請先更新基本面。")
+        return
+
+    st.subheader("篩選條件")
+    keyword = st.text_input("代號或名稱包含：", key="screener_keyword")
+    c1, c2, c3 = st.columns(3)
+    pe_max = c1.number_input("本益比上限", min_value=0.0, value=None, key="screener_pe_max")
+    pb_max = c2.number_input("股價淨值比上限", min_value=0.0, value=None, key="screener_pb_max")
+    yield_min = c3.number_input("殖利率% 下限", min_value=0.0, value=None, key="screener_yield_min")
+    c4, c5, c6 = st.columns(3)
+    graham_gap_min = c4.number_input("葛拉漢價差% 下限", value=None, key="screener_graham_gap_min")
+    div_gap_min = c5.number_input("股利回推價差% 下限", value=None, key="screener_div_gap_min")
+    peg_max = c6.number_input("PEG 上限", min_value=0.0, value=None, key="screener_peg_max")
+    ranges = {
+        "trailingPE": (0.0 if pe_max is not None else None, pe_max),
+        "priceToBook": (None, pb_max),
+        "殖利率%": (yield_min, None),
+        "葛拉漢價差%": (graham_gap_min, None),
+        "股利回推價差%": (div_gap_min, None),
+        "pegRatio": (0.0 if peg_max is not None else None, peg_max),
+    }
+    ranges = {k: r for k, r in ranges.items() if r != (None, None)}
+
+    display_columns = [
+        "market", "code", "name", "currentPrice", "trailingPE", "trailingEps", "bookValue", "priceToBook", "pegRatio",
+        "殖利率%", "PE合理價(低)", "PE合理價", "PE合理價(高)", "葛拉漢數字", "葛拉漢價差%", "股利回推價", "股利回推價差%",
+    ]
+    c7, c8 = st.columns([3, 1])
+    sort_by = c7.selectbox("排序欄位：", display_columns[3:], index=display_columns.index("葛拉漢價差%") - 3,
+                           format_func=lambda c: SCREENER_LABELS.get(c, c), key="screener_sort_by")
+    ascending = c8.checkbox("由小到大", value=False, key="screener_ascending")
+
+    with instrumentation.timed("screener.filter"):
+        result = apply_screen(table[table["market"].isin(markets)], ranges, keyword, sort_by=sort_by, ascending=ascending)
+    st.caption(f"符合條件：{len(result):,} / {int(table['market'].isin(markets).sum()):,} 檔")
+    shown = result[display_columns].rename(columns=SCREENER_LABELS)
+    st.dataframe(shown.round(2), hide_index=True)
+    st.download_button(
+        "下載篩選結果 (CSV)", data=lambda: cached_export(shown, "csv"),
+        file_name=f"screener_{datetime.now():%Y%m%d}.csv", mime=EXPORT_FORMATS["csv"][0], key="screener_download",
+    )
+
+
 # --- 主應用程式選擇邏輯 ---
 # 初始化 session_state
 if 'app_choice' not in st.session_state:
@@ -724,9 +1120,15 @@ if st.sidebar.button("股票估值工具 (簡易版)", use_container_width=True)
 if st.sidebar.button("公司&債券評價工具 (專業版)", use_container_width=True):
     st.session_state.app_choice = "公司&債券評價工具 (專業版)"
 
+if st.sidebar.button("批次選股 (台股＋S&P 500)", use_container_width=True):
+    st.session_state.app_choice = "批次選股 (台股＋S&P 500)"
+
 
-# 根據選擇顯示對應的應用程式
-if st.session_state.app_choice == "股票估值工具 (簡易版)":
-    run_stock_valuation_app()
-elif st.session_state.app_choice == "公司&債券評價工具 (專業版)":
-    run_comprehensive_valuation_app()
+# 根據選擇顯示對應的應用程式（啟用效能量測時，每次重新執行彙整為一筆紀錄）
+with instrumentation.record_run(st.session_state.app_choice):
+    if st.session_state.app_choice == "股票估值工具 (簡易版)":
+        run_stock_valuation_app()
+    elif st.session_state.app_choice == "公司&債券評價工具 (專業版)":
+        run_comprehensive_valuation_app()
+    elif st.session_state.app_choice == "批次選股 (台股＋S&P 500)":
+        run_screener_app()
@@ -0,0 +1,88 @@
+"""
+公式白名單檢查與資源上限：會耗盡記憶體或時間的公式須被拒絕，一般公式不受影響；批次（向量化）計算須與逐筆計算一致。
+"""
+import pytest
+
+from valuation_core.formulas import (
+    MAX_FORMULA_RANGE, MAX_FORMULA_SEQUENCE, FormulaEngine, compile_formula, topo_evaluate, validate_formula,
+    validate_formulas,
+)
+
+
+@pytest.mark.parametrize("expr", [
+    "[x for a in range(10000) for x in range(10000)]",
+    "sum(x for a in range(100) for x in range(100))",
+    "[[y for y in range(3)] for x in range(3)]",
+    "sum(x for x in [y for y in range(3)])",
+    "a.__class__",
+    "open('x')",
+    "(lambda: 1)()",
+])
+def test_validator_rejects(expr):
+    with pytest.raises(ValueError):
+        validate_formula(expr)
+
+
+@pytest.mark.parametrize("expr", [
+    "[0]*10**9",
+    "10**9*[0]",
+    "str(1)*10**9",
+    f"'ab'*{MAX_FORMULA_SEQUENCE}",
+    "[0]*n",
+    "len(range(10**9))",
+    "sum([[0] for i in range(10)], [])",
+    "(n**2)**10000",
+])
+def test_runtime_limits(expr):
+    formula = compile_formula(expr)
+    with pytest.raises(ValueError):
+        formula({"n": 10**9})
+
+
+def test_constant_overflow_rejected_at_compile():
+    assert set(validate_formulas({"a": "2**100000", "b": "(10**10000)**10000", "c": "2**10"})) == {"a", "b"}
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("a * b", 6.0),
+    ("sum(x * 2 for x in range(10))", 90),
+    (f"len([0] * {MAX_FORMULA_SEQUENCE})", MAX_FORMULA_SEQUENCE),
+    ("len('-' * 50)", 50),
+    (f"len(range({MAX_FORMULA_RANGE}))", MAX_FORMULA_RANGE),
+    ("sum([1, 2], 0.5)", 3.5),
+    ("2 ** 10 * 3", 3072),
+    ("a * b if a else 0", 6.0),
+])
+def test_allowed_formulas(expr, expected):
+    assert compile_formula(expr)({"a": 2.0, "b": 3.0}) == expected
+
+
+def test_vector_multiplication_of_text_is_bounded():
+    import numpy as np
+
+    vector = compile_formula("a * b").vector
+    assert list(vector(np.array(["x"], dtype=object), np.array([3]))) == ["xxx"]
+    with pytest.raises(ValueError):
+        vector(np.array(["x"], dtype=object), np.array([10**6]))
+
+
+@pytest.mark.parametrize("expr", ["max(a, b, z)", "min(a, b, z)", "max(a, b, c, z)", "min(z, c)", "max(a, 3, z)", "int(a)"])
+def test_batch_matches_scalar(expr):
+    import numpy as np
+
+    formulas = {"z": "a * 10", "r": expr}
+    columns = {"a": np.array([1.0, 5.0, -2.0]), "b": np.array([2.0, 3.0, -1.0]), "c": np.array([9.0, 9.0, 9.0])}
+    original = {k: v.copy() for k, v in columns.items()}
+    results, errors = FormulaEngine(formulas).evaluate_batch(columns, 3)
+    assert not errors
+    for i in range(3):
+        scalar, _ = topo_evaluate(formulas, {k: float(v[i]) for k, v in original.items()})
+        assert results["z"][i] == scalar["z"] and results["r"][i] == scalar["r"]
+    # 輸入欄位不得被改寫
+    assert all(np.array_equal(columns[k], original[k]) for k in columns)
+
+
+def test_min_max_vectorization():
+    assert compile_formula("max(a, b, c)").vector is not None
+    assert compile_formula("max(a)").vector is None
+    assert compile_formula("int(a)").vector is None
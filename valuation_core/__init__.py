@@ -0,0 +1,60 @@
+"""
+估值核心函式庫：公式引擎、批次評價、情境比較、多階段 DCF/DDM、債券分析、實質選擇權、敏感度/蒙地卡羅、估值指標、圖表與股票搜尋，
+不依賴 Streamlit，可供腳本、排程或其他介面直接使用。
+
+市場資料相關功能（yfinance、Goodinfo! 股利歷史、股票清單快照、歷史股價、批次選股、同業倍數、財報帶入、搜尋結果預先抓取）於第一次存取時才載入。
+"""
+from .bonds import (
+    analyze_bond_book, bond_analytics, bond_convexity, bond_dv01, bond_macaulay_duration, bond_modified_duration,
+    bond_price, bond_yield_to_maturity,
+)
+from .cache import TTLCache
+from .cashflows import cash_flow_value, discount_factors, stage_growth_rates, staged_value
+from .charts import dividend_chart, heatmap_chart, river_chart
+from .defaults import DEFAULT_FIELDS, DEFAULT_FORMULAS, DEFAULT_METHODS
+from .formulas import (
+    FORMULA_BUILTINS, FORMULA_FUNCTIONS, CompiledFormula, FormulaEngine, compile_formula, compile_vector_formula,
+    run_batch_valuation, safe_float, topo_evaluate, validate_formula, validate_formulas,
+)
+from .metrics import dividend_yield_value, graham_number, multiple_band, peg_band, price_gap_pct
+from .options import binomial_option, black_scholes, lsm_option
+from .scenarios import ScenarioSet, compare_scenarios, evaluate_inputs, inputs_to_array
+from .search import SymbolIndex
+from .session import ValuationConfig, default_config, object_size, session_memory_report
+from .sensitivity import (
+    dcf_value, ddm_value, eps_dcf_value, monte_carlo_valuation, sensitivity_grid, summarize_simulation,
+)
+
+# 依賴網路或本機快照的模組於第一次存取其名稱時才載入
+_LAZY_MODULES = {
+    "market_data": frozenset([
+        "RateLimiter", "StockUniverseStore", "get_data_caches", "get_dividends_tw_cached", "get_fetch_executor",
+        "get_http_session", "get_stock_info", "get_stock_universe_store",
+    ]),
+    "dividends": frozenset([
+        "DividendHistoryStore", "dividend_statistics", "get_dividend_history_store", "parse_goodinfo_dividends",
+    ]),
+    "prefetch": frozenset(["Prefetcher", "SearchPrefetch", "get_prefetcher"]),
+    "prices": frozenset([
+        "PriceHistoryStore", "as_of", "get_per_share_history", "get_price_history_store", "historical_multiples",
+        "valuation_bands",
+    ]),
+    "peers": frozenset([
+        "aggregate_multiples", "fetch_peer_multiples", "industry_counts", "industry_peers", "parse_peer_tickers", "peer_summary",
+    ]),
+    "statements": frozenset([
+        "free_cash_flows", "get_financial_statements", "load_ticker_fields", "map_statements", "normalize_ticker",
+    ]),
+    "screener": frozenset([
+        "ScreenerStore", "add_valuation_columns", "apply_screen", "get_screener_store", "universe_tickers",
+    ]),
+}
+
+
+def __getattr__(name):
+    for module_name, names in _LAZY_MODULES.items():
+        if name in names:
+            import importlib
+
+            return getattr(importlib.import_module(f".{module_name}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,186 @@
+"""
+債券分析（向量化）：現金流量表、價格、到期殖利率、存續期間、凸性與 DV01。
+"""
+import threading
+
+import numpy as np
+
+# 所有函式皆可傳入純量或陣列（一次計算整個債券部位）；利率與殖利率皆以「年化 %」表示，與專業版欄位一致。
+
+# 每檔債券的付息期數上限（與公式 range 的長度上限相同），超過者結果為 NaN，避免現金流量表耗盡記憶體
+MAX_BOND_PERIODS = 10_000
+
+
+def _bond_inputs(face, coupon_rate, freq, years, rate):
+    """
+    建立現金流量表：回傳 (期數矩陣 t, 現金流矩陣 cf, 每期利率 r, 每年付息次數, 原始形狀)。
+    每列一檔債券，票息期數不足最大期數者以 0 補齊，最後一欄為於第 (年數×付息次數) 期償還的本金。
+    期數超過 MAX_BOND_PERIODS 的債券不建立現金流，結果為 NaN。
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (face, coupon_rate, freq, years, rate)))
+    shape = arrays[0].shape
+    face, coupon_rate, freq, years, rate = (x.reshape(-1) for x in arrays)
+    with np.errstate(all="ignore"):
+        total = years * freq
+        total = np.where(np.isfinite(total) & (total > 0), total, 0.0)
+        too_long = np.floor(total + 1e-9) > MAX_BOND_PERIODS
+    if too_long.any():
+        total = np.where(too_long, np.nan, total)
+        face = np.where(too_long, np.nan, face)
+    n_coupons = np.floor(np.nan_to_num(total) + 1e-9).astype(np.int64)
+    periods = np.arange(1, n_coupons.max(initial=0) + 1, dtype=float)
+    coupon = face * coupon_rate / 100 / freq
+    cf = np.where(periods <= n_coupons[:, None], coupon[:, None], 0.0)
+    t = np.broadcast_to(periods, cf.shape)
+    t = np.concatenate([t, total[:, None]], axis=1)
+    cf = np.concatenate([cf, face[:, None]], axis=1)
+    return t, cf, rate / 100 / freq, freq, shape
+
+
+def _bond_output(x, shape):
+    x = x.reshape(shape)
+    return float(x) if x.ndim == 0 else x
+
+
+def _bond_pv(t, cf, r):
+    with np.errstate(all="ignore"):
+        disc = (1 + r[:, None]) ** -t
+        return (cf * disc).sum(axis=1), disc
+
+
+def bond_price(face, coupon_rate, freq, years, ytm):
+    """
+    債券現值：以市場殖利率 ytm 折現所有票息與本金。
+    """
+    t, cf, r, _, shape = _bond_inputs(face, coupon_rate, freq, years, ytm)
+    return _bond_output(_bond_pv(t, cf, r)[0], shape)
+
+
+def bond_analytics(face, coupon_rate, freq, years, ytm):
+    """
+    回傳債券的價格、麥考利存續期間（年）、修正存續期間、凸性（年²）與 DV01（殖利率變動 1bp 的價格變動）。
+    """
+    t, cf, r, freq, shape = _bond_inputs(face, coupon_rate, freq, years, ytm)
+    price, disc = _bond_pv(t, cf, r)
+    with np.errstate(all="ignore"):
+        pv = cf * disc
+        macaulay = (t * pv).sum(axis=1) / price / freq
+        modified = macaulay / (1 + r)
+        convexity = (t * (t + 1) * pv).sum(axis=1) / (1 + r) ** 2 / price / freq ** 2
+        dv01 = modified * price * 1e-4
+    return {
+        "price": _bond_output(price, shape),
+        "macaulay_duration": _bond_output(macaulay, shape),
+        "modified_duration": _bond_output(modified, shape),
+        "convexity": _bond_output(convexity, shape),
+        "dv01": _bond_output(dv01, shape),
+    }
+
+
+def bond_yield_to_maturity(face, coupon_rate, freq, years, price, tol=1e-10, max_iter=50):
+    """
+    由債券市價反推到期殖利率（年化 %）：先以牛頓法求解，未收斂者改以二分法在區間內求解，無解時為 NaN。
+    """
+    t, cf, _, freq, shape = _bond_inputs(face, coupon_rate, freq, years, 0.0)
+    price = np.broadcast_to(np.asarray(price, dtype=float), shape).reshape(-1)
+    scale = np.maximum(np.abs(price), 1.0)
+
+    # 以近似殖利率作為起始值：(每期票息 + 每期攤提的折溢價) / 平均價格
+    n = np.maximum(t[:, -1], 1.0)
+    with np.errstate(all="ignore"):
+        r = (cf[:, 0] if cf.shape[1] > 1 else 0.0) + (cf[:, -1] - price) / n
+        r = np.nan_to_num(r / ((cf[:, -1] + price) / 2), nan=0.05, posinf=0.05, neginf=0.05)
+    r = np.clip(r, -0.5, 1.0)
+    converged = np.zeros(len(price), dtype=bool)
+    active = np.arange(len(price))
+    for _ in range(max_iter):
+        # 只對尚未收斂的債券繼續迭代
+        pv, disc = _bond_pv(t[active], cf[active], r[active])
+        f = pv - price[active]
+        done = np.abs(f) <= tol * scale[active]
+        converged[active[done]] = True
+        with np.errstate(all="ignore"):
+            slope = -(t[active] * cf[active] * disc).sum(axis=1) / (1 + r[active])
+            step = np.nan_to_num(f / slope)
+        keep = ~done
+        active = active[keep]
+        if not len(active):
+            break
+        r[active] = np.maximum(r[active] - step[keep], -0.99)
+
+    # 二分法備援：現值隨殖利率遞減，於 [lo, hi] 區間內夾擠
+    todo = np.flatnonzero(~converged)
+    if len(todo):
+        lo = np.full(len(todo), -0.99)
+        hi = np.full(len(todo), 10.0)
+        f_lo = _bond_pv(t[todo], cf[todo], lo)[0] - price[todo]
+        f_hi = _bond_pv(t[todo], cf[todo], hi)[0] - price[todo]
+        bracketed = (f_lo >= 0) & (f_hi <= 0)
+        for _ in range(200):
+            mid = (lo + hi) / 2
+            f_mid = _bond_pv(t[todo], cf[todo], mid)[0] - price[todo]
+            lo = np.where(f_mid > 0, mid, lo)
+            hi = np.where(f_mid > 0, hi, mid)
+        r[todo] = np.where(bracketed, (lo + hi) / 2, np.nan)
+    return _bond_output(r * freq * 100, shape)
+
+
+# 公式中的四個風險指標以相同的輸入各自呼叫；記住每個執行緒最近一次的分析結果，同一組輸入只建立與折現一次現金流量表
+_analytics_memo = threading.local()
+
+
+def _shared_analytics(face, coupon_rate, freq, years, ytm):
+    """
+    與最近一次的輸入（形狀與數值）相同時直接沿用結果；比對成本與輸入大小成正比，遠低於重建現金流量表。
+    """
+    args = (face, coupon_rate, freq, years, ytm)
+    key = tuple((np.shape(x), np.asarray(x, dtype=float).tobytes()) for x in args)
+    last = getattr(_analytics_memo, "last", None)
+    if last is not None and last[0] == key:
+        return last[1]
+    result = bond_analytics(*args)
+    _analytics_memo.last = (key, result)
+    return result
+
+
+def bond_macaulay_duration(face, coupon_rate, freq, years, ytm):
+    return _shared_analytics(face, coupon_rate, freq, years, ytm)["macaulay_duration"]
+
+
+def bond_modified_duration(face, coupon_rate, freq, years, ytm):
+    return _shared_analytics(face, coupon_rate, freq, years, ytm)["modified_duration"]
+
+
+def bond_convexity(face, coupon_rate, freq, years, ytm):
+    return _shared_analytics(face, coupon_rate, freq, years, ytm)["convexity"]
+
+
+def bond_dv01(face, coupon_rate, freq, years, ytm):
+    return _shared_analytics(face, coupon_rate, freq, years, ytm)["dv01"]
+
+
+def analyze_bond_book(book):
+    """
+    一次重新評價整個債券部位。book 為 DataFrame，欄位同專業版債券欄位
+    （bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years，以及 bond_ytm 或 bond_market_price）；
+    缺少殖利率者以市價反推。
+    """
+    face = book["bond_face_value"].to_numpy(dtype=float)
+    coupon_rate = book["bond_coupon_rate"].to_numpy(dtype=float)
+    freq = book["bond_coupon_freq"].to_numpy(dtype=float)
+    years = book["bond_years"].to_numpy(dtype=float)
+    ytm = book["bond_ytm"].to_numpy(dtype=float) if "bond_ytm" in book else np.full(len(book), np.nan)
+    if "bond_market_price" in book:
+        missing = np.isnan(ytm)
+        if missing.any():
+            ytm = ytm.copy()
+            ytm[missing] = bond_yield_to_maturity(
+                face[missing], coupon_rate[missing], freq[missing], years[missing],
+                book["bond_market_price"].to_numpy(dtype=float)[missing]
+            )
+    result = bond_analytics(face, coupon_rate, freq, years, ytm)
+    out = book.copy()
+    out["ytm"] = ytm
+    for k, v in result.items():
+        out[k] = v
+    return out
@@ -0,0 +1,83 @@
+"""
+具存活時間（TTL）與容量上限的執行緒安全快取。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from . import instrumentation
+
+CACHE_MAXSIZE = 512
+
+_CACHE_MISS = object()
+
+
+class TTLCache:
+    """
+    執行緒安全的快取：每筆資料有存活時間（TTL），超過容量時淘汰最久未使用者（LRU），並記錄命中/未命中次數。
+    指定 name 時，命中/未命中也計入效能量測（cache.<name>.hits / misses）。
+    """
+
+    def __init__(self, ttl, maxsize=CACHE_MAXSIZE, name=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                hit = False
+        if self.name:
+            instrumentation.count(f"cache.{self.name}.{'hits' if hit else 'misses'}")
+        return item[1] if hit else default
+
+    def __contains__(self, key):
+        # 只檢查是否有未過期的資料，不計入命中/未命中，也不影響淘汰順序
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def set(self, key, value, ttl=None):
+        # ttl 可為單筆資料指定較短的存活時間（例如記住查無資料的結果）
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        快取有效時直接回傳，否則呼叫 loader() 取得並存入快取。
+        """
+        value = self.get(key, _CACHE_MISS)
+        if value is _CACHE_MISS:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
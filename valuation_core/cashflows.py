@@ -0,0 +1,143 @@
+"""
+多階段現金流折現引擎（DCF/DDM）：任意長度的明確預測現金流，接續高成長期、衰退期（成長率線性遞減至永續成長率）與 Gordon 永續價值。
+
+現金流的最後一維為年度，其餘維度為公司或情境（例如 (公司數, 年數) 的矩陣），折現因子與成長因子逐年以整個陣列累乘；
+各列的預測年數可以不同（較短者以 NaN 補齊尾端），30 年的模型與 5 年的模型以相同的陣列運算完成。利率皆為小數。
+"""
+import numpy as np
+
+# 高成長期與衰退期年數的上限，避免單一輸入產生過大的陣列
+MAX_STAGE_YEARS = 200
+
+
+def discount_factors(discount, periods):
+    """
+    第 1～periods 年的折現因子 (1+r)^-t，回傳形狀為 discount.shape + (periods,)；逐年累乘，不逐年取次方。
+    """
+    step = 1 / (1 + np.asarray(discount, dtype=float))
+    factors = np.empty(step.shape + (periods,))
+    acc = np.ones(step.shape)
+    for t in range(periods):
+        acc *= step
+        factors[..., t] = acc
+    return factors
+
+
+def _stage_years(years):
+    years = np.asarray(years, dtype=float)
+    if years.ndim == 0:
+        # 單一數值（最常見的情況）不經過陣列運算
+        years = float(years)
+        return np.asarray(0.0 if np.isnan(years) else float(min(max(years, 0.0), MAX_STAGE_YEARS) // 1))
+    return np.clip(np.trunc(np.where(np.isnan(years), 0, years)), 0, MAX_STAGE_YEARS)
+
+
+def _stage_plan(high_growth, growth, high_years, fade_years):
+    """
+    整理各階段參數，回傳 (高成長率, 永續成長率, 高成長年數, 衰退年數, 階段總年數)；high_growth 為 NaN（未填寫）的列不設階段。
+    """
+    high = np.asarray(high_growth, dtype=float)
+    growth = np.asarray(growth, dtype=float)
+    high_years, fade_years = _stage_years(high_years), _stage_years(fade_years)
+    no_stage = np.isnan(high)
+    if no_stage.any():
+        high_years = np.where(no_stage, 0, high_years)
+        fade_years = np.where(no_stage, 0, fade_years)
+    return high, growth, high_years, fade_years, high_years + fade_years
+
+
+def _stage_rate(t, high, growth, high_years, fade_years):
+    """
+    第 t 年的成長率：高成長期為 high，衰退期由 high 線性遞減至 growth；超過階段年數者為 -1（成長因子為 0，累乘後歸零）。
+    各列年數相同時直接回傳該階段的成長率，不建立遮罩。
+    """
+    if np.ndim(high_years) == 0 and np.ndim(fade_years) == 0:
+        return high if t <= high_years else high + (growth - high) * ((t - high_years) / (fade_years + 1))
+    fade = high + (growth - high) * ((t - high_years) / (fade_years + 1))
+    return np.where(t <= high_years, high, np.where(t <= high_years + fade_years, fade, -1.0))
+
+
+def stage_growth_rates(high_growth, growth, high_years, fade_years=0):
+    """
+    回傳各年度的成長率，形狀為 (..., 高成長年數 + 衰退年數)：高成長期維持 high_growth，
+    衰退期由 high_growth 線性遞減至永續成長率 growth（不含）；年數較短的列尾端為 NaN。
+    high_growth 為 NaN（未填寫）時不設高成長期與衰退期。
+    """
+    high, growth, high_years, fade_years, horizon = _stage_plan(high_growth, growth, high_years, fade_years)
+    shape = np.broadcast_shapes(high.shape, growth.shape, horizon.shape)
+    periods = int(horizon.max(initial=0))
+    rates = np.empty(shape + (periods,))
+    for t in range(1, periods + 1):
+        rates[..., t - 1] = _stage_rate(t, high, growth, high_years, fade_years)
+    return np.where(np.arange(1, periods + 1) <= horizon[..., None], rates, np.nan)
+
+
+def staged_value(base, discount, growth, high_growth=np.nan, high_years=0, fade_years=0, terminal=True):
+    """
+    以基期（第 0 年）現金流 base 依高成長期、衰退期逐年成長並折現，加上最後一年之後以 growth 永續成長的 Gordon 價值。
+    terminal=False 時不計永續價值。計入永續價值而折現率不大於永續成長率者為 NaN。
+    """
+    base = np.asarray(base, dtype=float)
+    discount = np.asarray(discount, dtype=float)
+    high, stage_growth, high_years, fade_years, horizon = _stage_plan(high_growth, growth, high_years, fade_years)
+    with np.errstate(all="ignore"):
+        step = 1 / (1 + discount)
+        shape = np.broadcast_shapes(base.shape, step.shape, high.shape, stage_growth.shape, horizon.shape)
+        # 逐年以整個陣列累乘「成長因子 / (1+r)」，即為各年度現金流相對於基期的現值倍數；運算量只與年數成正比
+        path = np.ones(shape)
+        total = np.zeros(shape)
+        uniform = horizon.ndim == 0
+        final = None if uniform else np.ones(shape)
+        high_factor = (1 + high) * step
+        for t in range(1, int(horizon.max(initial=0)) + 1):
+            path *= high_factor if uniform and t <= high_years else (1 + _stage_rate(t, high, stage_growth, high_years, fade_years)) * step
+            total += path
+            if not uniform:
+                np.copyto(final, path, where=horizon == t)
+        value = base * total
+        if not terminal:
+            return value
+        growth = np.asarray(growth, dtype=float)
+        value = value + base * (path if uniform else final) * (1 + growth) / (discount - growth)
+        return np.where(discount > growth, value, np.nan)
+
+
+def cash_flow_value(cash_flows, discount, growth, high_growth=np.nan, high_years=0, fade_years=0, terminal=True):
+    """
+    明確預測現金流（最後一維為年度，可為單一向量或多列矩陣）逐年折現，再自最後一年的現金流接續高成長期、衰退期與永續價值。
+    各列的預測年數為最後一個有值的年度（中間的空白視為 0），沒有任何現金流的列為 NaN。
+    discount、growth 與各階段參數可為陣列，與現金流的列以廣播對應。
+    """
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    discount = np.asarray(discount, dtype=float)
+    n = cash_flows.shape[-1]
+    filled = ~np.isnan(cash_flows)
+    horizon = np.where(filled.any(axis=-1), n - np.argmax(filled[..., ::-1], axis=-1), 0)
+    last = np.take_along_axis(cash_flows, np.maximum(horizon - 1, 0)[..., None], axis=-1)[..., 0]
+    with np.errstate(all="ignore"):
+        explicit = np.einsum("...t,...t->...", np.where(filled, cash_flows, 0.0), discount_factors(discount, n))
+        tail = staged_value(last, discount, growth, high_growth, high_years, fade_years, terminal)
+        value = explicit + tail * (1 + discount) ** -horizon
+    return np.where(horizon > 0, value, np.nan)
+
+
+def _formula_output(value):
+    value = np.asarray(value, dtype=float)
+    return float(value) if value.ndim == 0 else value
+
+
+def multi_stage_dcf(discount, growth, high_growth, high_years, fade_years, *cash_flows):
+    """
+    公式用的多階段 DCF：cash_flows 為逐年的自由現金流欄位（純量或批次計算時的陣列，空白為 None/NaN）。
+    """
+    flows = np.stack(np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in cash_flows)), axis=-1)
+    return _formula_output(cash_flow_value(flows, discount, growth, high_growth, high_years, fade_years))
+
+
+def multi_stage_ddm(dividend, discount, growth, high_growth=None, high_years=0, fade_years=0):
+    """
+    公式用的多階段 DDM（每股價值）：dividend 為下一年度的每股股利，其後依高成長期、衰退期成長，再以 growth 永續成長；
+    沒有高成長期時即為 Gordon 模型 dividend / (discount - growth)。
+    """
+    dividend = np.asarray(dividend, dtype=float)
+    return _formula_output(cash_flow_value(dividend[..., None], discount, growth, high_growth, high_years, fade_years))
@@ -0,0 +1,150 @@
+"""
+圖表：以 matplotlib 的物件導向 API 繪製並輸出 PNG，依資料內容的雜湊值快取輸出結果。
+
+不經由 pyplot，圖表不會登錄在 pyplot 的全域狀態中；每張圖輸出後即明確清除。
+資料未變動的重新執行（例如調整其他滑桿）直接回傳快取的 PNG，不重新繪圖。快取的張數與單張大小都有上限，
+長時間執行的伺服器記憶體用量不會隨使用時間增加。
+"""
+import hashlib
+import io
+import os
+
+import numpy as np
+
+from . import instrumentation
+from .cache import TTLCache
+
+CHART_DPI = 150
+CHART_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_CHART_CACHE_TTL", 3600))
+CHART_CACHE_SIZE = int(os.environ.get("EVALUATE_TOOL_CHART_CACHE_SIZE", 64))
+# 超過此大小的 PNG 不快取
+MAX_CACHED_CHART_BYTES = 2 * 1024 * 1024
+
+_chart_cache = TTLCache(CHART_CACHE_TTL, maxsize=CHART_CACHE_SIZE, name="charts")
+
+
+def data_digest(*parts):
+    """
+    計算圖表資料（陣列、數值、字串或其 list/tuple）的雜湊值。
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (list, tuple)) and not all(isinstance(p, (str, int, float)) for p in part):
+            digest.update(data_digest(*part).encode())
+            continue
+        if hasattr(part, "to_numpy"):
+            part = part.to_numpy()
+        if isinstance(part, np.ndarray):
+            array = np.ascontiguousarray(part)
+            if array.dtype == object:
+                digest.update(repr(array.tolist()).encode("utf-8"))
+            else:
+                digest.update(f"{array.dtype}{array.shape}".encode())
+                digest.update(array.tobytes())
+        else:
+            digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def render_png(draw, figsize):
+    """
+    建立圖表、以 draw(fig) 繪製並輸出 PNG；結束時清除圖表釋放資源。
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    try:
+        draw(fig)
+        output = io.BytesIO()
+        fig.savefig(output, format="png", dpi=CHART_DPI, bbox_inches="tight")
+        return output.getvalue()
+    finally:
+        fig.clear()
+
+
+def cached_chart(kind, data, draw, figsize):
+    """
+    依圖表種類與資料雜湊值回傳快取的 PNG，沒有快取時才繪製。
+    """
+    key = (kind, data_digest(*data), figsize)
+    png = _chart_cache.get(key)
+    if png is None:
+        with instrumentation.timed(f"chart.{kind}"):
+            png = render_png(draw, figsize)
+        if len(png) <= MAX_CACHED_CHART_BYTES:
+            _chart_cache.set(key, png)
+    return png
+
+
+def chart_cache_stats():
+    return _chart_cache.stats()
+
+
+def dividend_chart(years, cash, stock):
+    """
+    現金/股票股利堆疊長條圖（依年度由舊到新）。
+    """
+    years = np.asarray(years)
+    order = np.argsort(years, kind="stable")
+    labels = [str(y) for y in years[order]]
+    cash = np.asarray(cash, dtype=float)[order]
+    stock = np.asarray(stock, dtype=float)[order]
+
+    def draw(fig):
+        ax = fig.subplots()
+        ax.bar(labels, cash, label="現金股利")
+        ax.bar(labels, stock, bottom=cash, label="股票股利")
+        ax.set_ylabel("股利")
+        ax.set_title(f"近{len(labels)}年股利政策")
+        if len(labels) > 10:
+            ax.tick_params(axis="x", labelrotation=90, labelsize=7)
+        ax.legend()
+
+    return cached_chart("dividends", (labels, cash, stock), draw, (5, 3))
+
+
+def river_chart(dates, close, bands, labels, title):
+    """
+    河流圖：收盤價與各條倍數帶（bands 形狀為 (日期數, 帶數)），相鄰兩帶之間填色。
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    close = np.asarray(close, dtype=float)
+    bands = np.asarray(bands, dtype=float)
+
+    def draw(fig):
+        from matplotlib import colormaps
+
+        colors = colormaps["RdYlGn_r"](np.linspace(0.15, 0.85, bands.shape[1]))
+        ax = fig.subplots()
+        for i in range(bands.shape[1] - 1):
+            ax.fill_between(dates, bands[:, i], bands[:, i + 1], color=colors[i], alpha=0.2, linewidth=0)
+        for i in range(bands.shape[1]):
+            ax.plot(dates, bands[:, i], color=colors[i], linewidth=1, label=labels[i])
+        ax.plot(dates, close, color="black", linewidth=1, label="收盤價")
+        ax.set_title(title)
+        ax.legend(fontsize=7, loc="upper left")
+
+    return cached_chart("river", (dates, close, bands, list(labels), title), draw, (8, 3.5))
+
+
+def heatmap_chart(grid, x_values, y_values, title, x_label, y_label):
+    """
+    熱度圖（橫軸 x_values、縱軸 y_values），附色階。
+    """
+    grid = np.asarray(grid, dtype=float)
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+
+    def draw(fig):
+        ax = fig.subplots()
+        image = ax.imshow(
+            grid, origin="lower", aspect="auto", cmap="viridis",
+            extent=[x_values[0], x_values[-1], y_values[0], y_values[-1]],
+        )
+        fig.colorbar(image, ax=ax)
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+        ax.set_title(title)
+
+    return cached_chart("heatmap", (grid, x_values, y_values, title, x_label, y_label), draw, (6, 4))
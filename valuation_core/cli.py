@@ -0,0 +1,272 @@
+"""
+命令列批次評價：以管理員匯出的設定檔（fields/formulas/methods）評價整份公司清單。
+
+    python -m valuation_core batch --config valuation_config.json --input companies.csv --output results.csv
+
+輸入/輸出以分塊（chunk）串流處理，記憶體用量不隨檔案大小增加；各分塊分送到多個行程並行計算，
+結果依原始順序寫出，結束時回報處理速度（rows/s）。輸入支援 CSV、Parquet 與 Excel（Excel 會一次讀入），
+輸出支援 CSV、Parquet 與 Excel（以 constant_memory 模式逐列寫出，上限約 104 萬筆）。
+"""
+import argparse
+import ast
+import collections
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from .formulas import compile_formula, run_batch_valuation, validate_formulas
+from .reports import ExcelStreamWriter, normalize_for_arrow
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# 各工作行程各自保存一份設定檔（及 Parquet 輸出的欄位型別），分塊只需傳送資料本身
+_worker_config = None
+_worker_columns = None
+
+
+def load_config(path):
+    """
+    讀取設定檔並檢查必要欄位與公式，回傳 (fields, formulas, methods)。
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not all(k in data for k in ("fields", "formulas", "methods")):
+        raise ValueError("設定檔格式錯誤，需包含 fields、formulas、methods。")
+    formula_errors = validate_formulas(data["formulas"])
+    if formula_errors:
+        raise ValueError("；".join(f"【{k}】{msg}" for k, msg in formula_errors.items()))
+    return data["fields"], data["formulas"], data["methods"]
+
+
+def _file_format(path):
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return "parquet"
+    if lower.endswith((".xlsx", ".xls")):
+        return "excel"
+    return "csv"
+
+
+def iter_input_chunks(path, chunksize=DEFAULT_CHUNKSIZE, numeric_columns=()):
+    """
+    依分塊讀取公司清單。numeric_columns（欄位代碼或中文名稱）以數值解析，其餘欄位（如公司名稱）一律以字串讀入，
+    各分塊的欄位型別因此保持一致；含千分位逗號等無法直接解析的數值交由批次評價轉換。
+    """
+    import pandas as pd
+
+    numeric_columns = set(numeric_columns)
+    fmt = _file_format(path)
+    if fmt == "csv":
+        header = pd.read_csv(path, nrows=0).columns
+        dtype = {c: str for c in header if c not in numeric_columns}
+        yield from pd.read_csv(path, dtype=dtype, chunksize=chunksize)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        df = pd.read_excel(path, dtype={c: str for c in pd.read_excel(path, nrows=0).columns if c not in numeric_columns})
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+
+def text_result_methods(formulas, methods):
+    """
+    回傳結果可能為說明文字的評價方法名稱：公式含字串常數、呼叫 str()，或引用這類公式的結果。
+    """
+    text_keys = set()
+    changed = True
+    while changed:
+        changed = False
+        for key, expr in formulas.items():
+            if key in text_keys:
+                continue
+            tree = ast.parse(expr, mode="eval")
+            if any(
+                isinstance(node, ast.Constant) and isinstance(node.value, str)
+                or isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str"
+                for node in ast.walk(tree)
+            ) or text_keys.intersection(compile_formula(expr).parameters):
+                text_keys.add(key)
+                changed = True
+    return [m["name"] for m in methods if m["key"] in text_keys]
+
+
+def encode_chunk(out, output_format, value_columns=(), text_columns=()):
+    """
+    將結果分塊轉為寫出格式：CSV 為 (欄位名稱, 不含標題列的 UTF-8 內容)，Parquet 為欄位型別一致的 DataFrame，
+    Excel 則直接回傳結果表。在工作行程中執行，數值格式化的成本也由多個行程分擔。
+    Parquet 的評價結果（value_columns）一律寫成浮點數；text_columns 中的說明文字另存於「欄位（說明）」字串欄位。
+    """
+    import pandas as pd
+
+    if output_format == "csv":
+        return list(out.columns), out.to_csv(index=False, header=False).encode("utf-8")
+    if output_format == "parquet":
+        # 評價結果保留原始數值（讀取端為 float64），說明文字放在緊接其後的欄位；其餘文字欄位統一轉為字串，確保各分塊結構一致
+        columns = {}
+        for col in out.columns:
+            values = out[col]
+            if col in value_columns:
+                columns[col] = pd.to_numeric(values, errors="coerce").astype("float64")
+                if col in text_columns:
+                    columns[f"{col}（說明）"] = values.map(lambda x: x if isinstance(x, str) else None).astype(object)
+            else:
+                columns[col] = values
+        return normalize_for_arrow(pd.DataFrame(columns))
+    return out
+
+
+class ChunkWriter:
+    """
+    依序寫出 encode_chunk 編碼後的結果分塊：CSV 逐塊附加，Parquet 以同一個 ParquetWriter 寫成多個 row group，
+    Excel 以 ExcelStreamWriter 逐列寫入同一個工作表。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = {"parquet": "parquet", "excel": "xlsx"}.get(_file_format(path), "csv")
+        self._file = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, encoded):
+        if self.format == "xlsx":
+            if self._writer is None:
+                self._writer = ExcelStreamWriter(self.path)
+            self._writer.append("批次評價結果", encoded)
+        elif self.format == "csv":
+            columns, payload = encoded
+            if self._file is None:
+                self._file = open(self.path, "wb")
+                header = io.StringIO()
+                csv.writer(header, lineterminator="\n").writerow(columns)
+                self._file.write(header.getvalue().encode("utf-8-sig"))
+            self._file.write(payload)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                table = pa.Table.from_pandas(encoded, preserve_index=False)
+                self._schema = pa.schema([
+                    pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type) for f in table.schema
+                ])
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(pa.Table.from_pandas(encoded, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        if self._writer is None and self.format == "xlsx":
+            self._writer = ExcelStreamWriter(self.path)
+        if self._writer is not None:
+            self._writer.close()
+        if self.format == "csv":
+            if self._file is None:
+                self._file = open(self.path, "wb")
+            self._file.close()
+
+
+def _init_worker(config):
+    global _worker_config, _worker_columns
+    _worker_config = config
+    _, formulas, methods = config
+    _worker_columns = ([m["name"] for m in methods], text_result_methods(formulas, methods))
+
+
+def _value_chunk(df, output_format):
+    fields, formulas, methods = _worker_config
+    out, errors = run_batch_valuation(df, fields, formulas, methods)
+    return encode_chunk(out, output_format, *_worker_columns), len(out), errors
+
+
+def run_batch_file(config, input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, workers=None, progress=None):
+    """
+    以設定檔評價整份輸入檔並寫出結果，回傳統計資料（筆數、秒數、rows/s、公式錯誤訊息）。
+    workers 為 1 時於本行程內計算；同時處理中的分塊數有上限，讀取速度不會超前計算而堆積在記憶體中。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    fields = config[0]
+    numeric_columns = [f["key"] for f in fields] + [f["name"] for f in fields]
+    start = time.perf_counter()
+    rows, errors = 0, {}
+    writer = ChunkWriter(output_path)
+    chunks = iter_input_chunks(input_path, chunksize, numeric_columns)
+
+    def collect(result):
+        nonlocal rows
+        encoded, n_rows, chunk_errors = result
+        writer.write(encoded)
+        rows += n_rows
+        for k, msg in chunk_errors.items():
+            errors.setdefault(k, msg)
+        if progress:
+            progress(rows, time.perf_counter() - start)
+
+    try:
+        if workers == 1:
+            _init_worker(config)
+            for chunk in chunks:
+                collect(_value_chunk(chunk, writer.format))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as executor:
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(_value_chunk, chunk, writer.format))
+                    if len(pending) >= 2 * workers:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds > 0 else 0.0, "errors": errors}
+
+
+def _batch_command(args):
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"無法讀取設定檔 {args.config}: {e}", file=sys.stderr)
+        return 2
+
+    def progress(rows, seconds):
+        if not args.quiet:
+            print(f"\r已評價 {rows:,} 筆（{rows / seconds if seconds > 0 else 0:,.0f} rows/s）", end="", file=sys.stderr, flush=True)
+
+    stats = run_batch_file(config, args.input, args.output, chunksize=args.chunksize, workers=args.workers, progress=progress)
+    if not args.quiet:
+        print(file=sys.stderr)
+    for k, msg in stats["errors"].items():
+        print(f"【{k}】：{msg}", file=sys.stderr)
+    print(f"完成：{stats['rows']:,} 筆，{stats['seconds']:.2f} 秒，{stats['rows_per_second']:,.0f} rows/s → {args.output}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m valuation_core", description="估值核心命令列工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="以設定檔批次評價公司清單")
+    batch.add_argument("--config", required=True, help="設定檔（管理員功能「下載當前完整設定檔」匯出的 JSON）")
+    batch.add_argument("--input", required=True, help="公司清單（CSV/Parquet/Excel），欄位為欄位代碼或中文名稱")
+    batch.add_argument("--output", required=True, help="結果檔（.csv、.parquet 或 .xlsx）")
+    batch.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help=f"每個分塊的筆數（預設 {DEFAULT_CHUNKSIZE:,}）")
+    batch.add_argument("--workers", type=int, default=None, help="工作行程數（預設為 CPU 核心數，1 表示不使用行程池）")
+    batch.add_argument("--quiet", action="store_true", help="不顯示進度")
+    batch.set_defaults(func=_batch_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
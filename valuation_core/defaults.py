@@ -0,0 +1,136 @@
+"""
+專業版的預設欄位、公式與評價方法。
+"""
+
+DEFAULT_FIELDS = [
+    {"name": "股價", "key": "stock_price"}, {"name": "流通股數", "key": "shares"},
+    {"name": "EPS（每股盈餘）", "key": "eps"}, {"name": "淨利（Net Income）", "key": "net_income"},
+    {"name": "本益比（PE倍數）", "key": "pe_ratio"}, {"name": "每股帳面價值", "key": "bvps"},
+    {"name": "股東權益（Equity）", "key": "equity"}, {"name": "本淨比（PB倍數）", "key": "pb_ratio"},
+    {"name": "EBITDA（稅息折舊攤提前獲利）", "key": "ebitda"}, {"name": "EV/EBITDA倍數", "key": "ev_ebitda_ratio"},
+    {"name": "現金（Cash）", "key": "cash"}, {"name": "有息負債（Debt）", "key": "debt"},
+    {"name": "併購價格/案例參考", "key": "precedent_price"},
+    # 新增欄位：預期成長率 (用於 PEG)
+    {"name": "預期成長率（%）", "key": "growth_rate_forward"},
+    # 新增欄位：股價營收比 (P/S)
+    {"name": "股價營收比（P/S 倍數）", "key": "ps_ratio"},
+    # 新增欄位：企業價值/銷售收入比 (EV/Sales)
+    {"name": "企業價值/銷售收入比（EV/Sales 倍數）", "key": "ev_sales_ratio"},
+    # DCF
+    {"name": "FCF_1（第1年自由現金流）", "key": "fcf1"}, {"name": "FCF_2（第2年自由現金流）", "key": "fcf2"},
+    {"name": "FCF_3（第3年自由現金流）", "key": "fcf3"}, {"name": "FCF_4（第4年自由現金流）", "key": "fcf4"},
+    {"name": "FCF_5（第5年自由現金流）", "key": "fcf5"}, {"name": "折現率（Discount Rate, r）", "key": "discount_rate"},
+    {"name": "永續成長率（Perpetual Growth, g）", "key": "perpetual_growth"},
+    # 多階段 DCF：最後一年 FCF 之後接續高成長期，再以衰退期線性遞減至永續成長率
+    {"name": "高成長期成長率（小數）", "key": "high_growth"}, {"name": "高成長期年數", "key": "high_growth_years"},
+    {"name": "衰退期年數（遞減至永續成長率）", "key": "fade_years"},
+    # EVA
+    {"name": "稅後營運利潤（NOPAT）", "key": "nopat"}, {"name": "投入資本（Capital）", "key": "capital"},
+    {"name": "資本成本率（Cost of Capital）", "key": "cost_of_capital"},
+    # 盈餘資本化
+    {"name": "預期盈餘", "key": "expected_earnings"}, {"name": "資本化率", "key": "capitalization_rate"},
+    # DDM
+    {"name": "每股股利", "key": "dividend_per_share"}, {"name": "股利成長率", "key": "dividend_growth"},
+    {"name": "股利高成長率（小數）", "key": "dividend_high_growth"}, {"name": "股利高成長年數", "key": "dividend_high_years"},
+    {"name": "股利衰退期年數", "key": "dividend_fade_years"},
+    # 資產法
+    {"name": "資產總額", "key": "assets"}, {"name": "負債總額", "key": "liabilities"},
+    {"name": "資產重估值", "key": "revalued_assets"},
+    # 清算
+    {"name": "清算資產", "key": "liquidation_assets"}, {"name": "清算負債", "key": "liquidation_liabilities"},
+    # 創投/私募/特殊
+    {"name": "預期退出市值", "key": "future_valuation"}, {"name": "目標年化報酬率（%）", "key": "target_return_rate"},
+    {"name": "投資年數", "key": "years"}, {"name": "投資金額", "key": "investment"},
+    {"name": "目標倍數", "key": "target_multiple"}, {"name": "換得股權比例（0~1）", "key": "ownership"},
+    {"name": "預期未來每股價", "key": "future_stock_price"},
+    # 分段混合/子事業
+    {"name": "子事業價值1（例：A事業部）", "key": "sub_value1"}, {"name": "子事業價值2（例：B事業部）", "key": "sub_value2"},
+    {"name": "子事業價值3（例：C事業部）", "key": "sub_value3"},
+    # 實質選擇權（擴張/放棄/延遲投資）
+    {"name": "標的資產現值（專案現金流現值）", "key": "option_underlying"},
+    {"name": "履約價格（投資成本或殘值）", "key": "option_strike"},
+    {"name": "選擇權期間（年）", "key": "option_years"}, {"name": "無風險利率（%）", "key": "option_risk_free"},
+    {"name": "標的價值波動率（%）", "key": "option_volatility"}, {"name": "價值流失率（%）", "key": "option_yield"},
+    {"name": "選擇權類型（1=擴張/買權，-1=放棄/賣權）", "key": "option_type"},
+    {"name": "二元樹/LSM期數", "key": "option_steps"},
+    {"name": "LSM模擬路徑數（填寫才計算）", "key": "option_paths"},
+    # 行業自定
+    {"name": "自定行業指標（例：SaaS_LTV/CAC）", "key": "custom_metric"},
+    # 債券
+    {"name": "債券面額（Face Value）", "key": "bond_face_value"}, {"name": "年票面利率（%）", "key": "bond_coupon_rate"},
+    {"name": "債券現價", "key": "bond_market_price"}, {"name": "每年付息次數", "key": "bond_coupon_freq"},
+    {"name": "到期年數", "key": "bond_years"}, {"name": "市場折現率（YTM, %）", "key": "bond_ytm"},
+    # 互斥防呆專用
+    {"name": "每股營收", "key": "sales_per_share"}, {"name": "營收總額", "key": "sales_total"},
+]
+
+DEFAULT_FORMULAS = {
+    "market_price": "stock_price * shares if stock_price and shares else None",
+    "pe_comp": "pe_ratio * net_income if pe_ratio and net_income else None",
+    "pb_comp": "pb_ratio * equity if pb_ratio and equity else None",
+    "ev_ebitda_comp": "ev_ebitda_ratio * ebitda + cash - debt if ev_ebitda_ratio and ebitda and cash is not None and debt is not None else None",
+    "precedent_trans": "precedent_price if precedent_price else None",
+    # 新增公式：本益成長比 (PEG)
+    "peg_comp": "(peg_ratio * growth_rate_forward / 100 * eps) if peg_ratio and growth_rate_forward is not None and eps else None",
+    # 新增公式：股價營收比 (P/S)
+    "ps_comp": "ps_ratio * sales_total if ps_ratio and sales_total else None",
+    # 新增公式：企業價值/銷售收入比 (EV/Sales)
+    "ev_sales_comp": "ev_sales_ratio * sales_total if ev_sales_ratio and sales_total else None",
+    # 多階段 DCF：FCF 可只填前幾年，之後可接高成長期與衰退期，再加 Gordon 永續價值
+    "dcf": "multi_stage_dcf(discount_rate, perpetual_growth, high_growth, high_growth_years, fade_years, fcf1, fcf2, fcf3, fcf4, fcf5) if fcf1 is not None and discount_rate is not None and perpetual_growth is not None and discount_rate > perpetual_growth else None",
+    "eva": "(nopat - capital*cost_of_capital) if nopat and capital and cost_of_capital else None",
+    "cap_earnings": "expected_earnings / capitalization_rate if expected_earnings and capitalization_rate else None",
+    # 多階段 DDM：未填股利高成長率時即為 Gordon 模型
+    "ddm": "multi_stage_ddm(dividend_per_share, discount_rate, dividend_growth, dividend_high_growth, dividend_high_years, dividend_fade_years) * shares if dividend_per_share and discount_rate and dividend_growth is not None and shares and discount_rate > dividend_growth else None",
+    "book_asset": "assets - liabilities if assets is not None and liabilities is not None else None",
+    "asset_reval": "revalued_assets - liabilities if revalued_assets is not None and liabilities is not None else None",
+    "liquidation": "liquidation_assets - liquidation_liabilities if liquidation_assets is not None and liquidation_liabilities is not None else None",
+    "vc_exit": "future_valuation / (1 + target_return_rate/100)**years if future_valuation and target_return_rate and years else None",
+    "vc_multiple": "investment * target_multiple if investment and target_multiple else None",
+    "vc_equity": "investment / ownership if investment and ownership else None",
+    "vc_rev_valuation": "future_stock_price * shares / (1 + target_return_rate/100)**years if future_stock_price and shares and target_return_rate and years else None",
+    # 實質選擇權：Black-Scholes 為歐式封閉解；二元樹與 LSM 可提前履約（美式）
+    "real_option": "black_scholes(option_underlying, option_strike, option_years, option_risk_free, option_volatility, option_yield or 0, option_type or 1) if option_underlying and option_strike and option_years and option_risk_free is not None and option_volatility else None",
+    "real_option_binomial": "binomial_option(option_underlying, option_strike, option_years, option_risk_free, option_volatility, option_yield or 0, option_type or 1, option_steps or 200) if option_underlying and option_strike and option_years and option_risk_free is not None and option_volatility else None",
+    "real_option_lsm": "lsm_option(option_underlying, option_strike, option_years, option_risk_free, option_volatility, option_yield or 0, option_type or 1, option_paths, option_steps or 50) if option_underlying and option_strike and option_years and option_risk_free is not None and option_volatility and option_paths else None",
+    "sotp": "sum(filter(None, [sub_value1, sub_value2, sub_value3]))",
+    "custom_industry": "custom_metric if custom_metric else None",
+    "bond_pv": "bond_price(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_ytm) if bond_face_value is not None and bond_coupon_rate is not None and bond_coupon_freq and bond_years is not None and bond_ytm is not None else None",
+    "bond_current_yield": "(bond_face_value * bond_coupon_rate / 100) / bond_market_price if bond_face_value and bond_coupon_rate and bond_market_price else None",
+    "bond_par_value": "bond_face_value if bond_face_value else None",
+    "bond_ytm_info": "bond_yield_to_maturity(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_market_price) if bond_face_value and bond_coupon_rate is not None and bond_coupon_freq and bond_years and bond_market_price else '到期殖利率(YTM)為使債券現值等於市價時的折現率，請填寫面額、票面利率、付息次數、到期年數與債券現價以自動求解'",
+    # 債券風險指標（以市場折現率 bond_ytm 計算）
+    "bond_duration_mac": "bond_macaulay_duration(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_ytm) if bond_face_value and bond_coupon_rate is not None and bond_coupon_freq and bond_years and bond_ytm is not None else None",
+    "bond_duration_mod": "bond_modified_duration(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_ytm) if bond_face_value and bond_coupon_rate is not None and bond_coupon_freq and bond_years and bond_ytm is not None else None",
+    "bond_convexity_value": "bond_convexity(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_ytm) if bond_face_value and bond_coupon_rate is not None and bond_coupon_freq and bond_years and bond_ytm is not None else None",
+    "bond_dv01_value": "bond_dv01(bond_face_value, bond_coupon_rate, bond_coupon_freq, bond_years, bond_ytm) if bond_face_value and bond_coupon_rate is not None and bond_coupon_freq and bond_years and bond_ytm is not None else None",
+    "sales_total_autofill": "sales_per_share * shares if sales_per_share and shares and not sales_total else sales_total if sales_total else None",
+}
+
+DEFAULT_METHODS = [
+    {"name": "市價法", "key": "market_price"}, {"name": "同業PE倍數法", "key": "pe_comp"},
+    {"name": "同業PB倍數法", "key": "pb_comp"}, {"name": "同業EV/EBITDA", "key": "ev_ebitda_comp"},
+    # 新增方法：本益成長比法 (PEG)
+    {"name": "本益成長比法（PEG）", "key": "peg_comp"},
+    # 新增方法：股價營收比法 (P/S)
+    {"name": "股價營收比法（P/S）", "key": "ps_comp"},
+    # 新增方法：企業價值/銷售收入比法 (EV/Sales)
+    {"name": "企業價值/銷售收入比法（EV/Sales）", "key": "ev_sales_comp"},
+    {"name": "併購交易法", "key": "precedent_trans"}, {"name": "DCF現金流折現法", "key": "dcf"},
+    {"name": "EVA經濟附加價值法", "key": "eva"}, {"name": "盈餘資本化法", "key": "cap_earnings"},
+    {"name": "股利折現法(DDM)", "key": "ddm"}, {"name": "帳面資產法", "key": "book_asset"},
+    {"name": "資產重估法", "key": "asset_reval"}, {"name": "清算價值法", "key": "liquidation"},
+    {"name": "創投-回推法", "key": "vc_exit"}, {"name": "創投-倍數法", "key": "vc_multiple"},
+    {"name": "創投-股權分割法", "key": "vc_equity"}, {"name": "創投-市值倒推法", "key": "vc_rev_valuation"},
+    {"name": "選擇權定價法（Black-Scholes）", "key": "real_option"},
+    {"name": "選擇權定價法（美式二元樹）", "key": "real_option_binomial"},
+    {"name": "選擇權定價法（LSM 蒙地卡羅）", "key": "real_option_lsm"}, {"name": "分段混合法SOTP", "key": "sotp"},
+    {"name": "行業自定指標", "key": "custom_industry"},
+    # 債券
+    {"name": "債券現值法（DCF）", "key": "bond_pv"}, {"name": "當期殖利率法", "key": "bond_current_yield"},
+    {"name": "平價法", "key": "bond_par_value"}, {"name": "到期殖利率（YTM, %）", "key": "bond_ytm_info"},
+    {"name": "麥考利存續期間（年）", "key": "bond_duration_mac"}, {"name": "修正存續期間", "key": "bond_duration_mod"},
+    {"name": "凸性", "key": "bond_convexity_value"}, {"name": "DV01（殖利率變動1bp之價格變動）", "key": "bond_dv01_value"},
+    # 新增：營收總額自動計算結果也展示
+    {"name": "營收總額(自動計算)", "key": "sales_total_autofill"},
+]
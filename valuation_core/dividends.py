@@ -0,0 +1,272 @@
+"""
+台股股利歷史：以 lxml 一次解析 Goodinfo! 股利政策頁面，完整歷史依股票存於本機 Parquet 檔。
+
+Goodinfo! 只提供整頁的股利政策，無法只下載特定年度；因此只在可能有新公布年度時才重新取得頁面，
+解析時由最新年度往下讀到已存的最新年度為止，再與本機歷史合併，舊年度不會重複解析。
+"""
+import collections
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import instrumentation, market_data
+
+DIVIDEND_COLUMNS = ["Year", "Cash", "Stock", "EPS"]
+GOODINFO_DIVIDEND_TABLE_CLASS = "b1 p4_2 r10 box_shadow"
+DIVIDEND_HISTORY_DIR = os.path.join(market_data.DATA_DIR, "dividends")
+# 已有當年度股利時，隔多久再檢查一次（同一年度可能追加季配息）；尚無當年度股利時，依股利快取的 TTL 重新檢查
+DIVIDEND_RECHECK_AGE = float(os.environ.get("EVALUATE_TOOL_DIVIDEND_RECHECK_AGE", 7 * 24 * 3600))
+
+
+def _empty_history():
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Year": pd.Series(dtype="int64"), "Cash": pd.Series(dtype="float64"),
+        "Stock": pd.Series(dtype="float64"), "EPS": pd.Series(dtype="float64"),
+    })
+
+
+def _parse_number(text, missing):
+    text = text.replace(",", "").strip()
+    if text in ("", "-", "--"):
+        return missing
+    try:
+        return float(text)
+    except ValueError:
+        return missing
+
+
+def _header_labels(header_rows):
+    """
+    將（可能含 rowspan/colspan 的）多層標題列展開，回傳每一欄由上到下串接的標題。
+    """
+    labels = collections.defaultdict(list)
+    occupied = set()
+    for r, row in enumerate(header_rows):
+        c = 0
+        for cell in row:
+            while (r, c) in occupied:
+                c += 1
+            text = cell.text_content().strip()
+            rowspan = int(cell.get("rowspan", 1) or 1)
+            colspan = int(cell.get("colspan", 1) or 1)
+            for dr in range(rowspan):
+                for dc in range(colspan):
+                    occupied.add((r + dr, c + dc))
+                    if text and (not labels[c + dc] or labels[c + dc][-1] != text):
+                        labels[c + dc].append(text)
+            c += colspan
+    return {c: "/".join(parts) for c, parts in labels.items()}
+
+
+def _find_column(labels, keyword):
+    # 同名的欄位群組（如現金股利的盈餘/公積/合計）取最後一欄，即合計
+    matches = [c for c, label in sorted(labels.items()) if keyword in label]
+    return matches[-1] if matches else None
+
+
+def parse_goodinfo_dividends(html, min_year=None):
+    """
+    解析 Goodinfo! 股利政策頁面，回傳各年度的現金/股票股利（與 EPS，頁面沒有時為 NaN），由新到舊排列。
+    給定 min_year 時讀到早於該年度的資料列即停止。找不到股利表格時回傳 None。
+    """
+    import lxml.html
+    import pandas as pd
+
+    root = lxml.html.fromstring(html)
+    tables = root.xpath(f'//table[@class="{GOODINFO_DIVIDEND_TABLE_CLASS}"]')
+    if not tables:
+        return None
+    rows = tables[0].xpath("./tr|./thead/tr|./tbody/tr")
+    header_rows = []
+    for row in rows:
+        if row.xpath("./td"):
+            break
+        header_rows.append(row.xpath("./th"))
+    labels = _header_labels(header_rows)
+    year_col, cash_col, stock_col = (_find_column(labels, k) for k in ("年度", "現金股利", "股票股利"))
+    eps_col = _find_column(labels, "EPS")
+    if year_col is None or cash_col is None or stock_col is None:
+        return _empty_history()
+
+    records = []
+    seen = set()
+    for row in rows[len(header_rows):]:
+        cells = [cell.text_content() for cell in row.xpath("./td|./th")]
+        if len(cells) <= max(year_col, cash_col, stock_col):
+            continue
+        year_text = cells[year_col].strip()
+        if not year_text.isdigit():
+            # 累計、說明等非年度資料列
+            continue
+        year = int(year_text)
+        if min_year is not None and year < min_year:
+            break
+        if year in seen:
+            continue
+        seen.add(year)
+        eps = _parse_number(cells[eps_col], np.nan) if eps_col is not None and eps_col < len(cells) else np.nan
+        records.append((year, _parse_number(cells[cash_col], 0.0), _parse_number(cells[stock_col], 0.0), eps))
+    if not records:
+        return _empty_history()
+    return pd.DataFrame.from_records(records, columns=DIVIDEND_COLUMNS)
+
+
+def merge_dividend_history(history, update):
+    """
+    合併本機歷史與新解析的資料列：相同年度以新資料為準（例如當年度追加的季配息），結果由新到舊排列。
+    """
+    import pandas as pd
+
+    if history is None or history.empty:
+        return update.reset_index(drop=True)
+    if update is None or update.empty:
+        return history
+    kept = history[~history["Year"].isin(update["Year"])]
+    merged = pd.concat([update, kept], ignore_index=True)
+    return merged.sort_values("Year", ascending=False, ignore_index=True)
+
+
+class DividendHistoryStore:
+    """
+    依股票代號存放完整股利歷史（每檔一個 Parquet 檔，附最後檢查時間），並負責判斷何時需要重新取得頁面。
+    """
+
+    def __init__(self, directory=DIVIDEND_HISTORY_DIR, recheck_age=DIVIDEND_RECHECK_AGE, retry_age=None, missing_age=None):
+        self.directory = directory
+        self.recheck_age = recheck_age
+        self.retry_age = market_data.DIVIDEND_CACHE_TTL if retry_age is None else retry_age
+        # 頁面沒有股利表格（代號錯誤或被網站阻擋）時，間隔此秒數才再次取得頁面
+        self.missing_age = market_data.NEGATIVE_CACHE_TTL if missing_age is None else missing_age
+        self._locks = collections.defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def path(self, stock_id):
+        return os.path.join(self.directory, f"{stock_id}.parquet")
+
+    def read(self, stock_id):
+        """
+        讀取本機歷史，回傳 (history, checked_at)；沒有歷史檔時回傳 (None, None)，
+        只記錄過「頁面沒有股利表格」時回傳 (None, checked_at)。
+        """
+        import pyarrow.parquet as pq
+
+        path = self.path(stock_id)
+        if not os.path.exists(path):
+            return None, None
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        checked_at = float(metadata.get(b"checked_at", b"0").decode())
+        if metadata.get(b"missing") == b"1":
+            return None, checked_at
+        return table.to_pandas(), checked_at
+
+    def write(self, stock_id, history, checked_at):
+        """
+        寫入歷史與檢查時間；history 為 None 時只記錄檢查時間（頁面沒有股利表格）。
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        metadata = {"checked_at": repr(checked_at)}
+        if history is None:
+            history = pd.DataFrame({c: pd.Series(dtype=float) for c in DIVIDEND_COLUMNS})
+            metadata["missing"] = "1"
+        table = pa.Table.from_pandas(history[DIVIDEND_COLUMNS], preserve_index=False)
+        table = table.replace_schema_metadata(metadata)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(stock_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path(stock_id))
+
+    def needs_update(self, history, checked_at, now=None):
+        if checked_at is None:
+            return True
+        now = time.time() if now is None else now
+        if history is None:
+            return now - checked_at > self.missing_age
+        has_current_year = not history.empty and int(history["Year"].max()) >= time.localtime(now).tm_year
+        return now - checked_at > (self.recheck_age if has_current_year else self.retry_age)
+
+    def _stock_lock(self, stock_id):
+        with self._locks_lock:
+            return self._locks[stock_id]
+
+    def get(self, stock_id, force=False):
+        """
+        回傳完整股利歷史（由新到舊）。本機歷史仍有效時不連網；否則取得頁面、只解析新年度並寫回。
+        頁面找不到股利表格時回傳 None；連線失敗時若已有本機歷史則沿用之，否則拋出例外。
+        """
+        with self._stock_lock(stock_id):
+            history, checked_at = self.read(stock_id)
+            if not force and not self.needs_update(history, checked_at):
+                instrumentation.count("dividends.store_hits")
+                return history
+            # 最新已存年度也重新解析，當年度追加的股利會覆蓋舊資料
+            min_year = None if history is None or history.empty else int(history["Year"].max())
+            try:
+                html = market_data.fetch_goodinfo_dividend_page(stock_id)
+            except Exception:
+                if history is not None:
+                    return history
+                raise
+            with instrumentation.timed("dividends.parse"):
+                update = parse_goodinfo_dividends(html, min_year=min_year)
+            if update is None:
+                # 記錄檢查時間，重跑時依 needs_update 節流，不會每次都重新取得頁面
+                self.write(stock_id, history, time.time())
+                return history
+            merged = merge_dividend_history(history, update)
+            if not merged.empty:
+                instrumentation.count("dividends.parsed_rows", len(update))
+            self.write(stock_id, merged, time.time())
+            return merged
+
+
+@functools.lru_cache(maxsize=None)
+def get_dividend_history_store():
+    """
+    取得整個程序共用的股利歷史存放區。
+    """
+    return DividendHistoryStore()
+
+
+def dividend_statistics(history, price=None, years=None):
+    """
+    依股利歷史（可只取最近 years 年）計算配息統計：年數、連續配發現金股利年數、平均現金/合計股利、
+    現金股利年複合成長率與變異係數、平均盈餘配發率（有 EPS 時），以及以目前股價計算的平均殖利率（%）。
+    """
+    if history is None or history.empty:
+        return {}
+    recent = history.sort_values("Year", ascending=False)
+    if years:
+        recent = recent.head(years)
+    year = recent["Year"].to_numpy(dtype=np.int64)
+    cash = recent["Cash"].to_numpy(dtype=np.float64)
+    total = cash + recent["Stock"].to_numpy(dtype=np.float64)
+    eps = recent["EPS"].to_numpy(dtype=np.float64) if "EPS" in recent else np.full(len(recent), np.nan)
+
+    unpaid = np.flatnonzero(cash <= 0)
+    span = int(year[0] - year[-1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (cash[0] / cash[-1]) ** (1 / span) - 1 if span > 0 and cash[0] > 0 and cash[-1] > 0 else np.nan
+        payout = cash / eps
+    valid_payout = payout[np.isfinite(eps) & (eps > 0)]
+    avg_cash = float(cash.mean())
+    return {
+        "years": len(recent),
+        "first_year": int(year[-1]),
+        "last_year": int(year[0]),
+        "consecutive_years": int(unpaid[0]) if len(unpaid) else len(recent),
+        "avg_cash": avg_cash,
+        "avg_total": float(total.mean()),
+        "cash_cagr": float(cagr),
+        "cash_cv": float(cash.std() / avg_cash) if avg_cash > 0 else np.nan,
+        "avg_payout_ratio": float(valid_payout.mean()) if len(valid_payout) else np.nan,
+        "avg_yield_pct": avg_cash / price * 100 if price else np.nan,
+    }
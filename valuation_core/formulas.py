@@ -0,0 +1,709 @@
+"""
+公式引擎：編譯並快取公式、依拓撲順序增量計算，以及向量化的批次評價。
+"""
+import ast
+import functools
+import graphlib
+import operator
+
+import numpy as np
+
+from .bonds import (
+    bond_convexity, bond_dv01, bond_macaulay_duration, bond_modified_duration, bond_price, bond_yield_to_maturity,
+)
+from .cashflows import multi_stage_dcf, multi_stage_ddm
+from .options import binomial_option, black_scholes, lsm_option
+
+
+def safe_float(val):
+    """
+    將輸入（可含千分位逗號或空白）轉為浮點數，無法轉換時回傳 None。
+    """
+    try:
+        return float(str(val).replace(',', '').replace(' ', ''))
+    except (ValueError, TypeError):
+        return None
+
+
+# range 的長度上限、序列重複（* 運算）結果的長度上限與整數次方的指數上限，避免公式耗盡時間或記憶體。
+# 生成式只允許單層（見 validate_formula），迭代次數受 range 與序列長度限制，產生的元素總數也因此有上限。
+MAX_FORMULA_RANGE = 10_000
+MAX_FORMULA_SEQUENCE = 1_000
+MAX_INT_EXPONENT = 10_000
+# 整數次方結果的位元數上限（約 3 萬位數）
+MAX_INT_BITS = 100_000
+
+
+def _bounded_range(*args):
+    values = range(*args)
+    if len(values) > MAX_FORMULA_RANGE:
+        raise ValueError(f"range 長度超過上限 {MAX_FORMULA_RANGE:,}")
+    return values
+
+
+def _safe_pow(base, exponent):
+    # 整數的超大次方會產生極大的整數而耗盡時間與記憶體
+    if isinstance(base, int) and isinstance(exponent, int):
+        if abs(exponent) > MAX_INT_EXPONENT:
+            raise ValueError(f"整數次方的指數超過上限 {MAX_INT_EXPONENT:,}")
+        if exponent > 0 and base.bit_length() * exponent > MAX_INT_BITS:
+            raise ValueError(f"整數次方的結果超過上限 {MAX_INT_BITS:,} 位元")
+    return base ** exponent
+
+
+_SEQUENCE_TYPES = (str, bytes, list, tuple)
+
+
+def _safe_mul(left, right):
+    # 字串或串列乘以整數會重複序列（例如 [0]*10**9），結果長度超過上限時拒絕；浮點數相乘（最常見）直接計算
+    if type(left) is float or type(right) is float:
+        return left * right
+    for seq, count in ((left, right), (right, left)):
+        if isinstance(seq, _SEQUENCE_TYPES) and isinstance(count, (int, np.integer)) and len(seq) * count > MAX_FORMULA_SEQUENCE:
+            raise ValueError(f"序列重複的結果長度超過上限 {MAX_FORMULA_SEQUENCE:,}")
+    if isinstance(left, np.ndarray) and left.dtype == object or isinstance(right, np.ndarray) and right.dtype == object:
+        # 物件陣列的元素可能是字串，逐元素檢查
+        return _safe_mul_elements(left, right)
+    return left * right
+
+
+_safe_mul_elements = np.frompyfunc(_safe_mul, 2, 1)
+
+
+def _safe_sum(iterable, start=0):
+    # 以串列或序列為起始值的 sum 會反覆串接而耗用平方時間
+    if isinstance(start, _SEQUENCE_TYPES):
+        raise ValueError("sum 的起始值必須是數值")
+    return sum(iterable, start)
+
+
+# 公式中可呼叫的內建函式（以白名單提供，公式無法取得其他內建函式）
+FORMULA_BUILTINS = {
+    "sum": _safe_sum, "all": all, "any": any, "filter": filter, "range": _bounded_range, "len": len,
+    "int": int, "float": float, "str": str, "bool": bool, "abs": abs, "min": min, "max": max, "round": round,
+}
+
+# 公式中可直接呼叫的計算函式（皆支援純量與陣列）
+FORMULA_FUNCTIONS = {
+    "bond_price": bond_price,
+    "bond_yield_to_maturity": bond_yield_to_maturity,
+    "bond_macaulay_duration": bond_macaulay_duration,
+    "bond_modified_duration": bond_modified_duration,
+    "bond_convexity": bond_convexity,
+    "bond_dv01": bond_dv01,
+    "black_scholes": black_scholes,
+    "binomial_option": binomial_option,
+    "lsm_option": lsm_option,
+    "multi_stage_dcf": multi_stage_dcf,
+    "multi_stage_ddm": multi_stage_ddm,
+}
+
+# 公式中可使用、不視為欄位依賴的名稱
+FORMULA_RESERVED_NAMES = frozenset(["None", "True", "False", *FORMULA_BUILTINS])
+
+_MISSING = object()
+
+# 公式可使用的語法：運算式、條件式、串列/生成式與白名單函式呼叫；屬性存取、索引、lambda、賦值等一律拒絕
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Call, ast.keyword,
+    ast.Name, ast.Constant, ast.List, ast.Tuple, ast.ListComp, ast.GeneratorExp, ast.comprehension,
+    ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop,
+)
+_NODE_LABELS = {
+    ast.Attribute: "屬性存取（.）", ast.Subscript: "索引（[]）", ast.Lambda: "lambda", ast.NamedExpr: "賦值（:=）",
+    ast.Dict: "字典", ast.Set: "集合", ast.DictComp: "字典生成式", ast.SetComp: "集合生成式", ast.Starred: "星號展開（*）",
+    ast.JoinedStr: "f-string", ast.Await: "await", ast.Yield: "yield", ast.YieldFrom: "yield", ast.Slice: "切片",
+}
+
+
+def validate_formula(expr):
+    """
+    解析公式並以白名單檢查語法，回傳 AST；含不允許的語法或函式時拋出 ValueError（語法錯誤時拋出 SyntaxError）。
+    """
+    tree = ast.parse(expr, mode="eval")
+    callables = FORMULA_BUILTINS.keys() | FORMULA_FUNCTIONS.keys()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"不允許的語法：{_NODE_LABELS.get(type(node), type(node).__name__)}")
+        if isinstance(node, ast.Name) and node.id.startswith("_"):
+            raise ValueError(f"不允許使用底線開頭的名稱：{node.id}")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in callables:
+                name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+                raise ValueError(f"不允許呼叫的函式：{name}")
+        elif isinstance(node, ast.keyword) and node.arg is None:
+            raise ValueError("不允許的語法：星號展開（**）")
+        elif isinstance(node, ast.comprehension) and node.is_async:
+            raise ValueError("不允許的語法：async")
+        elif isinstance(node, (ast.ListComp, ast.GeneratorExp)):
+            # 多個 for 或巢狀生成式的迭代次數為各層相乘，無法以 range 的長度上限約束
+            if len(node.generators) > 1:
+                raise ValueError("不允許的語法：生成式中有多個 for")
+            if any(isinstance(inner, (ast.ListComp, ast.GeneratorExp)) for inner in ast.walk(node) if inner is not node):
+                raise ValueError("不允許的語法：巢狀生成式")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str, type(None))):
+            raise ValueError(f"不允許的常數：{node.value!r}")
+    return tree
+
+
+def validate_formulas(formulas):
+    """
+    檢查整組公式，回傳 {公式代碼: 錯誤訊息}（全部通過時為空字典）。
+    """
+    errors = {}
+    for k, expr in formulas.items():
+        try:
+            compile_formula(expr)
+        except (SyntaxError, ValueError) as e:
+            errors[k] = f"公式錯誤：{e}"
+    return errors
+
+
+class _GuardOperators(ast.NodeTransformer):
+    """
+    將次方與乘法改為呼叫 _safe_pow、_safe_mul；兩邊皆為數值常數時於編譯時先行計算（指數過大時公式無法通過檢查）。
+    """
+
+    _GUARDS = {ast.Pow: ("_pow", _safe_pow), ast.Mult: ("_mul", _safe_mul)}
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        guard = self._GUARDS.get(type(node.op))
+        if guard is not None:
+            name, function = guard
+            if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant) \
+                    and all(type(c.value) in (int, float) for c in (node.left, node.right)):
+                try:
+                    return ast.Constant(value=function(node.left.value, node.right.value))
+                except (ArithmeticError, TypeError):
+                    pass
+            return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+
+def _build_function(body, parameters, namespace, filename):
+    """
+    將運算式 AST 包成以依賴欄位為參數的函式並編譯；函式的全域命名空間只有 namespace 中的名稱。
+    """
+    module = ast.parse(f"def formula({', '.join(parameters)}):\n    return None")
+    module.body[0].body[0].value = _GuardOperators().visit(body)
+    ast.fix_missing_locations(module)
+    scope = {"__builtins__": {}, "_pow": _safe_pow, "_mul": _safe_mul, **namespace}
+    exec(compile(module, filename, "exec"), scope)
+    return scope["formula"]
+
+
+class CompiledFormula:
+    """
+    已檢查並編譯的公式：function 以依賴欄位（依 parameters 順序）為參數計算純量結果；
+    vector 為作用於 NumPy 陣列的版本（無法向量化時為 None）。
+    """
+
+    __slots__ = ("expression", "parameters", "dependencies", "function", "vector", "arguments")
+
+    def __init__(self, expression, parameters, function, vector):
+        self.expression = expression
+        self.parameters = parameters
+        self.dependencies = frozenset(parameters)
+        self.function = function
+        self.vector = vector
+        # arguments(namespace) 依參數順序取出引數（tuple）
+        if len(parameters) > 1:
+            self.arguments = operator.itemgetter(*parameters)
+        elif parameters:
+            self.arguments = lambda namespace, name=parameters[0]: (namespace[name],)
+        else:
+            self.arguments = lambda namespace: ()
+
+    def __call__(self, namespace):
+        return self.function(*self.arguments(namespace))
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_formula(expr):
+    """
+    檢查公式並編譯為純量與陣列兩個版本的函式（CompiledFormula），結果依公式文字快取，相同公式只會解析一次。
+    含不允許的語法時拋出 ValueError，語法錯誤時拋出 SyntaxError。
+    """
+    tree = validate_formula(expr)
+    loaded, bound = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+    parameters = tuple(sorted(loaded - bound - FORMULA_RESERVED_NAMES - FORMULA_FUNCTIONS.keys()))
+    function = _build_function(tree.body, parameters, {**FORMULA_BUILTINS, **FORMULA_FUNCTIONS}, "<formula>")
+    try:
+        # 純量版本已改寫了 tree，陣列版本由原公式重新解析
+        vector_tree = _VectorizeTransformer().visit(ast.parse(expr, mode="eval"))
+    except _Unvectorizable:
+        vector = None
+    else:
+        vector = _build_function(vector_tree.body, parameters, {**VECTOR_HELPERS, **FORMULA_FUNCTIONS}, "<vector formula>")
+    return CompiledFormula(expr, parameters, function, vector)
+
+
+# --- 向量化公式（批次評價使用）---
+# 欄位值以 NumPy 陣列表示，None 以 NaN 表示；以下輔助函式重現 Python 純量運算的真值與條件語意。
+def _v_truth(x):
+    if isinstance(x, np.ndarray):
+        if x.dtype == bool:
+            return x
+        if x.dtype.kind in "fiu":
+            return (x != 0) & ~np.isnan(x)
+        return np.array([_v_truth(e) for e in x], dtype=bool)
+    if x is None or (isinstance(x, float) and np.isnan(x)):
+        return False
+    return bool(x)
+
+
+def _v_isnone(x):
+    if isinstance(x, np.ndarray):
+        if x.dtype.kind in "fiu":
+            return np.isnan(x)
+        return np.array([_v_isnone(e) for e in x], dtype=bool)
+    return x is None or (isinstance(x, float) and np.isnan(x))
+
+
+def _v_is_text(x):
+    return isinstance(x, str) or (isinstance(x, np.ndarray) and x.dtype.kind in "OUS")
+
+
+def _v_where(cond, a, b):
+    if not isinstance(cond, np.ndarray):
+        return a if cond else b
+    if _v_is_text(a) or _v_is_text(b):
+        # 避免 NumPy 將 NaN 轉為字串 'nan'
+        a, b = np.asarray(a, dtype=object), np.asarray(b, dtype=object)
+    return np.where(cond, a, b)
+
+
+def _v_and(*vals):
+    out = vals[-1]
+    for val in reversed(vals[:-1]):
+        out = _v_where(_v_truth(val), out, val)
+    return out
+
+
+def _v_or(*vals):
+    out = vals[-1]
+    for val in reversed(vals[:-1]):
+        out = _v_where(_v_truth(val), val, out)
+    return out
+
+
+def _v_not(x):
+    return ~_v_truth(x) if isinstance(x, np.ndarray) else not _v_truth(x)
+
+
+def _v_all(*vals):
+    return functools.reduce(np.logical_and, [_v_truth(x) for x in vals], True)
+
+
+def _v_any(*vals):
+    return functools.reduce(np.logical_or, [_v_truth(x) for x in vals], False)
+
+
+def _v_sum(*vals):
+    return functools.reduce(np.add, vals, 0)
+
+
+def _v_sum_truthy(*vals):
+    # 對應 sum(filter(None, [...]))：略過 None 與 0
+    return functools.reduce(np.add, [_v_where(_v_truth(x), x, 0) for x in vals], 0)
+
+
+VECTOR_HELPERS = {
+    "_v_truth": _v_truth, "_v_isnone": _v_isnone, "_v_where": _v_where, "_v_and": _v_and,
+    "_v_or": _v_or, "_v_not": _v_not, "_v_all": _v_all, "_v_any": _v_any,
+    "_v_sum": _v_sum, "_v_sum_truthy": _v_sum_truthy, "_v_nan": np.nan,
+    "float": lambda x: np.asarray(x, dtype=float) if isinstance(x, np.ndarray) else float(x),
+    # np.minimum/np.maximum 只接受兩個運算元（第三個位置引數會被當成 out=），多個引數時逐一比較
+    "abs": np.abs, "min": lambda *xs: functools.reduce(np.minimum, xs), "max": lambda *xs: functools.reduce(np.maximum, xs),
+}
+
+
+class _Unvectorizable(Exception):
+    pass
+
+
+class _VectorizeTransformer(ast.NodeTransformer):
+    """
+    將純量公式的 AST 改寫為可直接作用於 NumPy 陣列的運算。
+    """
+
+    # int() 不向量化：純量的 int(None) 會拋出例外，截斷後的陣列則會是 NaN，改為逐列計算以保持相同語意
+    _ALLOWED_CALLS = {"float", "abs", "min", "max"}
+
+    @staticmethod
+    def _call(name, args):
+        return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self._call("_v_where", [self._call("_v_truth", [node.test]), node.body, node.orelse])
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return self._call("_v_and" if isinstance(node.op, ast.And) else "_v_or", node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call("_v_not", [node.operand])
+        return node
+
+    def visit_Compare(self, node):
+        if len(node.ops) != 1:
+            raise _Unvectorizable("chained comparison")
+        op, right = node.ops[0], node.comparators[0]
+        if isinstance(op, (ast.Is, ast.IsNot)):
+            if not (isinstance(right, ast.Constant) and right.value is None):
+                raise _Unvectorizable("identity comparison")
+            check = self._call("_v_isnone", [self.visit(node.left)])
+            return check if isinstance(op, ast.Is) else self._call("_v_not", [check])
+        self.generic_visit(node)
+        return node
+
+    def visit_Constant(self, node):
+        if node.value is None:
+            return ast.Name(id="_v_nan", ctx=ast.Load())
+        return node
+
+    def _literal_items(self, node):
+        """
+        展開 [..] 串列，或對字面串列迭代的單層生成式，回傳元素 AST 清單。
+        """
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [self.visit(e) for e in node.elts]
+        if isinstance(node, (ast.ListComp, ast.GeneratorExp)) and len(node.generators) == 1:
+            gen = node.generators[0]
+            if isinstance(gen.target, ast.Name) and not gen.ifs and isinstance(gen.iter, (ast.List, ast.Tuple)):
+                items = []
+                for e in gen.iter.elts:
+                    items.append(self.visit(_SubstituteName(gen.target.id, e).visit(_copy_ast(node.elt))))
+                return items
+        raise _Unvectorizable("unsupported sequence")
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise _Unvectorizable("unsupported call")
+        name = node.func.id
+        if name in ("sum", "all", "any") and len(node.args) == 1:
+            arg = node.args[0]
+            if name == "sum" and isinstance(arg, ast.Call) and isinstance(arg.func, ast.Name) and arg.func.id == "filter" \
+                    and len(arg.args) == 2 and isinstance(arg.args[0], ast.Constant) and arg.args[0].value is None:
+                return self._call("_v_sum_truthy", self._literal_items(arg.args[1]))
+            return self._call(f"_v_{name}", self._literal_items(arg))
+        if name in ("min", "max") and (len(node.args) < 2 or any(isinstance(a, ast.Starred) for a in node.args)):
+            # 單一引數的 min/max 是對序列取值，無法逐元素比較
+            raise _Unvectorizable(f"{name} with fewer than two arguments")
+        if name in self._ALLOWED_CALLS or name in FORMULA_FUNCTIONS:
+            self.generic_visit(node)
+            return node
+        raise _Unvectorizable(f"unsupported function {name}")
+
+    def visit_Lambda(self, node):
+        raise _Unvectorizable("lambda")
+
+    def visit_Subscript(self, node):
+        raise _Unvectorizable("subscript")
+
+    def visit_ListComp(self, node):
+        raise _Unvectorizable("comprehension")
+
+    visit_GeneratorExp = visit_SetComp = visit_DictComp = visit_ListComp
+
+
+class _SubstituteName(ast.NodeTransformer):
+    def __init__(self, name, replacement):
+        self.name = name
+        self.replacement = replacement
+
+    def visit_Name(self, node):
+        if node.id == self.name and isinstance(node.ctx, ast.Load):
+            return _copy_ast(self.replacement)
+        return node
+
+
+def _copy_ast(node):
+    return ast.parse(ast.unparse(node), mode="eval").body
+
+
+def compile_vector_formula(expr):
+    """
+    回傳公式的陣列版本函式；無法向量化或未通過檢查的公式回傳 None（改為逐列計算）。
+    """
+    try:
+        return compile_formula(expr).vector
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _to_scalar(x):
+    if isinstance(x, (float, np.floating)):
+        return None if np.isnan(x) else float(x)
+    return x
+
+
+def _find_cycles(graph):
+    """
+    找出依賴圖中的所有循環，回傳循環路徑清單（例如 ['a', 'b', 'a']）。
+    """
+    cycles = []
+    remaining = dict(graph)
+    while remaining:
+        try:
+            graphlib.TopologicalSorter(remaining).prepare()
+            break
+        except graphlib.CycleError as e:
+            cycle = e.args[1]
+            cycles.append(cycle)
+            removed = set(cycle)
+            remaining = {k: deps - removed for k, deps in remaining.items() if k not in removed}
+    return cycles
+
+
+@functools.lru_cache(maxsize=64)
+def _formula_graph(deps):
+    """
+    依各公式的依賴（frozenset of (公式, 依賴集合)）建立 (下游對照, 無法計算的公式與原因, 拓撲順序)；
+    結果為整個程序共用的唯讀資料，呼叫端不可修改。
+    """
+    deps = dict(deps)
+    graph = {k: set(d) & deps.keys() for k, d in deps.items()}
+    dependents = {}
+    for k, d in deps.items():
+        for name in d:
+            dependents.setdefault(name, set()).add(k)
+    dependents = {name: frozenset(ks) for name, ks in dependents.items()}
+
+    blocked = {}
+    for cycle in _find_cycles(graph):
+        msg = "循環依賴：" + " → ".join(cycle)
+        for k in cycle[:-1]:
+            blocked[k] = msg
+    seen = set(blocked)
+    stack = list(blocked)
+    while stack:
+        for k in dependents.get(stack.pop(), ()):
+            if k not in seen:
+                seen.add(k)
+                stack.append(k)
+                blocked[k] = "依賴的公式存在循環，無法計算"
+
+    acyclic = {k: d for k, d in graph.items() if k not in blocked}
+    return dependents, blocked, tuple(graphlib.TopologicalSorter(acyclic).static_order())
+
+
+class FormulaEngine:
+    """
+    增量式公式引擎：公式僅編譯一次，依拓撲順序計算，且只重算受變動輸入影響的下游公式。
+    """
+
+    def __init__(self, formulas=None):
+        self.formulas = {}
+        self._compiled = {}
+        self._deps = {}
+        self._compile_errors = {}
+        self._order = ()
+        self._blocked = {}
+        self._dependents = {}
+        self._namespace = {}
+        self._inputs = {}
+        self._unresolved = set()
+        self._errors = {}
+        self._dirty = set()
+        self.last_recomputed = 0
+        if formulas:
+            self.set_formulas(formulas)
+
+    def set_formulas(self, formulas):
+        """
+        更新公式集；僅重新編譯有變動的公式，並將其下游標記為待重算。
+        """
+        formulas = dict(formulas)
+        if formulas == self.formulas:
+            return
+        changed = {k for k in formulas.keys() | self.formulas.keys() if formulas.get(k) != self.formulas.get(k)}
+        for k in changed:
+            self._compiled.pop(k, None)
+            self._deps.pop(k, None)
+            self._compile_errors.pop(k, None)
+            self._errors.pop(k, None)
+            self._unresolved.discard(k)
+            if k not in formulas:
+                self._namespace.pop(k, None)
+                if k in self._inputs:
+                    self._namespace[k] = self._inputs[k]
+                continue
+            try:
+                self._compiled[k] = compile_formula(formulas[k])
+                self._deps[k] = self._compiled[k].dependencies
+            except (SyntaxError, ValueError) as e:
+                self._compile_errors[k] = f"公式錯誤：{e}"
+                self._deps[k] = frozenset()
+        self.formulas = formulas
+        self._build_graph()
+        self._dirty |= self._downstream(changed)
+
+    def _build_graph(self):
+        # 相同公式集的依賴圖與計算順序只建立一次，由所有引擎（各 session）共用
+        self._dependents, blocked, self._order = _formula_graph(frozenset(self._deps.items()))
+        self._blocked = blocked
+        for k in blocked:
+            self._namespace.pop(k, None)
+
+    def _downstream(self, names):
+        """
+        回傳依賴於 names（含間接依賴）的所有公式，以及 names 中本身即為公式者。
+        """
+        seen = {n for n in names if n in self.formulas}
+        stack = list(names)
+        while stack:
+            for k in self._dependents.get(stack.pop(), ()):
+                if k not in seen:
+                    seen.add(k)
+                    stack.append(k)
+        return seen
+
+    def evaluate(self, inputs):
+        """
+        以輸入值計算所有公式，回傳 (結果, 錯誤訊息)；只重算受變動影響的公式。
+        """
+        ns = self._namespace
+        changed = {k for k in inputs.keys() | self._inputs.keys() if inputs.get(k, _MISSING) != self._inputs.get(k, _MISSING)}
+        for k in changed:
+            if k in inputs:
+                ns[k] = inputs[k]
+            else:
+                ns.pop(k, None)
+        self._inputs = dict(inputs)
+        dirty = self._dirty | self._downstream(changed)
+        self._dirty = set()
+
+        recomputed = 0
+        for k in self._order:
+            if k not in dirty:
+                continue
+            recomputed += 1
+            self._unresolved.discard(k)
+            self._errors.pop(k, None)
+            if k in self._compile_errors:
+                ns[k] = None
+                self._errors[k] = self._compile_errors[k]
+                continue
+            missing = self._deps[k].difference(ns)
+            if missing:
+                ns.pop(k, None)
+                self._unresolved.add(k)
+                self._errors[k] = f"欄位依賴未解決（不存在或無法計算的欄位：{', '.join(sorted(missing))}）"
+                continue
+            try:
+                compiled = self._compiled[k]
+                ns[k] = compiled.function(*compiled.arguments(ns))
+            except Exception as e:
+                ns[k] = None
+                self._errors[k] = f"公式錯誤：{str(e)}"
+        self.last_recomputed = recomputed
+
+        result = dict(self._inputs)
+        for k in self.formulas:
+            result[k] = ns.get(k) if k not in self._unresolved and k not in self._blocked else None
+        errors = dict(self._errors)
+        errors.update(self._blocked)
+        return result, errors
+
+    def evaluate_batch(self, columns, n_rows):
+        """
+        以欄位陣列（每個欄位一個長度 n_rows 的陣列，None 以 NaN 表示）一次計算多家公司的所有公式。
+        可向量化的公式以整欄運算，其餘公式退回逐列計算；回傳 (結果陣列, 錯誤訊息)。
+        """
+        ns = dict(columns)
+        results = {}
+        errors = dict(self._blocked)
+        for k in self._blocked:
+            results[k] = np.full(n_rows, np.nan)
+        for k in self._order:
+            if k in self._compile_errors:
+                errors[k] = self._compile_errors[k]
+                ns[k] = results[k] = np.full(n_rows, np.nan)
+                continue
+            missing = self._deps[k].difference(ns)
+            if missing:
+                errors[k] = f"欄位依賴未解決（不存在或無法計算的欄位：{', '.join(sorted(missing))}）"
+                results[k] = np.full(n_rows, np.nan)
+                continue
+            value = None
+            compiled = self._compiled[k]
+            if compiled.vector is not None:
+                try:
+                    with np.errstate(all="ignore"):
+                        value = compiled.vector(*compiled.arguments(ns))
+                except Exception:
+                    value = None
+            if value is None:
+                value = self._evaluate_rows(k, ns, n_rows, errors)
+            value = np.broadcast_to(np.asarray(value), (n_rows,))
+            if value.dtype.kind in "US":
+                value = value.astype(object)
+            elif value.dtype.kind == "f":
+                value = np.where(np.isfinite(value), value, np.nan)
+            ns[k] = results[k] = value
+        return results, errors
+
+    def _evaluate_rows(self, k, ns, n_rows, errors):
+        compiled = self._compiled[k]
+        args = compiled.arguments(ns)
+        out = np.empty(n_rows, dtype=object)
+        failed, first_error = 0, None
+        for i in range(n_rows):
+            row = [_to_scalar(val[i] if isinstance(val, np.ndarray) else val) for val in args]
+            try:
+                out[i] = compiled.function(*row)
+            except Exception as e:
+                out[i] = None
+                failed += 1
+                first_error = first_error or str(e)
+        if failed:
+            errors[k] = f"公式錯誤（{failed} 筆）：{first_error}"
+        if all(val is None or isinstance(val, (int, float)) for val in out):
+            return np.array([np.nan if val is None else val for val in out], dtype=float)
+        return out
+
+
+
+def topo_evaluate(formulas, v):
+    """
+    一次性計算公式集，回傳 (結果, 錯誤訊息)。
+    """
+    return FormulaEngine(formulas).evaluate(v)
+
+
+def run_batch_valuation(df, fields, formulas, methods):
+    """
+    批次評價：df 每一列為一家公司（欄位名稱可為欄位 key 或中文名稱），
+    回傳每家公司所有評價方法結果的表格以及公式錯誤訊息。
+    """
+    import pandas as pd
+
+    n_rows = len(df)
+    name_to_key = {f['name']: f['key'] for f in fields}
+    df = df.rename(columns={c: name_to_key[c] for c in df.columns if c in name_to_key})
+    field_keys = [f['key'] for f in fields]
+
+    columns = {}
+    for key in field_keys:
+        if key in df.columns:
+            col = df[key]
+            if not pd.api.types.is_numeric_dtype(col):
+                col = col.astype(str).str.replace(',', '').str.replace(' ', '')
+            columns[key] = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float)
+        else:
+            columns[key] = np.full(n_rows, np.nan)
+
+    results, errors = FormulaEngine(formulas).evaluate_batch(columns, n_rows)
+
+    out = df[[c for c in df.columns if c not in field_keys]].reset_index(drop=True)
+    for m in methods:
+        out[m["name"]] = results.get(m["key"], np.full(n_rows, np.nan))
+    return out, errors
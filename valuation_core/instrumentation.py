@@ -0,0 +1,216 @@
+"""
+效能量測：各階段耗時、網路請求次數與位元組數、快取命中率，並輸出為 JSON 格式的記錄行。
+
+預設關閉；關閉時 timed() 回傳共用的空 context、instrumented() 直接呼叫原函式，額外成本僅一次布林判斷。
+可用環境變數 EVALUATE_TOOL_INSTRUMENTATION=1 啟用，或於執行期間呼叫 set_enabled()（專業版管理員面板）。
+記錄行寫入 logger "valuation_core.perf"；設定 EVALUATE_TOOL_PERF_LOG（檔案路徑，或 "-" 表示 stderr）時自動加上輸出。
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("valuation_core.perf")
+
+# 保留最近幾次執行的摘要，供管理員面板顯示
+HISTORY_SIZE = 50
+
+_enabled = os.environ.get("EVALUATE_TOOL_INSTRUMENTATION", "").lower() in ("1", "true", "yes", "on")
+_current_run = contextvars.ContextVar("valuation_core_run", default=None)
+_history = collections.deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    """
+    啟用或關閉量測（整個程序共用）。
+    """
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def configure_logging(target=None):
+    """
+    為量測 logger 加上 JSON 記錄行的輸出：target 為檔案路徑，"-" 表示 stderr。
+    """
+    target = target or os.environ.get("EVALUATE_TOOL_PERF_LOG")
+    if not target or logger.handlers:
+        return
+    handler = logging.StreamHandler() if target == "-" else logging.FileHandler(target, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RunRecorder:
+    """
+    一次執行（例如一次 Streamlit rerun 或一個批次工作）期間的量測結果，可由多個執行緒同時寫入。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.seconds = None
+        self.stages = {}
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def summary(self):
+        with self._lock:
+            return {
+                "event": "run", "name": self.name, "started_at": self.started_at,
+                "ms": None if self.seconds is None else round(self.seconds * 1e3, 3),
+                "stages": {
+                    stage: {"count": count, "total_ms": round(total * 1e3, 3), "max_ms": round(longest * 1e3, 3)}
+                    for stage, (count, total, longest) in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+
+def _log(record):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+@contextlib.contextmanager
+def _timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        run = _current_run.get()
+        if run is not None:
+            run.add_stage(stage, seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": "stage", "stage": stage, "ms": round(seconds * 1e3, 3)}, ensure_ascii=False))
+
+
+def timed(stage):
+    """
+    量測區塊耗時的 context manager：with timed("load_stock_list"): ...
+    """
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _timed(stage)
+
+
+def instrumented(stage):
+    """
+    量測函式耗時的裝飾器。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(key, n=1):
+    """
+    累加目前執行的計數器（如網路請求次數、位元組數、快取命中）。
+    """
+    if _enabled:
+        run = _current_run.get()
+        if run is not None:
+            run.count(key, n)
+
+
+def record_network(source, n_bytes=None):
+    """
+    記錄一次網路請求；n_bytes 為回應大小（無法得知時為 None，例如經由 yfinance 的請求）。
+    """
+    if _enabled:
+        count(f"net.{source}.calls")
+        if n_bytes is not None:
+            count(f"net.{source}.bytes", n_bytes)
+
+
+@contextlib.contextmanager
+def record_run(name):
+    """
+    將區塊內的量測彙整為一次執行的摘要，結束時寫入歷史並輸出 JSON 記錄行；未啟用時不做任何事。
+    """
+    if not _enabled:
+        yield None
+        return
+    run = RunRecorder(name)
+    token = _current_run.set(run)
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run.seconds = time.perf_counter() - start
+        _current_run.reset(token)
+        summary = run.summary()
+        with _history_lock:
+            _history.append(summary)
+        _log(summary)
+
+
+def submit(executor, func, *args, **kwargs):
+    """
+    將工作送入執行緒池；啟用量測時一併帶入目前執行的 context，背景執行緒中的量測也會計入同一次執行。
+    """
+    if not _enabled:
+        return executor.submit(func, *args, **kwargs)
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def history():
+    """
+    回傳最近執行的摘要（由舊到新）。
+    """
+    with _history_lock:
+        return list(_history)
+
+
+def clear_history():
+    with _history_lock:
+        _history.clear()
+
+
+def stage_percentiles(summaries, percentiles=(50, 95)):
+    """
+    依各次執行的摘要，計算每個階段單次執行總耗時的百分位數（ms）。
+    """
+    import numpy as np
+
+    per_stage = collections.defaultdict(list)
+    for summary in summaries:
+        for stage, stats in summary["stages"].items():
+            per_stage[stage].append(stats["total_ms"])
+        if summary["ms"] is not None:
+            per_stage["(整體)"].append(summary["ms"])
+    return {
+        stage: {"runs": len(values), **{f"p{p}_ms": float(np.percentile(values, p)) for p in percentiles}}
+        for stage, values in per_stage.items()
+    }
+
+
+configure_logging()
@@ -0,0 +1,599 @@
+"""
+市場資料：共用連線池的網路存取、yfinance/Goodinfo! 資料快取，以及台股/美股清單快照（股利歷史見 dividends）。
+requests、bs4、yfinance、pandas、pyarrow 等套件僅在實際使用對應功能時才載入。
+"""
+import functools
+import io
+import os
+import threading
+import time
+from datetime import datetime
+
+from urllib.parse import urlsplit
+
+from . import instrumentation
+from .cache import CACHE_MAXSIZE, TTLCache
+from .search import TW_INDUSTRY_COLUMN, TW_STOCK_COLUMNS, US_INDUSTRY_COLUMN, US_STOCK_COLUMNS, SymbolIndex
+
+HTTP_TIMEOUT = 10
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# 共用資源於第一次使用時建立，並保存於整個程序
+
+
+@functools.lru_cache(maxsize=None)
+def get_fetch_executor():
+    """
+    取得共用執行緒池：彼此獨立的網路請求（股票資訊、股利、股票清單）在此並行處理。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="evaluate_tool_fetch")
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_session():
+    """
+    取得全程共用的 HTTP Session：保持連線（keep-alive）、連線池，以及有上限的重試與退避。
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=3, connect=3, read=2, backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = HTTP_USER_AGENT
+    return session
+
+
+class RateLimiter:
+    """
+    執行緒安全的令牌桶限速器：平均每秒最多 rate 次請求，允許短暫突發 burst 次。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取得一次請求的額度，必要時等待；回傳等待的秒數。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 先預扣額度（可為負值），之後的呼叫者依序排在後面等待
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def fetch_text(url, data=None, headers=None, encoding="utf-8"):
+    """
+    以共用 Session 取得網頁文字；有 data 時送出 POST，否則為 GET。
+    """
+    session = get_http_session()
+    if data is not None:
+        r = session.post(url, headers=headers, data=data, timeout=HTTP_TIMEOUT)
+    else:
+        r = session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+    if encoding:
+        r.encoding = encoding
+    if instrumentation.is_enabled():
+        instrumentation.record_network(urlsplit(url).hostname, len(r.content))
+    return r.text
+
+
+def fetch_stock_info(ticker):
+    """
+    取得 yfinance 的股票資訊 (info)。
+    """
+    import yfinance as yf
+
+    instrumentation.record_network("yfinance")
+    return yf.Ticker(ticker).info
+
+
+def fetch_price_bars(ticker, start=None):
+    """
+    取得 yfinance 的日線資料（未還原權息的原始價格），回傳 date, open, high, low, close, volume 欄位；
+    start 為 None 時取得全部歷史。
+    """
+    import yfinance as yf
+
+    instrumentation.record_network("yfinance")
+    kwargs = {"start": start} if start is not None else {"period": "max"}
+    hist = yf.Ticker(ticker).history(interval="1d", auto_adjust=False, actions=False, **kwargs)
+    if hist is None or hist.empty:
+        return None
+    index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    bars = hist.rename(columns=str.lower)[["open", "high", "low", "close", "volume"]].reset_index(drop=True)
+    bars.insert(0, "date", index.normalize())
+    return bars
+
+
+def fetch_per_share_statements(ticker):
+    """
+    由 yfinance 的年度/季度財報整理每股盈餘與每股淨值的歷史，回傳 date（財報期末）, eps, bvps 欄位。
+    季度資料以近四季 EPS 合計為 eps；取不到的項目為 NaN。
+    """
+    import numpy as np
+    import pandas as pd
+    import yfinance as yf
+
+    instrumentation.record_network("yfinance")
+    t = yf.Ticker(ticker)
+
+    def row(frame, *names):
+        for name in names:
+            if frame is not None and not frame.empty and name in frame.index:
+                return pd.to_numeric(frame.loc[name], errors="coerce").sort_index()
+        return pd.Series(dtype=float)
+
+    annual_eps = row(t.income_stmt, "Diluted EPS", "Basic EPS")
+    quarterly_eps = row(t.quarterly_income_stmt, "Diluted EPS", "Basic EPS")
+    ttm_eps = quarterly_eps.rolling(4).sum().dropna()
+    bvps = pd.concat([
+        row(t.balance_sheet, "Stockholders Equity") / row(t.balance_sheet, "Ordinary Shares Number"),
+        row(t.quarterly_balance_sheet, "Stockholders Equity") / row(t.quarterly_balance_sheet, "Ordinary Shares Number"),
+    ])
+    eps = pd.concat([annual_eps, ttm_eps])
+    frame = pd.DataFrame({
+        "eps": eps[~eps.index.duplicated(keep="last")],
+        "bvps": bvps[~bvps.index.duplicated(keep="last")].replace([np.inf, -np.inf], np.nan),
+    }).sort_index()
+    frame.index = pd.DatetimeIndex(frame.index).tz_localize(None)
+    return frame.rename_axis("date").reset_index()
+
+
+# 財報名稱與 yfinance Ticker 屬性的對應
+FINANCIAL_STATEMENTS = {
+    "income": "income_stmt", "balance": "balance_sheet", "cashflow": "cashflow",
+    "quarterly_income": "quarterly_income_stmt", "quarterly_balance": "quarterly_balance_sheet", "quarterly_cashflow": "quarterly_cashflow",
+}
+
+
+def fetch_financial_statements(ticker):
+    """
+    取得 yfinance 的年度與季度損益表、資產負債表與現金流量表，回傳 {財報名稱: DataFrame}（列為會計科目、欄為期末日期）；
+    取不到的財報為空表。
+    """
+    import pandas as pd
+    import yfinance as yf
+
+    instrumentation.record_network("yfinance")
+    t = yf.Ticker(ticker)
+    statements = {}
+    for name, attr in FINANCIAL_STATEMENTS.items():
+        frame = getattr(t, attr)
+        statements[name] = frame if frame is not None else pd.DataFrame()
+    return statements
+
+
+def fetch_goodinfo_dividend_page(stock_id):
+    """
+    取得 Goodinfo! 的股利政策頁面 HTML。
+    """
+    return fetch_text(f"https://goodinfo.tw/tw/StockDividendPolicy.asp?STOCK_ID={stock_id}")
+
+
+# --- 資料快取（依股票代號，含存活時間與容量上限）---
+# 價格類欄位變動快，使用短 TTL；基本面與股利歷史變動慢，使用長 TTL（秒，可用環境變數調整）
+PRICE_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_PRICE_TTL", 60))
+FUNDAMENTALS_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_FUNDAMENTALS_TTL", 6 * 3600))
+DIVIDEND_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_DIVIDEND_TTL", 24 * 3600))
+# 取得失敗或查無資料（代號錯誤、沒有股利表格、被網站阻擋）的結果以短 TTL 記住，期間內重跑不再連網
+NEGATIVE_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_NEGATIVE_TTL", 300))
+CACHE_MAXSIZE = int(os.environ.get("EVALUATE_TOOL_CACHE_MAXSIZE", CACHE_MAXSIZE))
+
+# 會隨股價變動、需以短 TTL 更新的 info 欄位
+PRICE_FIELDS = (
+    "currentPrice", "regularMarketPrice", "previousClose", "dayHigh", "dayLow", "marketCap",
+    "trailingPE", "priceToBook", "dividendYield", "priceToSalesTrailing12Months",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_data_caches():
+    """
+    取得整個程序共用的資料快取。
+    """
+    return {
+        "price": TTLCache(PRICE_CACHE_TTL, CACHE_MAXSIZE, name="price"),
+        "fundamentals": TTLCache(FUNDAMENTALS_CACHE_TTL, CACHE_MAXSIZE, name="fundamentals"),
+        "dividends": TTLCache(DIVIDEND_CACHE_TTL, CACHE_MAXSIZE, name="dividends"),
+        "statements": TTLCache(FUNDAMENTALS_CACHE_TTL, CACHE_MAXSIZE, name="statements"),
+    }
+
+
+def _fetch_price_fields(ticker, fundamentals):
+    """
+    以 yfinance 的 fast_info 取得最新股價，並重算依股價而變的比率欄位。
+    """
+    import yfinance as yf
+
+    instrumentation.record_network("yfinance")
+    price = float(yf.Ticker(ticker).fast_info["lastPrice"])
+    fields = {"currentPrice": price, "regularMarketPrice": price}
+    eps = fundamentals.get("trailingEps")
+    if eps:
+        fields["trailingPE"] = price / eps if eps > 0 else None
+    if fundamentals.get("bookValue"):
+        fields["priceToBook"] = price / fundamentals["bookValue"]
+    if fundamentals.get("dividendRate") is not None:
+        fields["dividendYield"] = fundamentals["dividendRate"] / price
+    if fundamentals.get("revenuePerShare"):
+        fields["priceToSalesTrailing12Months"] = price / fundamentals["revenuePerShare"]
+    return fields
+
+
+def cache_stock_info(ticker, info):
+    """
+    將完整的股票資訊存入基本面與價格快取；取得失敗（例如代號錯誤）的結果以空 dict 短暫記住。回傳是否為有效資訊。
+    """
+    caches = get_data_caches()
+    if not info or "currentPrice" not in info:
+        caches["fundamentals"].set(ticker, {}, ttl=NEGATIVE_CACHE_TTL)
+        return False
+    caches["fundamentals"].set(ticker, info)
+    caches["price"].set(ticker, {k: info[k] for k in PRICE_FIELDS if k in info})
+    return True
+
+
+@instrumentation.instrumented("stock.info")
+def get_stock_info(ticker):
+    """
+    取得股票資訊（已快取）：基本面以長 TTL 快取，價格類欄位以短 TTL 更新。
+    取得失敗的代號在 NEGATIVE_CACHE_TTL 內直接回傳空 dict，不重新下載。
+    """
+    caches = get_data_caches()
+    fundamentals = caches["fundamentals"].get(ticker)
+    if fundamentals is None:
+        try:
+            info = fetch_stock_info(ticker)
+        except Exception:
+            caches["fundamentals"].set(ticker, {}, ttl=NEGATIVE_CACHE_TTL)
+            raise
+        cache_stock_info(ticker, info)
+        return dict(info) if info else info
+    if not fundamentals:
+        return {}
+    prices = caches["price"].get(ticker)
+    if prices is None:
+        try:
+            prices = _fetch_price_fields(ticker, fundamentals)
+        except Exception:
+            # fast_info 無法使用時，退回重新下載完整資訊
+            caches["fundamentals"].set(ticker, None)
+            return get_stock_info(ticker)
+        caches["price"].set(ticker, prices)
+    return {**fundamentals, **prices}
+
+
+# 股利快取中代表「頁面沒有股利表格」的標記（快取無法存放 None）
+_NO_DIVIDENDS = object()
+
+
+@instrumentation.instrumented("get_dividends_tw")
+def get_dividends_tw_cached(stock_id):
+    """
+    取得台股完整股利歷史（已快取，長 TTL）：優先使用本機股利歷史，只在可能有新年度時才重新取得 Goodinfo! 頁面。
+    """
+    from .dividends import get_dividend_history_store
+
+    cache = get_data_caches()["dividends"]
+    div_df = cache.get(stock_id)
+    if div_df is None:
+        try:
+            div_df = get_dividend_history_store().get(stock_id)
+        except Exception:
+            cache.set(stock_id, _NO_DIVIDENDS, ttl=NEGATIVE_CACHE_TTL)
+            raise
+        if div_df is None or div_df.empty:
+            # 查無股利表格（None）或表格沒有資料（空表）都以短 TTL 記住，回傳值維持原樣
+            cache.set(stock_id, _NO_DIVIDENDS if div_df is None else div_df, ttl=NEGATIVE_CACHE_TTL)
+        else:
+            cache.set(stock_id, div_df)
+    return None if div_df is _NO_DIVIDENDS else div_df
+
+
+# --- 股票清單快照（台股/美股，存於本機 Parquet 檔）---
+DATA_DIR = os.environ.get("EVALUATE_TOOL_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+UNIVERSE_SNAPSHOT_PATH = os.path.join(DATA_DIR, "stock_universe.parquet")
+# 快照超過此秒數即在背景重新抓取
+UNIVERSE_MAX_AGE = float(os.environ.get("EVALUATE_TOOL_UNIVERSE_MAX_AGE", 24 * 3600))
+
+TW_SCRAPE_NOTE = "**台股資料來源為網頁爬蟲，易受網站更新影響。**"
+
+
+@instrumentation.instrumented("scrape_taiwan_stock_list")
+def scrape_taiwan_stock_list():
+    """
+    從公開資訊觀測站爬取台股公司代號與名稱。
+    """
+    import pandas as pd
+    from bs4 import BeautifulSoup
+
+    url_tw = "https://mops.twse.com.tw/mops/web/ajax_t51sb01"
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    data = {
+        "encodeURIComponent": "1", "step": "1", "firstin": "1", "off": "1",
+        "queryName": "co_id", "inpuType": "co_id", "TYPEK": "all", "isQuery": "Y"
+    }
+    soup = BeautifulSoup(fetch_text(url_tw, data=data, headers=headers), 'html.parser')
+    for table in soup.find_all('table'):
+        rows = table.find_all('tr')
+        if len(rows) > 1:
+            header_cols = [th.get_text(strip=True) for th in rows[0].find_all(['th', 'td'])]
+            if '公司代號' in header_cols and '公司名稱' in header_cols:
+                # 產業類別欄位不一定存在（網站改版時），缺少時以空字串代替
+                industry_col = header_cols.index(TW_INDUSTRY_COLUMN) if TW_INDUSTRY_COLUMN in header_cols else None
+                data_rows = []
+                for row in rows[1:]:
+                    cols = row.find_all('td')
+                    if len(cols) >= 2:
+                        industry = cols[industry_col].get_text(strip=True) if industry_col is not None and industry_col < len(cols) else ""
+                        data_rows.append([cols[0].get_text(strip=True), cols[1].get_text(strip=True), industry])
+                if data_rows:
+                    return pd.DataFrame(data_rows, columns=TW_STOCK_COLUMNS + [TW_INDUSTRY_COLUMN])
+    raise ValueError("無法從公開資訊觀測站取得台股資料的表格。這可能是網站結構改變或網路問題。")
+
+
+@instrumentation.instrumented("scrape_us_stock_list")
+def scrape_us_stock_list():
+    """
+    從維基百科取得 S&P 500 成分股代號與名稱。
+    """
+    import pandas as pd
+
+    tables = pd.read_html(io.StringIO(fetch_text("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies")))
+    if not tables:
+        raise ValueError("從維基百科載入美股列表時，未找到任何表格。")
+    temp_us_df = tables[0]
+    if 'Symbol' not in temp_us_df.columns or 'Security' not in temp_us_df.columns:
+        raise ValueError("載入美股列表成功，但缺少預期的 'Symbol' 或 'Security' 欄位。這可能是維基百科表格格式改變。")
+    return with_industry(temp_us_df.rename(columns={'Security': 'Name'}), US_INDUSTRY_COLUMN)[US_STOCK_COLUMNS + [US_INDUSTRY_COLUMN]]
+
+
+def with_industry(df, column):
+    """
+    確保清單有產業欄位（缺少時為空字串），並將缺值轉為空字串。
+    """
+    df = df.copy()
+    df[column] = df[column].fillna("").astype(str) if column in df.columns else ""
+    return df
+
+
+def _stock_list_error_message(market, e):
+    """
+    將爬取股票清單時的例外轉為 (等級, 訊息)。
+    """
+    import requests
+
+    if market == "TW":
+        if isinstance(e, ValueError):
+            return "warning", f"{e}{TW_SCRAPE_NOTE}"
+        if isinstance(e, requests.exceptions.RequestException):
+            return "error", f"載入台股列表時發生網路錯誤: {e}。請檢查您的網路連線或稍後再試。{TW_SCRAPE_NOTE}"
+        return "error", f"載入台股列表時發生解析錯誤: {e}。這可能是網站結構改變導致。{TW_SCRAPE_NOTE}"
+    if isinstance(e, ValueError):
+        return "warning", str(e)
+    if isinstance(e, requests.exceptions.RequestException):
+        return "error", f"載入美股列表時發生網路錯誤: {e}。請檢查您的網路連線或稍後再試。"
+    if isinstance(e, ImportError):
+        return "error", "載入美股列表失敗：缺少必要的 'lxml' 函式庫。請在您的 Streamlit 環境中執行以下指令安裝：`pip install lxml` 或 `conda install lxml`。"
+    return "error", f"載入美股列表時發生解析錯誤: {e}。這可能是維基百科表格結構改變。"
+
+
+class StockUniverseStore:
+    """
+    台股/美股清單的本機快照：啟動時直接以 memory map 讀取快照，過期時於背景重新爬取並原子性替換。
+    """
+
+    def __init__(self, path=UNIVERSE_SNAPSHOT_PATH, max_age=UNIVERSE_MAX_AGE):
+        import pandas as pd
+
+        self.path = path
+        self.max_age = max_age
+        self.taiwan_df = pd.DataFrame(columns=TW_STOCK_COLUMNS + [TW_INDUSTRY_COLUMN])
+        self.us_df = pd.DataFrame(columns=US_STOCK_COLUMNS + [US_INDUSTRY_COLUMN])
+        self.updated_at = None
+        self.source = None
+        self.messages = []
+        self._loaded = False
+        # _lock 只保護清單、索引等狀態的讀取與替換；_refresh_lock 使爬取與快照寫入依序進行，爬取期間不持有 _lock
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self.index = SymbolIndex(self.taiwan_df, self.us_df)
+
+    @property
+    def refreshing(self):
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def is_stale(self):
+        return self.updated_at is None or (datetime.now() - self.updated_at).total_seconds() > self.max_age
+
+    def load(self):
+        """
+        回傳 (taiwan_df, us_df)。首次呼叫時讀取快照；沒有快照則同步爬取一次，快照過期則於背景更新。
+        已有清單時直接回傳目前的版本，不等待背景更新。
+        """
+        with self._lock:
+            first = not self._loaded
+            if first:
+                self._loaded = True
+                if os.path.exists(self.path):
+                    try:
+                        self._read_snapshot()
+                    except Exception as e:
+                        self.messages = [("error", f"讀取股票清單快照時發生錯誤: {e}")]
+        if self.updated_at is None:
+            if first:
+                self.refresh()
+            else:
+                # 還沒有任何清單時等待進行中的首次爬取
+                with self._refresh_lock:
+                    pass
+        elif self.is_stale():
+            self.refresh_async()
+        with self._lock:
+            return self.taiwan_df, self.us_df
+
+    def _read_snapshot(self):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(self.path, memory_map=True)
+        metadata = table.schema.metadata or {}
+        df = table.to_pandas()
+        # 舊版快照沒有產業欄位
+        industry = df["industry"] if "industry" in df.columns else pd.Series("", index=df.index)
+        tw = df["market"] == "TW"
+        us = df["market"] == "US"
+        self.taiwan_df = pd.DataFrame({
+            "股票代號": df["code"][tw].to_numpy(), "公司名稱": df["name"][tw].to_numpy(), TW_INDUSTRY_COLUMN: industry[tw].to_numpy(),
+        })
+        self.us_df = pd.DataFrame({
+            "Symbol": df["code"][us].to_numpy(), "Name": df["name"][us].to_numpy(), US_INDUSTRY_COLUMN: industry[us].to_numpy(),
+        })
+        self.index = SymbolIndex(self.taiwan_df, self.us_df)
+        self.updated_at = datetime.fromisoformat(metadata[b"updated_at"].decode())
+        self.source = metadata.get(b"source", b"snapshot").decode()
+
+    def _write_snapshot(self, taiwan_df, us_df, updated_at, source):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        taiwan_df, us_df = with_industry(taiwan_df, TW_INDUSTRY_COLUMN), with_industry(us_df, US_INDUSTRY_COLUMN)
+        df = pd.concat([
+            pd.DataFrame({
+                "market": "TW", "code": taiwan_df["股票代號"].astype(str), "name": taiwan_df["公司名稱"].astype(str),
+                "industry": taiwan_df[TW_INDUSTRY_COLUMN],
+            }),
+            pd.DataFrame({
+                "market": "US", "code": us_df["Symbol"].astype(str), "name": us_df["Name"].astype(str),
+                "industry": us_df[US_INDUSTRY_COLUMN],
+            }),
+        ], ignore_index=True)
+        table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata({
+            "updated_at": updated_at.isoformat(), "source": source,
+        })
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        # 以 os.replace 原子性替換，讀取端不會看到寫到一半的檔案
+        os.replace(tmp_path, self.path)
+
+    def _swap(self, taiwan_df, us_df, source, messages):
+        # 呼叫端持有 _refresh_lock：快照寫入與索引建立不持有 _lock，只在最後替換時短暫取得
+        updated_at = datetime.now()
+        try:
+            self._write_snapshot(taiwan_df, us_df, updated_at, source)
+        except Exception as e:
+            messages = messages + [("warning", f"股票清單快照寫入失敗: {e}")]
+        # 先建好搜尋索引再一併替換，搜尋端不會看到清單與索引不一致
+        taiwan_df, us_df = with_industry(taiwan_df, TW_INDUSTRY_COLUMN), with_industry(us_df, US_INDUSTRY_COLUMN)
+        index = SymbolIndex(taiwan_df, us_df)
+        with self._lock:
+            self.taiwan_df, self.us_df, self.index = taiwan_df, us_df, index
+            self.updated_at, self.source, self.messages = updated_at, source, messages
+
+    def _scrape(self):
+        """
+        同時下載台股與美股列表（不持有 _lock），回傳 (台股, 美股, 訊息, 是否成功)；某一市場失敗時保留原本的資料。
+        """
+        executor = get_fetch_executor()
+        futures = {
+            "TW": instrumentation.submit(executor, scrape_taiwan_stock_list),
+            "US": instrumentation.submit(executor, scrape_us_stock_list),
+        }
+        frames = {"TW": self.taiwan_df, "US": self.us_df}
+        messages = []
+        succeeded = False
+        for market, future in futures.items():
+            try:
+                frames[market] = future.result()
+                succeeded = True
+            except Exception as e:
+                messages.append(_stock_list_error_message(market, e))
+        return frames["TW"], frames["US"], messages, succeeded
+
+    def refresh(self):
+        """
+        立即重新爬取股票清單（同步），成功時更新快照。爬取期間 load() 仍回傳目前的清單。
+        """
+        with self._refresh_lock:
+            taiwan_df, us_df, messages, succeeded = self._scrape()
+            if succeeded:
+                self._swap(taiwan_df, us_df, "network", messages)
+            else:
+                with self._lock:
+                    self.messages = messages
+            return succeeded
+
+    def refresh_async(self):
+        """
+        於背景執行緒更新股票清單；已有更新在進行時不重複啟動。
+        """
+        with self._lock:
+            if self.refreshing:
+                return
+            self._refresh_thread = threading.Thread(target=self.refresh, name="stock_universe_refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def seed_from_file(self, file, filename):
+        """
+        以本機檔案（CSV/Excel/Parquet）建立快照，供無網路環境使用。
+        檔案可為快照格式（market, code, name），或台股（股票代號, 公司名稱）、美股（Symbol, Name/Security）清單；
+        產業欄位（industry、產業類別、GICS Sector）可省略。
+        """
+        import pandas as pd
+
+        lower = filename.lower()
+        if lower.endswith(".parquet"):
+            df = pd.read_parquet(file)
+        elif lower.endswith(".csv"):
+            df = pd.read_csv(file, dtype=str)
+        else:
+            df = pd.read_excel(file, dtype=str)
+        df = df.rename(columns={"Security": "Name"})
+        with self._refresh_lock:
+            taiwan_df, us_df = self.taiwan_df, self.us_df
+            if {"market", "code", "name"} <= set(df.columns):
+                market = df["market"].astype(str).str.upper()
+                df = with_industry(df, "industry")
+                columns = ["code", "name", "industry"]
+                taiwan_df = df.loc[market == "TW", columns].set_axis(TW_STOCK_COLUMNS + [TW_INDUSTRY_COLUMN], axis=1)
+                us_df = df.loc[market == "US", columns].set_axis(US_STOCK_COLUMNS + [US_INDUSTRY_COLUMN], axis=1)
+            elif set(TW_STOCK_COLUMNS) <= set(df.columns):
+                taiwan_df = with_industry(df, TW_INDUSTRY_COLUMN)[TW_STOCK_COLUMNS + [TW_INDUSTRY_COLUMN]]
+            elif set(US_STOCK_COLUMNS) <= set(df.columns):
+                us_df = with_industry(df, US_INDUSTRY_COLUMN)[US_STOCK_COLUMNS + [US_INDUSTRY_COLUMN]]
+            else:
+                raise ValueError("檔案缺少必要欄位：需為 (market, code, name)、(股票代號, 公司名稱) 或 (Symbol, Name)。")
+            with self._lock:
+                self._loaded = True
+            self._swap(taiwan_df.reset_index(drop=True), us_df.reset_index(drop=True), f"file:{filename}", [])
+
+
+@functools.lru_cache(maxsize=None)
+def get_stock_universe_store():
+    """
+    取得整個程序共用的股票清單快照。
+    """
+    return StockUniverseStore()
@@ -0,0 +1,62 @@
+"""
+經典估值指標：本益比/股價營收比區間、PEG、葛拉漢數字與股利回推價值。
+所有函式皆可傳入純量或陣列（例如一次計算整份股票清單）。
+"""
+import numpy as np
+
+# 合理倍數區間：以目前倍數的 0.8、1.0、1.2 倍估算
+MULTIPLE_BAND_FACTORS = (0.8, 1.0, 1.2)
+# PEG 估值的目標 PEG 區間
+TARGET_PEG_RANGE = (0.8, 1.0, 1.2)
+
+
+def price_gap_pct(fair_price, price):
+    """
+    合理價與目前價格的價差（%）。
+    """
+    price = np.asarray(price, dtype=float)
+    return (np.asarray(fair_price, dtype=float) - price) / price * 100
+
+
+def multiple_band(multiple, per_share, price, factors=MULTIPLE_BAND_FACTORS):
+    """
+    倍數法合理價區間（如 PE × EPS、P/S × 每股營收），回傳 (倍數區間, 估算價格, 價差%)。
+    傳入陣列時，各回傳值的最後一維為區間。
+    """
+    multiples = np.multiply.outer(np.asarray(multiple, dtype=float), np.asarray(factors, dtype=float))
+    fair_price = np.expand_dims(np.asarray(per_share, dtype=float), -1) * multiples
+    return multiples, fair_price, price_gap_pct(fair_price, np.expand_dims(np.asarray(price, dtype=float), -1))
+
+
+def peg_band(peg, price, targets=TARGET_PEG_RANGE):
+    """
+    PEG 法合理價區間：合理價格 = (目標PEG / 目前PEG) × 目前價格；PEG 非正值時為 NaN。
+    回傳 (目標PEG, 估算價格, 價差%)。
+    """
+    peg = np.asarray(peg, dtype=float)
+    price = np.expand_dims(np.asarray(price, dtype=float), -1)
+    targets = np.asarray(targets, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(np.expand_dims(peg, -1) > 0, targets / np.expand_dims(peg, -1), np.nan)
+    fair_price = ratio * price
+    return np.broadcast_to(targets, fair_price.shape), fair_price, price_gap_pct(fair_price, price)
+
+
+def graham_number(eps, bvps):
+    """
+    葛拉漢數字 sqrt(22.5 × EPS × 每股淨值)；EPS 或每股淨值非正值時為 NaN。
+    """
+    eps = np.asarray(eps, dtype=float)
+    bvps = np.asarray(bvps, dtype=float)
+    valid = (eps > 0) & (bvps > 0)
+    return np.sqrt(np.where(valid, 22.5 * eps * bvps, np.nan))
+
+
+def dividend_yield_value(dividend_rate, avg_yield_pct):
+    """
+    以平均殖利率（%）回推的價值：每股股利 / (殖利率 / 100)；殖利率非正值時為 NaN。
+    """
+    dividend_rate = np.asarray(dividend_rate, dtype=float)
+    avg_yield_pct = np.asarray(avg_yield_pct, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg_yield_pct > 0, dividend_rate / (avg_yield_pct / 100), np.nan)
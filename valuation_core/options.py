@@ -0,0 +1,199 @@
+"""
+實質選擇權評價（向量化）：Black-Scholes 封閉解、CRR 二元樹（美式擴張/放棄選擇權）與最小平方蒙地卡羅（LSM）。
+"""
+import numpy as np
+
+# 所有函式皆可傳入純量或陣列（一次評價多個選擇權）；利率、波動率與價值流失率皆以「年化 %」表示，與專業版欄位一致。
+# kind 為正數時為買權（擴張、延遲投資），負數時為賣權（放棄、出售）。
+
+BINOMIAL_STEPS = 200
+LSM_PATHS = 10_000
+LSM_STEPS = 50
+# 期數與路徑數上限，避免單一輸入耗盡時間或記憶體
+MAX_BINOMIAL_STEPS = 5_000
+MAX_LSM_PATHS = 200_000
+MAX_LSM_STEPS = 1_000
+# 二元樹每批同時倒推的「選擇權數 × 節點數」上限
+BINOMIAL_CHUNK_ELEMENTS = 65_536
+# LSM 每批同時模擬的「選擇權數 × 路徑數」上限
+LSM_CHUNK_ELEMENTS = 2_000_000
+
+
+def _option_inputs(*args):
+    """
+    將輸入廣播為相同形狀並攤平為一維陣列，回傳 (陣列清單, 原始形狀)。
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in args))
+    return [x.reshape(-1) for x in arrays], arrays[0].shape
+
+
+def _option_output(x, shape):
+    x = x.reshape(shape)
+    return float(x) if x.ndim == 0 else x
+
+
+def _valid(value, strike, years, volatility, *rest):
+    valid = (value > 0) & (strike > 0) & (years > 0) & (volatility > 0)
+    for x in rest:
+        valid &= np.isfinite(x)
+    return valid
+
+
+def _by_group(compute, keys, valid, n):
+    """
+    依整數參數（如期數、路徑數）分組計算：compute(索引, 參數值...) 回傳該組的結果。
+    """
+    out = np.full(n, np.nan)
+    idx = np.flatnonzero(valid)
+    if not len(idx):
+        return out
+    groups, inverse = np.unique(np.stack([k[idx] for k in keys], axis=1), axis=0, return_inverse=True)
+    for g, params in enumerate(groups):
+        members = idx[inverse.reshape(-1) == g]
+        out[members] = compute(members, *(int(p) for p in params))
+    return out
+
+
+def black_scholes(value, strike, years, rate, volatility, dividend_yield=0.0, kind=1):
+    """
+    Black-Scholes-Merton 歐式選擇權價值：value 為標的資產現值（如專案現金流現值），strike 為履約價（投資成本或殘值），
+    dividend_yield 為標的價值的年流失率（如延遲投資而錯失的現金流）。輸入無效者為 NaN。
+    """
+    from scipy.special import ndtr
+
+    (s, k, t, r, sigma, q, kind), shape = _option_inputs(value, strike, years, rate, volatility, dividend_yield, kind)
+    r, sigma, q = r / 100, sigma / 100, q / 100
+    phi = np.where(kind < 0, -1.0, 1.0)
+    with np.errstate(all="ignore"):
+        vol_t = sigma * np.sqrt(t)
+        d1 = (np.log(s / k) + (r - q + sigma ** 2 / 2) * t) / vol_t
+        d2 = d1 - vol_t
+        price = phi * (s * np.exp(-q * t) * ndtr(phi * d1) - k * np.exp(-r * t) * ndtr(phi * d2))
+    return _option_output(np.where(_valid(s, k, t, sigma, r, q), price, np.nan), shape)
+
+
+def _binomial(s, k, t, r, sigma, q, phi, steps, american):
+    """
+    CRR 二元樹的倒推：各輸入為長度 n 的陣列（同一組期數），每一期以整列陣列運算同時倒推 n 個選擇權。
+    節點依期數排在第一維，每期取前後相鄰的連續記憶體區段相加。
+    """
+    dt = t / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1 / u
+    p = (np.exp((r - q) * dt) - d) / (u - d)
+    disc = np.exp(-r * dt)
+    up, down = disc * p, disc * (1 - p)
+    # 到期時第 j 個節點的標的價值為 s × u^(2j - steps)；以履約價為單位並乘上買賣方向 phi，履約價值即為 nodes - phi
+    nodes = (phi * s / k) * u ** (2 * np.arange(steps + 1) - steps)[:, None]
+    values = np.maximum(nodes - phi, 0.0)
+    upper = np.empty_like(values)
+    for i in range(steps, 0, -1):
+        # values[:i] = up × values[1:i+1] + down × values[:i]
+        np.multiply(values[1:i + 1], up, out=upper[:i])
+        values[:i] *= down
+        values[:i] += upper[:i]
+        if american:
+            np.divide(nodes[1:i + 1], u, out=nodes[:i])
+            np.subtract(nodes[:i], phi, out=upper[:i])
+            np.maximum(values[:i], upper[:i], out=values[:i])
+    price = values[0] * k
+    # 期數過少（風險中立機率不在 0~1 之間）時二元樹無效
+    return np.where((p >= 0) & (p <= 1), price, np.nan)
+
+
+def binomial_option(value, strike, years, rate, volatility, dividend_yield=0.0, kind=1, steps=BINOMIAL_STEPS, american=True):
+    """
+    CRR 二元樹選擇權價值，預設為可提前履約的美式選擇權（擴張選擇權為美式買權、放棄選擇權為美式賣權）。
+    期數不同的輸入分組計算，同組的所有選擇權以陣列一次倒推。輸入無效者為 NaN。
+    """
+    (s, k, t, r, sigma, q, kind, steps), shape = _option_inputs(value, strike, years, rate, volatility, dividend_yield, kind, steps)
+    r, sigma, q = r / 100, sigma / 100, q / 100
+    phi = np.where(kind < 0, -1.0, 1.0)
+    steps = np.nan_to_num(np.trunc(steps), nan=0)
+    valid = _valid(s, k, t, sigma, r, q) & (steps >= 1) & (steps <= MAX_BINOMIAL_STEPS)
+    # 無價值流失、利率非負的買權提前履約不會較有利，美式與歐式價值相同，倒推時可略過履約比較
+    early = np.full(len(s), bool(american)) & ~((phi > 0) & (q <= 0) & (r >= 0))
+
+    def compute(idx, n_steps, early_exercise):
+        # 分批倒推，每批的節點陣列約可放入 CPU 快取
+        chunk = max(1, BINOMIAL_CHUNK_ELEMENTS // (n_steps + 1))
+        out = np.empty(len(idx))
+        for start in range(0, len(idx), chunk):
+            part = idx[start:start + chunk]
+            with np.errstate(all="ignore"):
+                out[start:start + chunk] = _binomial(
+                    s[part], k[part], t[part], r[part], sigma[part], q[part], phi[part], n_steps, early_exercise
+                )
+        return out
+
+    return _option_output(_by_group(compute, [steps, early], valid, len(s)), shape)
+
+
+def _lsm(s, k, t, r, sigma, q, phi, paths, steps, seed):
+    """
+    Longstaff-Schwartz 最小平方蒙地卡羅：所有選擇權共用同一組標準常態亂數（對偶變數），
+    每一期以 1、x、x² 為基底（x = 標的價值 / 履約價）對價內路徑的後續現金流做迴歸，估計繼續持有的價值。
+    """
+    rng = np.random.default_rng(seed)
+    half = rng.standard_normal((steps, (paths + 1) // 2))
+    brownian = np.cumsum(np.concatenate([half, -half], axis=1)[:, :paths], axis=0)
+
+    dt = t / steps
+    drift = ((r - q - sigma ** 2 / 2) * dt)[:, None]
+    vol = (sigma * np.sqrt(dt))[:, None]
+    disc = np.exp(-r * dt)[:, None]
+    s, k, phi = s[:, None], k[:, None], phi[:, None]
+
+    def payoff_at(step):
+        x = np.exp(drift * (step + 1) + vol * brownian[step]) * (s / k)
+        return x, np.maximum(phi * (x - 1), 0.0)
+
+    # 以履約價為單位計算，迴歸的數值範圍一致；最後再乘回履約價
+    cash = payoff_at(steps - 1)[1]
+    basis = np.empty((len(s), 3, paths))
+    a = np.empty((len(s), 3, 3))
+    for step in range(steps - 2, -1, -1):
+        cash *= disc
+        x, exercise = payoff_at(step)
+        in_money = exercise > 0
+        # 價外路徑的基底設為 0，正規方程式 (BᵀB)β = Bᵀy 只計入價內路徑；BᵀB 只需 x 的 0~4 次動差
+        basis[:, 0] = in_money
+        np.multiply(basis[:, 0], x, out=basis[:, 1])
+        np.multiply(basis[:, 1], x, out=basis[:, 2])
+        moments = [basis[:, 0].sum(axis=1), basis[:, 1].sum(axis=1), basis[:, 2].sum(axis=1),
+                   np.einsum("np,np->n", basis[:, 1], basis[:, 2]), np.einsum("np,np->n", basis[:, 2], basis[:, 2])]
+        for i in range(3):
+            for j in range(3):
+                a[:, i, j] = moments[i + j]
+        b = np.einsum("nip,np->ni", basis, cash)
+        beta = np.einsum("nij,nj->ni", np.linalg.pinv(a), b)
+        continuation = beta[:, :1] + (beta[:, 1:2] + beta[:, 2:] * x) * x
+        np.copyto(cash, exercise, where=in_money & (exercise > continuation))
+    price = (cash * disc).mean(axis=1)
+    return np.maximum(price, np.maximum(phi[:, 0] * (s[:, 0] / k[:, 0] - 1), 0.0)) * k[:, 0]
+
+
+def lsm_option(value, strike, years, rate, volatility, dividend_yield=0.0, kind=1, paths=LSM_PATHS, steps=LSM_STEPS, seed=0):
+    """
+    最小平方蒙地卡羅（LSM）美式選擇權價值，適用於二元樹難以處理的情況（可延伸為多重履約日或路徑相依的報酬）。
+    固定亂數種子，相同輸入的結果一致；多個選擇權分批以陣列同時模擬。輸入無效者為 NaN。
+    """
+    (s, k, t, r, sigma, q, kind, paths, steps), shape = _option_inputs(
+        value, strike, years, rate, volatility, dividend_yield, kind, paths, steps
+    )
+    r, sigma, q = r / 100, sigma / 100, q / 100
+    phi = np.where(kind < 0, -1.0, 1.0)
+    paths = np.nan_to_num(np.trunc(paths), nan=0)
+    steps = np.nan_to_num(np.trunc(steps), nan=0)
+    valid = _valid(s, k, t, sigma, r, q) & (paths >= 2) & (paths <= MAX_LSM_PATHS) & (steps >= 1) & (steps <= MAX_LSM_STEPS)
+
+    def compute(idx, n_paths, n_steps):
+        chunk = max(1, LSM_CHUNK_ELEMENTS // n_paths)
+        out = np.empty(len(idx))
+        for start in range(0, len(idx), chunk):
+            part = idx[start:start + chunk]
+            with np.errstate(all="ignore"):
+                out[start:start + chunk] = _lsm(s[part], k[part], t[part], r[part], sigma[part], q[part], phi[part], n_paths, n_steps, seed)
+        return out
+
+    return _option_output(_by_group(compute, [paths, steps], valid, len(s)), shape)
@@ -0,0 +1,159 @@
+"""
+同業倍數：抓取同業（自訂代號清單或股票清單中同產業的公司）的估值倍數，以向量化方式彙總為中位數、平均數或截尾平均，
+供專業版的同業 PE/PB/EV/EBITDA/P/S/EV/Sales 評價法直接帶入。
+
+同業的股票資訊以有上限的執行緒池並行抓取並經過限速器，已在基本面快取中的公司不再連網。
+"""
+import concurrent.futures
+import os
+
+import numpy as np
+
+from . import instrumentation, market_data
+from .statements import normalize_ticker
+
+# 專業版欄位與 yfinance info 欄位的對應
+PEER_MULTIPLES = {
+    "pe_ratio": "trailingPE",
+    "pb_ratio": "priceToBook",
+    "ev_ebitda_ratio": "enterpriseToEbitda",
+    "ps_ratio": "priceToSalesTrailing12Months",
+    "ev_sales_ratio": "enterpriseToRevenue",
+}
+PEER_MULTIPLE_LABELS = {
+    "pe_ratio": "本益比", "pb_ratio": "股價淨值比", "ev_ebitda_ratio": "EV/EBITDA", "ps_ratio": "P/S", "ev_sales_ratio": "EV/Sales",
+}
+PEER_AGGREGATES = {"median": "中位數", "mean": "平均數", "trimmed": "截尾平均"}
+# 截尾平均兩端各去除的比例
+PEER_TRIM = 0.1
+# 抓取的並行數、每秒請求數與同業家數上限（可用環境變數調整）
+PEER_WORKERS = int(os.environ.get("EVALUATE_TOOL_PEER_WORKERS", 8))
+PEER_RATE = float(os.environ.get("EVALUATE_TOOL_PEER_RATE", 8))
+MAX_PEERS = int(os.environ.get("EVALUATE_TOOL_MAX_PEERS", 100))
+
+
+def parse_peer_tickers(text):
+    """
+    將以逗號、空白或換行分隔的代號轉為不重複的 ticker 清單（保留輸入順序）；純數字的台股代號加上 .TW。
+    """
+    tickers = []
+    for token in text.replace(",", " ").replace("，", " ").replace("、", " ").split():
+        ticker = normalize_ticker(token)
+        if ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+
+def industry_peers(universe, industry, market=None, exclude=(), limit=MAX_PEERS):
+    """
+    由 universe_tickers 的結果取出同產業的公司（可限定市場），排除 exclude 中的 ticker，最多 limit 家。
+    """
+    mask = (universe["industry"] == industry).to_numpy(copy=True)
+    if market:
+        mask &= (universe["market"] == market).to_numpy()
+    if exclude:
+        mask &= ~universe["ticker"].isin(list(exclude)).to_numpy()
+    return universe[mask].head(limit)
+
+
+def industry_counts(universe):
+    """
+    回傳 [(市場, 產業, 家數)]，依市場與家數排序；沒有產業資料的公司不列入。
+    """
+    known = universe[universe["industry"] != ""]
+    counts = known.groupby(["market", "industry"]).size().reset_index(name="count")
+    counts = counts.sort_values(["market", "count"], ascending=[True, False])
+    return list(counts.itertuples(index=False, name=None))
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if np.isfinite(value) else np.nan
+
+
+def fetch_peer_info(ticker, limiter=None):
+    """
+    取得單一同業的股票資訊：基本面快取中已有時直接使用，否則經限速器向 yfinance 取得並存入快取。
+    """
+    info = market_data.get_data_caches()["fundamentals"].get(ticker)
+    if info is None:
+        if limiter is not None:
+            limiter.acquire()
+        info = market_data.fetch_stock_info(ticker) or {}
+        market_data.cache_stock_info(ticker, info)
+    return info
+
+
+def fetch_peer_multiples(tickers, workers=PEER_WORKERS, rate=PEER_RATE):
+    """
+    並行抓取同業的估值倍數，回傳 (表格, 失敗的 ticker)：表格每列一家公司，欄位為 ticker、name 與 PEER_MULTIPLES 的各欄位
+    （缺值為 NaN），順序同輸入。最多抓取 MAX_PEERS 家。
+    """
+    import pandas as pd
+
+    tickers = list(dict.fromkeys(tickers))[:MAX_PEERS]
+    limiter = market_data.RateLimiter(rate, burst=workers)
+    rows, failed = {}, []
+    if tickers:
+        with instrumentation.timed("peers.fetch"), concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(workers, len(tickers)), thread_name_prefix="peer_fetch"
+        ) as executor:
+            futures = {instrumentation.submit(executor, fetch_peer_info, ticker, limiter): ticker for ticker in tickers}
+            for future in concurrent.futures.as_completed(futures):
+                ticker = futures[future]
+                try:
+                    info = future.result()
+                except Exception:
+                    info = {}
+                if not info:
+                    failed.append(ticker)
+                rows[ticker] = {
+                    "ticker": ticker, "name": str(info.get("shortName") or info.get("longName") or ""),
+                    **{key: _number(info.get(field)) for key, field in PEER_MULTIPLES.items()},
+                }
+    columns = ["ticker", "name", *PEER_MULTIPLES]
+    return pd.DataFrame([rows[t] for t in tickers], columns=columns), [t for t in tickers if t in failed]
+
+
+def aggregate_multiples(values, method="median", trim=PEER_TRIM):
+    """
+    彙總同業倍數：values 的第一維為同業（例如形狀為 (同業數, 倍數數) 的矩陣），回傳各欄的中位數、平均數或截尾平均
+    （兩端各去除 trim 比例）與有效家數。非正數或缺值（如虧損公司的本益比）不列入；沒有有效值的欄為 NaN。
+    """
+    if method not in PEER_AGGREGATES:
+        raise ValueError(f"未知的彙總方式：{method}")
+    values = np.asarray(values, dtype=float)
+    values = np.where(np.isfinite(values) & (values > 0), values, np.nan)
+    if not len(values):
+        return np.full(values.shape[1:], np.nan), np.zeros(values.shape[1:], dtype=int)
+    # 各欄排序後（NaN 排在最後），前 count 列即為該欄的有效值
+    ordered = np.sort(values, axis=0)
+    count = np.sum(~np.isnan(values), axis=0)
+    rank = np.arange(len(ordered)).reshape((-1,) + (1,) * (ordered.ndim - 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "median":
+            low = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[None], axis=0)[0]
+            high = np.take_along_axis(ordered, np.maximum(count // 2, 0)[None], axis=0)[0]
+            result = (low + high) / 2
+        else:
+            cut = np.floor(count * trim).astype(int) if method == "trimmed" else np.zeros_like(count)
+            kept = (rank >= cut) & (rank < count - cut)
+            result = np.where(kept, ordered, 0.0).sum(axis=0) / (count - 2 * cut)
+    return np.where(count > 0, result, np.nan), count
+
+
+def peer_summary(table):
+    """
+    同業倍數彙總表：列為中位數、平均數、截尾平均與有效家數，欄為 PEER_MULTIPLES 的各欄位。
+    """
+    import pandas as pd
+
+    values = table[list(PEER_MULTIPLES)].to_numpy(dtype=float)
+    rows, count = {}, None
+    for method, label in PEER_AGGREGATES.items():
+        rows[label], count = aggregate_multiples(values, method)
+    rows["有效家數"] = count
+    return pd.DataFrame(rows, index=list(PEER_MULTIPLES)).T
@@ -0,0 +1,162 @@
+"""
+搜尋結果的預先抓取：使用者還在選擇股票時，於背景為排在最前面的幾個候選先取得股票資訊（台股另含股利歷史），
+選定後通常可直接由快取顯示。
+
+預先抓取使用獨立且有上限的執行緒池，不佔用前景請求的執行緒；整個程序同時進行中的預先抓取數有上限，
+關鍵字改變時取消該 session 尚未開始、且沒有其他 session 或前景併入的預先抓取。
+前景需要的資料若已在預先抓取中，直接等待同一個請求，不重複連網。
+"""
+import concurrent.futures
+import functools
+import os
+import threading
+
+from . import instrumentation, market_data
+
+# 每次搜尋預先抓取的候選數、執行緒數與整個程序同時進行中的預先抓取上限（可用環境變數調整）
+PREFETCH_TOP = int(os.environ.get("EVALUATE_TOOL_PREFETCH_TOP", 3))
+PREFETCH_WORKERS = int(os.environ.get("EVALUATE_TOOL_PREFETCH_WORKERS", 4))
+PREFETCH_MAX_OUTSTANDING = int(os.environ.get("EVALUATE_TOOL_PREFETCH_MAX_OUTSTANDING", 12))
+
+
+class Prefetcher:
+    """
+    程序共用的預先抓取器：相同的工作（key）同時只執行一次，進行中（含排隊）的工作數不超過 max_outstanding，超過時略過新的工作。
+    每個 Future 記錄被送出或併入的次數，只有一方持有時才能取消，避免取消其他 session 或前景正在等待的工作。
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, max_outstanding=PREFETCH_MAX_OUTSTANDING):
+        self.max_outstanding = max_outstanding
+        self.submitted = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluate_tool_prefetch")
+        self._inflight = {}
+        self._joins = {}
+        # 取消 Future 時會在同一執行緒呼叫 _done，因此使用可重入鎖
+        self._lock = threading.RLock()
+
+    def submit(self, key, func, *args):
+        """
+        送出工作並回傳 Future；同一 key 已在進行中時回傳該 Future，進行中的工作已達上限時回傳 None。
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._joins[future] += 1
+                return future
+            if len(self._inflight) >= self.max_outstanding:
+                self.skipped += 1
+                instrumentation.count("prefetch.skipped")
+                return None
+            future = instrumentation.submit(self._executor, func, *args)
+            self._inflight[key] = future
+            self._joins[future] = 1
+            self.submitted += 1
+        instrumentation.count("prefetch.submitted")
+        future.add_done_callback(functools.partial(self._done, key))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._joins.pop(future, None)
+
+    def pending(self, key):
+        """
+        併入進行中（尚未完成）的同一工作並回傳其 Future，沒有時回傳 None。併入後該工作不會再被取消。
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None or future.cancelled():
+                return None
+            if future in self._joins:
+                self._joins[future] += 1
+            return future
+
+    def cancel(self, futures):
+        """
+        放棄呼叫端持有的工作：沒有其他持有者且尚未開始執行者取消，其餘繼續完成（結果仍存入快取）。回傳取消的數量。
+        """
+        cancelled = 0
+        with self._lock:
+            for future in futures:
+                joins = self._joins.get(future)
+                if joins is None:
+                    continue
+                if joins <= 1 and future.cancel():
+                    cancelled += 1
+                else:
+                    self._joins[future] = max(joins - 1, 0)
+            self.cancelled += cancelled
+        return cancelled
+
+    def stats(self):
+        with self._lock:
+            return {
+                "outstanding": len(self._inflight), "max_outstanding": self.max_outstanding,
+                "submitted": self.submitted, "skipped": self.skipped, "cancelled": self.cancelled,
+            }
+
+
+@functools.lru_cache(maxsize=None)
+def get_prefetcher():
+    """
+    取得整個程序共用的預先抓取器。
+    """
+    return Prefetcher()
+
+
+def candidate_tasks(candidates):
+    """
+    將搜尋候選 [(市場, 代號)] 轉為預先抓取的工作 [(key, 函式, 引數)]；快取中已有資料者略過。
+    """
+    caches = market_data.get_data_caches()
+    tasks = []
+    for market, code in candidates:
+        ticker = f"{code}.TW" if market == "台股" else code
+        if ticker not in caches["fundamentals"]:
+            tasks.append((("info", ticker), market_data.get_stock_info, ticker))
+        if market == "台股" and code not in caches["dividends"]:
+            tasks.append((("dividends", code), market_data.get_dividends_tw_cached, code))
+    return tasks
+
+
+class SearchPrefetch:
+    """
+    單一 session 的預先抓取狀態：記錄目前的關鍵字與已送出的工作，關鍵字改變時取消先前尚未開始的工作。
+    """
+
+    def __init__(self, prefetcher=None):
+        # 預設於使用時才取得程序共用的預先抓取器，session 中不保存執行緒池的參照
+        self._prefetcher = prefetcher
+        self.keyword = None
+        # 此 session 持有的工作 {key: Future}
+        self._futures = {}
+
+    @property
+    def prefetcher(self):
+        return self._prefetcher or get_prefetcher()
+
+    def update(self, keyword, candidates, top=PREFETCH_TOP):
+        """
+        依搜尋結果預先抓取前 top 個候選 [(市場, 代號)]；回傳新送出（或併入進行中）的工作數。
+        """
+        if keyword != self.keyword:
+            self.cancel()
+            self.keyword = keyword
+        self._futures = {key: f for key, f in self._futures.items() if not f.done()}
+        submitted = 0
+        for key, func, arg in candidate_tasks(candidates[:top]):
+            # 已持有的工作不再重複送出，每個 session 對同一工作只計一次持有
+            future = self._futures.get(key) or self.prefetcher.submit(key, func, arg)
+            if future is not None:
+                self._futures[key] = future
+                submitted += 1
+        return submitted
+
+    def cancel(self):
+        cancelled = self.prefetcher.cancel(list(self._futures.values()))
+        self._futures = {}
+        return cancelled
@@ -0,0 +1,219 @@
+"""
+歷史股價與估值河流圖：日線依股票存於本機 Parquet 檔（每年一個 row group），之後只向 yfinance 取得最後一筆之後的日線並附加；
+讀取時只載入圖表所需的日期區間。河流圖的各條倍數帶以向量化方式一次算出整段歷史。
+"""
+import collections
+import functools
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from . import instrumentation, market_data
+from .metrics import MULTIPLE_BAND_FACTORS
+
+PRICE_HISTORY_DIR = os.path.join(market_data.DATA_DIR, "prices")
+# 已有最近交易日的日線時不再連網；否則距上次檢查超過此秒數才重新取得（盤中或假日不會反覆連網）
+PRICE_HISTORY_RECHECK_AGE = float(os.environ.get("EVALUATE_TOOL_PRICE_HISTORY_RECHECK_AGE", 3600))
+# 約一年的交易日數，作為 row group 大小，依日期篩選時可略過不需要的年份
+ROW_GROUP_SIZE = 250
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def _last_weekday(today=None):
+    day = today or date.today()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+class PriceHistoryStore:
+    """
+    依股票代號存放日線（date32 日期、float32 價格、int64 成交量，zstd 壓縮），並附最後檢查時間。
+    """
+
+    def __init__(self, directory=PRICE_HISTORY_DIR, recheck_age=PRICE_HISTORY_RECHECK_AGE):
+        self.directory = directory
+        self.recheck_age = recheck_age
+        self._locks = collections.defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def path(self, ticker):
+        return os.path.join(self.directory, f"{ticker}.parquet")
+
+    def _schema(self):
+        import pyarrow as pa
+
+        return pa.schema([
+            ("date", pa.date32()), ("open", pa.float32()), ("high", pa.float32()), ("low", pa.float32()),
+            ("close", pa.float32()), ("volume", pa.int64()),
+        ])
+
+    def _metadata(self, ticker):
+        import pyarrow.parquet as pq
+
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        metadata = pq.read_schema(path).metadata or {}
+        return {k.decode(): v.decode() for k, v in metadata.items() if k in (b"checked_at", b"last_date")}
+
+    def read(self, ticker, start=None, end=None):
+        """
+        讀取本機日線中 [start, end] 區間的資料（僅讀取涵蓋該區間的 row group），沒有資料時回傳 None。
+        """
+        import pyarrow.parquet as pq
+
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        filters = []
+        if start is not None:
+            filters.append(("date", ">=", start))
+        if end is not None:
+            filters.append(("date", "<=", end))
+        table = pq.read_table(path, filters=filters or None)
+        df = table.to_pandas(date_as_object=False)
+        df["date"] = df["date"].astype("datetime64[ns]")
+        return df
+
+    def write(self, ticker, bars, checked_at):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        bars = bars.sort_values("date").drop_duplicates("date", keep="last")
+        bars = bars[PRICE_COLUMNS].assign(date=bars["date"].dt.normalize(), volume=bars["volume"].fillna(0).astype("int64"))
+        table = pa.Table.from_pandas(bars, preserve_index=False).cast(self._schema())
+        last_date = bars["date"].iloc[-1].date().isoformat() if len(bars) else ""
+        table = table.replace_schema_metadata({"checked_at": repr(checked_at), "last_date": last_date})
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(ticker)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        os.replace(tmp_path, self.path(ticker))
+
+    def needs_update(self, metadata, now=None):
+        if metadata is None:
+            return True
+        now = time.time() if now is None else now
+        last_date = date.fromisoformat(metadata["last_date"]) if metadata.get("last_date") else None
+        if last_date is not None and last_date >= _last_weekday(date.fromtimestamp(now)):
+            return False
+        return now - float(metadata.get("checked_at", 0)) > self.recheck_age
+
+    def _ticker_lock(self, ticker):
+        with self._locks_lock:
+            return self._locks[ticker]
+
+    def update(self, ticker, force=False):
+        """
+        附加最後一筆之後的新日線（沒有本機資料時取得全部歷史），回傳新增的筆數。連線失敗時保留本機資料並拋出例外。
+        """
+        import pandas as pd
+
+        with self._ticker_lock(ticker):
+            metadata = self._metadata(ticker)
+            if not force and not self.needs_update(metadata):
+                instrumentation.count("prices.store_hits")
+                return 0
+            last_date = date.fromisoformat(metadata["last_date"]) if metadata and metadata.get("last_date") else None
+            start = (last_date + timedelta(days=1)).isoformat() if last_date else None
+            with instrumentation.timed("prices.fetch"):
+                new_bars = market_data.fetch_price_bars(ticker, start=start)
+            if new_bars is not None and last_date is not None:
+                new_bars = new_bars[new_bars["date"] > pd.Timestamp(last_date)]
+            existing = self.read(ticker) if last_date is not None else None
+            n_new = 0 if new_bars is None else len(new_bars)
+            if n_new and existing is not None:
+                bars = pd.concat([existing, new_bars], ignore_index=True)
+            else:
+                bars = new_bars if n_new else existing
+            if bars is None:
+                return 0
+            self.write(ticker, bars, time.time())
+            instrumentation.count("prices.new_bars", n_new)
+            return n_new
+
+    def get(self, ticker, start=None, end=None):
+        """
+        回傳 [start, end] 區間的日線：必要時先附加新日線；連線失敗而本機已有資料時沿用本機資料。
+        """
+        try:
+            self.update(ticker)
+        except Exception:
+            if not os.path.exists(self.path(ticker)):
+                raise
+        return self.read(ticker, start, end)
+
+
+@functools.lru_cache(maxsize=None)
+def get_price_history_store():
+    """
+    取得整個程序共用的歷史股價存放區。
+    """
+    return PriceHistoryStore()
+
+
+def get_per_share_history(ticker):
+    """
+    取得每股盈餘/每股淨值的歷史（已快取，長 TTL）；台股另以 Goodinfo! 股利歷史中的年度 EPS 補足較早的年份。
+    """
+    import pandas as pd
+
+    cache = market_data.get_data_caches()["statements"]
+    frame = cache.get(ticker)
+    if frame is None:
+        frame = market_data.fetch_per_share_statements(ticker)
+        if ticker.endswith(".TW"):
+            from .dividends import get_dividend_history_store
+
+            history = get_dividend_history_store().get(ticker[:-3])
+            if history is not None and not history.empty:
+                # 股利政策表中的 EPS 為前一年度的盈餘，以股利發放年度的年初起算
+                goodinfo = pd.DataFrame({
+                    "date": pd.to_datetime(history["Year"].astype(str) + "-01-01"), "eps": history["EPS"], "bvps": np.nan,
+                }).dropna(subset=["eps"])
+                if not frame.empty:
+                    goodinfo = goodinfo[goodinfo["date"] < frame["date"].min()]
+                frame = pd.concat([goodinfo, frame], ignore_index=True).sort_values("date", ignore_index=True)
+        cache.set(ticker, frame)
+    return frame
+
+
+def as_of(dates, basis_dates, basis_values):
+    """
+    將不定期的數值（如各期財報的 EPS）對齊到每個日期：取該日期（含）之前最近一筆，之前沒有資料時為 NaN。
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    basis_dates = np.asarray(basis_dates, dtype="datetime64[ns]")
+    basis_values = np.asarray(basis_values, dtype=float)
+    valid = ~np.isnan(basis_values)
+    basis_dates, basis_values = basis_dates[valid], basis_values[valid]
+    order = np.argsort(basis_dates, kind="stable")
+    basis_dates, basis_values = basis_dates[order], basis_values[order]
+    idx = np.searchsorted(basis_dates, dates, side="right") - 1
+    return np.where(idx >= 0, basis_values[np.clip(idx, 0, None)] if len(basis_values) else np.nan, np.nan)
+
+
+def valuation_bands(dates, basis_dates, basis_values, multiple, factors=MULTIPLE_BAND_FACTORS):
+    """
+    河流圖倍數帶：每個日期的每股數值（as_of 對齊）× 倍數 × 各係數，回傳 (倍數, 形狀為 (日期數, 係數數) 的價格帶)。
+    每股數值非正值時（例如虧損期間的 EPS）為 NaN。
+    """
+    multiples = np.asarray(multiple, dtype=float) * np.asarray(factors, dtype=float)
+    per_share = as_of(dates, basis_dates, basis_values)
+    per_share = np.where(per_share > 0, per_share, np.nan)
+    return multiples, np.multiply.outer(per_share, multiples)
+
+
+def historical_multiples(close, per_share, percentiles=(10, 50, 90)):
+    """
+    以整段歷史的倍數（股價 / 每股數值）計算百分位數，可作為河流圖的倍數帶；沒有有效倍數時回傳 NaN。
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.asarray(close, dtype=float) / np.where(np.asarray(per_share, dtype=float) > 0, per_share, np.nan)
+    ratios = ratios[np.isfinite(ratios)]
+    if not len(ratios):
+        return np.full(len(percentiles), np.nan)
+    return np.percentile(ratios, percentiles)
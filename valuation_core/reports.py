@@ -0,0 +1,137 @@
+"""
+報表匯出：Excel（xlsxwriter constant_memory 模式逐列寫出）、CSV 與 Parquet。
+已產生的檔案依內容雜湊快取，內容未變時重複下載不會重新產生。
+"""
+import hashlib
+import io
+import json
+
+from . import instrumentation
+from .cache import TTLCache
+
+# Excel 單一工作表的列數上限（含標題列）
+MAX_EXCEL_ROWS = 1_048_576
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# 只快取不超過此大小的檔案，大型批次結果每次下載時重新產生，避免常駐記憶體
+MAX_CACHED_BYTES = 32 * 1024 * 1024
+
+_report_cache = TTLCache(3600, maxsize=16, name="reports")
+
+
+def _cached(key, build):
+    value = _report_cache.get(key)
+    if value is None:
+        value = build()
+        if len(value) <= MAX_CACHED_BYTES:
+            _report_cache.set(key, value)
+    return value
+
+
+def frames_digest(frames):
+    """
+    計算多個 DataFrame（{名稱: DataFrame}）內容的雜湊值，作為報表快取的鍵。
+    """
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    for name, df in frames.items():
+        digest.update(json.dumps([name, [str(c) for c in df.columns]], ensure_ascii=False).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ExcelStreamWriter:
+    """
+    以 xlsxwriter 的 constant_memory 模式逐列寫出工作表，記憶體用量不隨列數增加；
+    可對同一工作表多次 append（例如批次評價的各個分塊）。超過 Excel 列數上限時拋出 ValueError。
+    """
+
+    ROWS_PER_SLICE = 10_000
+
+    def __init__(self, target):
+        import xlsxwriter
+
+        self.workbook = xlsxwriter.Workbook(target, {"constant_memory": True})
+        self._header_format = self.workbook.add_format({"bold": True})
+        self._sheets = {}
+
+    def append(self, sheet_name, df):
+        if sheet_name not in self._sheets:
+            worksheet = self.workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(c) for c in df.columns], self._header_format)
+            self._sheets[sheet_name] = [worksheet, 1]
+        worksheet, row = self._sheets[sheet_name]
+        if row + len(df) > MAX_EXCEL_ROWS:
+            raise ValueError(f"資料超過 Excel 單一工作表上限 {MAX_EXCEL_ROWS - 1:,} 筆，請改用 CSV 或 Parquet 匯出。")
+        # 每次只將一小段轉為 Python 物件；缺值寫成空白儲存格
+        for start in range(0, len(df), self.ROWS_PER_SLICE):
+            part = df.iloc[start:start + self.ROWS_PER_SLICE]
+            for record in part.astype(object).where(part.notna(), None).itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, record)
+                row += 1
+        self._sheets[sheet_name][1] = row
+
+    def close(self):
+        self.workbook.close()
+
+
+def normalize_for_arrow(df):
+    """
+    將文字與數值混合的欄位（如到期殖利率的說明文字）轉為字串，使其可寫成 Parquet。
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda x: None if x is None or x != x else str(x))
+    return df
+
+
+def to_excel_bytes(sheets):
+    """
+    將 {工作表名稱: DataFrame} 寫成 Excel 檔內容。
+    """
+    output = io.BytesIO()
+    writer = ExcelStreamWriter(output)
+    try:
+        for name, df in sheets.items():
+            writer.append(name, df)
+    finally:
+        writer.close()
+    return output.getvalue()
+
+
+def export_bytes(df, fmt):
+    """
+    將結果表轉為指定格式（csv/xlsx/parquet）的檔案內容。
+    """
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8-sig")
+    if fmt == "xlsx":
+        return to_excel_bytes({"結果": df})
+    if fmt == "parquet":
+        output = io.BytesIO()
+        normalize_for_arrow(df).to_parquet(output, index=False)
+        return output.getvalue()
+    raise ValueError(f"不支援的匯出格式：{fmt}")
+
+
+def excel_report(sheets):
+    """
+    產生 Excel 報告（已快取）：內容相同時直接回傳先前產生的檔案。
+    """
+    def build():
+        with instrumentation.timed("excel_build"):
+            return to_excel_bytes(sheets)
+    return _cached(("xlsx", frames_digest(sheets)), build)
+
+
+def cached_export(df, fmt):
+    """
+    匯出結果表（已快取）：內容與格式相同時直接回傳先前產生的檔案。
+    """
+    return _cached((fmt, frames_digest({"結果": df})), lambda: export_bytes(df, fmt))
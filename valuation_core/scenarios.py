@@ -0,0 +1,159 @@
+"""
+情境管理：具名的輸入情境（如基本/樂觀/悲觀）以依欄位順序排列的 float64 陣列保存，
+多個情境的所有評價方法以批次公式引擎一次算出；計算結果依公式與輸入的雜湊值快取，切換情境時不重新計算。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from . import instrumentation
+from .cache import TTLCache
+from .formulas import safe_float
+
+SCENARIO_CACHE_TTL = float(os.environ.get("EVALUATE_TOOL_SCENARIO_CACHE_TTL", 3600))
+SCENARIO_CACHE_SIZE = int(os.environ.get("EVALUATE_TOOL_SCENARIO_CACHE_SIZE", 1024))
+
+_results_cache = TTLCache(SCENARIO_CACHE_TTL, maxsize=SCENARIO_CACHE_SIZE, name="scenarios")
+
+
+def inputs_to_array(keys, inputs):
+    """
+    將輸入（文字或數值，可含千分位逗號）依欄位順序轉為 float64 陣列，空白或無法轉換者為 NaN。
+    """
+    values = np.full(len(keys), np.nan)
+    for i, key in enumerate(keys):
+        value = safe_float(inputs.get(key, ""))
+        if value is not None:
+            values[i] = value
+    return values
+
+
+def array_to_values(keys, values):
+    """
+    將輸入陣列轉回公式引擎使用的 {欄位: 數值}，NaN 轉為 None。
+    """
+    return {key: None if np.isnan(x) else float(x) for key, x in zip(keys, values.tolist())}
+
+
+def format_input(x):
+    """
+    將數值轉為輸入框的文字：NaN 為空字串，整數不顯示小數點。
+    """
+    if np.isnan(x):
+        return ""
+    if float(x).is_integer() and abs(x) < 1e15:
+        return str(int(x))
+    return repr(float(x))
+
+
+def formulas_digest(formulas):
+    return hashlib.sha256(json.dumps(formulas, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _array_digest(values):
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return hashlib.sha256(f"{values.shape}".encode() + values.tobytes()).hexdigest()
+
+
+class ScenarioSet:
+    """
+    具名情境集合：每個情境為一個依 keys（欄位順序）排列的 float64 陣列，缺值為 NaN。
+    """
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self._values = {}
+
+    @property
+    def names(self):
+        return list(self._values)
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._values.values())
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def save(self, name, values):
+        values = np.array(values, dtype=np.float64)
+        if values.shape != (len(self.keys),):
+            raise ValueError(f"情境的欄位數（{values.size}）與欄位設定（{len(self.keys)}）不符")
+        self._values[name] = values
+
+    def delete(self, name):
+        self._values.pop(name, None)
+
+    def get(self, name):
+        return self._values[name]
+
+    def align(self, keys):
+        """
+        欄位設定變更時，依新的欄位順序重新排列所有情境：保留同名欄位的值，新增的欄位為 NaN。
+        """
+        keys = tuple(keys)
+        if keys == self.keys:
+            return
+        old_index = {key: i for i, key in enumerate(self.keys)}
+        source = np.array([old_index.get(key, -1) for key in keys], dtype=np.intp)
+        found = source >= 0
+        for name, values in self._values.items():
+            aligned = np.full(len(keys), np.nan)
+            aligned[found] = values[source[found]]
+            self._values[name] = aligned
+        self.keys = keys
+
+    def matrix(self, names):
+        """
+        回傳形狀為 (情境數, 欄位數) 的輸入矩陣。
+        """
+        if not names:
+            return np.empty((0, len(self.keys)))
+        return np.vstack([self._values[name] for name in names])
+
+
+def evaluate_inputs(engine, keys, values, formulas_key=None):
+    """
+    以輸入陣列計算所有公式，回傳 (結果, 錯誤訊息)。相同公式與輸入的結果直接取自快取（整個程序共用）；
+    未命中時以公式引擎增量計算。formulas_key 為公式集的雜湊值（省略時即時計算）。
+    """
+    key = ("inputs", formulas_key or formulas_digest(engine.formulas), tuple(keys), _array_digest(values))
+    cached = _results_cache.get(key)
+    if cached is None:
+        with instrumentation.timed("scenarios.evaluate"):
+            cached = engine.evaluate(array_to_values(keys, values))
+        _results_cache.set(key, cached)
+    return cached
+
+
+def compare_scenarios(engine, keys, methods, scenarios, names, formulas_key=None):
+    """
+    以批次公式引擎一次計算多個情境的所有評價方法，回傳 (比較表, 錯誤訊息)：
+    比較表的列為評價方法、欄為情境名稱。結果依公式與輸入矩陣的雜湊值快取。
+    """
+    import pandas as pd
+
+    matrix = scenarios.matrix(names)
+    key = ("compare", formulas_key or formulas_digest(engine.formulas), tuple(keys), tuple(names),
+           tuple((m["key"], m["name"]) for m in methods), _array_digest(matrix))
+    cached = _results_cache.get(key)
+    if cached is None:
+        with instrumentation.timed("scenarios.compare"):
+            columns = {key: np.ascontiguousarray(matrix[:, i]) for i, key in enumerate(keys)}
+            results, errors = engine.evaluate_batch(columns, len(names))
+            table = pd.DataFrame(
+                {name: [results.get(m["key"], np.full(len(names), np.nan))[i] for m in methods] for i, name in enumerate(names)},
+                index=[m["name"] for m in methods],
+            )
+        cached = (table, errors)
+        _results_cache.set(key, cached)
+    return cached
+
+
+def scenario_cache_stats():
+    return _results_cache.stats()
@@ -0,0 +1,264 @@
+"""
+批次選股：抓取整份股票清單（台股＋S&P 500）的基本面，並以向量化方式計算本益比區間、葛拉漢數字與股利回推價值。
+
+基本面以有上限的執行緒池並行抓取並經過限速器，結果存成本機快照（Parquet），之後的篩選與排序都在快照上完成，不再連網。
+yfinance 的 info 只能逐檔取得，因此「批次」為分批送出、同時處理中的請求數有上限的並行抓取。
+"""
+import concurrent.futures
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import instrumentation, market_data
+from .metrics import dividend_yield_value, graham_number, multiple_band, price_gap_pct
+from .search import TW_INDUSTRY_COLUMN, US_INDUSTRY_COLUMN
+
+SCREENER_FIELDS = (
+    "currentPrice", "trailingPE", "trailingEps", "bookValue", "priceToBook", "dividendRate",
+    "fiveYearAvgDividendYield", "pegRatio",
+)
+SCREENER_SNAPSHOT_PATH = os.path.join(market_data.DATA_DIR, "screener_fundamentals.parquet")
+# 抓取的並行數與每秒請求數上限（可用環境變數調整）
+SCREENER_WORKERS = int(os.environ.get("EVALUATE_TOOL_SCREENER_WORKERS", 8))
+SCREENER_RATE = float(os.environ.get("EVALUATE_TOOL_SCREENER_RATE", 4))
+# 每完成多少檔即併入快照表，頁面可以看到逐步更新的結果
+MERGE_EVERY = 100
+
+
+def universe_tickers(taiwan_df, us_df, markets=("台股", "美股")):
+    """
+    將股票清單轉為 (market, code, ticker, name, industry) 表；台股代號加上 .TW，清單沒有產業欄位時 industry 為空字串。
+    """
+    import pandas as pd
+
+    frames = []
+    if "台股" in markets and not taiwan_df.empty:
+        taiwan_df = market_data.with_industry(taiwan_df, TW_INDUSTRY_COLUMN)
+        codes = taiwan_df["股票代號"].astype(str)
+        frames.append(pd.DataFrame({
+            "market": "台股", "code": codes, "ticker": codes + ".TW", "name": taiwan_df["公司名稱"].astype(str),
+            "industry": taiwan_df[TW_INDUSTRY_COLUMN],
+        }))
+    if "美股" in markets and not us_df.empty:
+        us_df = market_data.with_industry(us_df, US_INDUSTRY_COLUMN)
+        codes = us_df["Symbol"].astype(str)
+        frames.append(pd.DataFrame({
+            "market": "美股", "code": codes, "ticker": codes, "name": us_df["Name"].astype(str), "industry": us_df[US_INDUSTRY_COLUMN],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["market", "code", "ticker", "name", "industry"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates("ticker", ignore_index=True)
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if np.isfinite(value) else np.nan
+
+
+def fetch_fundamentals(ticker, limiter=None):
+    """
+    取得單檔股票的選股欄位：資料快取中已有基本面時直接使用，否則經限速器向 yfinance 取得。
+    回傳 {欄位: 數值}（缺值為 NaN）。
+    """
+    info = market_data.get_data_caches()["fundamentals"].get(ticker)
+    if info is None:
+        if limiter is not None:
+            limiter.acquire()
+        info = market_data.fetch_stock_info(ticker) or {}
+    return {f: _number(info.get(f)) for f in SCREENER_FIELDS}
+
+
+def add_valuation_columns(df):
+    """
+    以向量化方式加上估值欄位：本益比區間合理價（0.8/1.0/1.2 倍）、葛拉漢數字、五年平均殖利率回推價，及各自與股價的價差%。
+    """
+    df = df.copy()
+    price = df["currentPrice"].to_numpy(dtype=float)
+    _, pe_fair, pe_gap = multiple_band(df["trailingPE"].to_numpy(dtype=float), df["trailingEps"].to_numpy(dtype=float), price)
+    df["PE合理價(低)"] = pe_fair[:, 0]
+    df["PE合理價"] = pe_fair[:, 1]
+    df["PE合理價(高)"] = pe_fair[:, 2]
+    df["PE價差%(低)"] = pe_gap[:, 0]
+    graham = graham_number(df["trailingEps"].to_numpy(dtype=float), df["bookValue"].to_numpy(dtype=float))
+    df["葛拉漢數字"] = graham
+    df["葛拉漢價差%"] = price_gap_pct(graham, price)
+    div_value = dividend_yield_value(df["dividendRate"].to_numpy(dtype=float), df["fiveYearAvgDividendYield"].to_numpy(dtype=float))
+    df["股利回推價"] = div_value
+    df["股利回推價差%"] = price_gap_pct(div_value, price)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["殖利率%"] = np.where(price > 0, df["dividendRate"].to_numpy(dtype=float) / price * 100, np.nan)
+    return df
+
+
+def apply_screen(df, ranges=None, keyword=None, markets=None, sort_by=None, ascending=True):
+    """
+    篩選與排序快照表：ranges 為 {欄位: (下限, 上限)}（None 表示不限），keyword 比對代號或名稱。
+    所有條件合併為一個布林遮罩後一次套用。
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if markets:
+        mask &= df["market"].isin(list(markets)).to_numpy()
+    for column, (low, high) in (ranges or {}).items():
+        values = df[column].to_numpy(dtype=float)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    if keyword:
+        keyword = keyword.strip().lower()
+        mask &= (df["code"].str.lower().str.contains(keyword, regex=False) | df["name"].str.lower().str.contains(keyword, regex=False)).to_numpy()
+    result = df[mask]
+    if sort_by:
+        result = result.sort_values(sort_by, ascending=ascending, na_position="last")
+    return result
+
+
+class ScreenerStore:
+    """
+    選股基本面快照：依 ticker 保存抓取結果與抓取時間，於背景執行緒分批並行更新，並寫回本機 Parquet 檔。
+    """
+
+    def __init__(self, path=SCREENER_SNAPSHOT_PATH, max_age=None, workers=SCREENER_WORKERS, rate=SCREENER_RATE):
+        self.path = path
+        self.max_age = market_data.FUNDAMENTALS_CACHE_TTL if max_age is None else max_age
+        self.workers = workers
+        self.rate = rate
+        self.table = None
+        self.progress = (0, 0)
+        self.errors = 0
+        self.updated_at = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._refresh_thread = None
+
+    @property
+    def refreshing(self):
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def load(self):
+        """
+        回傳快照表（含估值欄位）；首次呼叫時讀取本機快照，沒有快照時回傳空表。
+        """
+        with self._lock:
+            if self.table is None:
+                self.table = self._read_snapshot()
+            return self.table
+
+    def _empty(self):
+        import pandas as pd
+
+        columns = {"market": "str", "code": "str", "ticker": "str", "name": "str", "fetched_at": "float64"}
+        columns.update({f: "float64" for f in SCREENER_FIELDS})
+        return add_valuation_columns(pd.DataFrame({c: pd.Series(dtype=t) for c, t in columns.items()}))
+
+    def _read_snapshot(self):
+        import pandas as pd
+
+        if not os.path.exists(self.path):
+            return self._empty()
+        df = pd.read_parquet(self.path)
+        self.updated_at = float(df["fetched_at"].max()) if len(df) else None
+        return add_valuation_columns(df)
+
+    def _write_snapshot(self, table):
+        columns = ["market", "code", "ticker", "name", "fetched_at", *SCREENER_FIELDS]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        table[columns].to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+    def stale_tickers(self, universe, now=None):
+        """
+        回傳 universe 中尚未抓取或已超過 max_age 的列。
+        """
+        now = time.time() if now is None else now
+        table = self.load()
+        fetched_at = universe["ticker"].map(table.set_index("ticker")["fetched_at"]) if len(table) else None
+        if fetched_at is None:
+            return universe
+        return universe[~(fetched_at.to_numpy(dtype=float) > now - self.max_age)]
+
+    def _merge(self, rows):
+        import pandas as pd
+
+        update = add_valuation_columns(pd.DataFrame(rows))
+        with self._lock:
+            table = self.table if self.table is not None else self._empty()
+            kept = table[~table["ticker"].isin(update["ticker"])]
+            self.table = update if kept.empty else pd.concat([kept, update], ignore_index=True)
+            self.updated_at = time.time()
+            return self.table
+
+    def refresh(self, universe, progress=None):
+        """
+        抓取 universe（universe_tickers 的結果）中所有股票的基本面並更新快照；同步執行，回傳抓取失敗的檔數。
+        同時處理中的請求不超過 2 × workers，可用 cancel() 中止（已完成的部分仍會保存）。
+        """
+        limiter = market_data.RateLimiter(self.rate, burst=self.workers)
+        records = universe.to_dict("records")
+        self._cancel.clear()
+        self.progress, self.errors = (0, len(records)), 0
+        done, batch = 0, []
+
+        def fetch(row):
+            return row, fetch_fundamentals(row["ticker"], limiter)
+
+        with instrumentation.timed("screener.refresh"), concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="screener_fetch"
+        ) as executor:
+            pending = set()
+            rows = iter(records)
+            while True:
+                while not self._cancel.is_set() and len(pending) < 2 * self.workers:
+                    row = next(rows, None)
+                    if row is None:
+                        break
+                    pending.add(instrumentation.submit(executor, fetch, row))
+                if not pending:
+                    break
+                finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    done += 1
+                    try:
+                        row, values = future.result()
+                    except Exception:
+                        self.errors += 1
+                        continue
+                    batch.append({**row, "fetched_at": time.time(), **values})
+                self.progress = (done, len(records))
+                if progress:
+                    progress(done, len(records))
+                if len(batch) >= MERGE_EVERY:
+                    self._merge(batch)
+                    batch = []
+        table = self._merge(batch) if batch else self.load()
+        self._write_snapshot(table)
+        return self.errors
+
+    def refresh_async(self, universe):
+        """
+        於背景執行緒更新快照；已有更新在進行時不重複啟動。
+        """
+        with self._lock:
+            if self.refreshing:
+                return
+            self.progress = (0, len(universe))
+            self._refresh_thread = threading.Thread(target=self.refresh, args=(universe,), name="screener_refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+
+@functools.lru_cache(maxsize=None)
+def get_screener_store():
+    """
+    取得整個程序共用的選股快照。
+    """
+    return ScreenerStore()
@@ -0,0 +1,145 @@
+"""
+台股＋美股的股票搜尋索引。
+"""
+import bisect
+
+import numpy as np
+
+TW_STOCK_COLUMNS = ["股票代號", "公司名稱"]
+US_STOCK_COLUMNS = ["Symbol", "Name"]
+# 產業欄位（公開資訊觀測站的產業類別、維基百科的 GICS 產業）；舊快照或上傳的清單可能沒有此欄
+TW_INDUSTRY_COLUMN = "產業類別"
+US_INDUSTRY_COLUMN = "GICS Sector"
+
+SEARCH_TOP_K = 50
+
+
+class _MarketSymbolIndex:
+    """
+    單一市場的搜尋索引。各列依名稱長度排序，子字串比對時先找到的即為較短（較相關）的名稱。
+    """
+
+    def __init__(self, codes, names):
+        order = sorted(range(len(names)), key=lambda i: (len(names[i]), codes[i]))
+        self.codes = [codes[i] for i in order]
+        self.names = [names[i] for i in order]
+        # 前綴查詢：已排序的 (代號/名稱, 列號)，以二分搜尋定位
+        self._code_keys = sorted((c.upper(), i) for i, c in enumerate(self.codes))
+        self._name_keys = sorted((n.lower(), i) for i, n in enumerate(self.names))
+        # 子字串查詢（含中文）：所有「代號\t名稱」串成一個字串，以 str.find 掃描
+        lines = [f"{c.lower()}\t{n.lower()}" for c, n in zip(self.codes, self.names)]
+        self._corpus = "\n".join(lines)
+        self._offsets = []
+        pos = 0
+        for line in lines:
+            self._offsets.append(pos)
+            pos += len(line) + 1
+        # 模糊比對：英文名稱的三字 n-gram 倒排索引
+        postings, counts = {}, []
+        for i, n in enumerate(self.names):
+            grams = _trigrams(n.lower()) if n.isascii() else set()
+            counts.append(max(len(grams), 1))
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._trigrams = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._trigram_counts = np.array(counts, dtype=np.int32)
+
+    @staticmethod
+    def _prefix_ids(keys, prefix, k):
+        start = bisect.bisect_left(keys, (prefix,))
+        ids = []
+        for key, i in keys[start:start + k]:
+            if not key.startswith(prefix):
+                break
+            ids.append(i)
+        return ids
+
+    def _substring_ids(self, q, k, seen):
+        ids = []
+        pos = self._corpus.find(q)
+        while pos != -1 and len(ids) < k:
+            line = bisect.bisect_right(self._offsets, pos) - 1
+            if line not in seen:
+                ids.append(line)
+            if line + 1 >= len(self._offsets):
+                break
+            pos = self._corpus.find(q, self._offsets[line + 1])
+        return ids
+
+    def _fuzzy_ids(self, q, k):
+        grams = _trigrams(q)
+        hits = [self._trigrams[g] for g in grams if g in self._trigrams]
+        if not hits:
+            return []
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        # 至少需涵蓋查詢字串一半的 n-gram 才視為相符
+        ids = np.flatnonzero(overlap * 2 >= len(grams))
+        # 依涵蓋的 n-gram 數排序，同分時以 Dice 係數（偏好長度相近的名稱）排序
+        dice = 2 * overlap[ids] / (len(grams) + self._trigram_counts[ids])
+        return ids[np.lexsort((-dice, -overlap[ids]))[:k]].tolist()
+
+    def search(self, q, k):
+        """
+        回傳 [(層級, 列號)]，層級：0 代號前綴（完全相符最前）、1 名稱前綴、2 代號/名稱子字串、3 模糊比對。
+        """
+        hits, seen = [], set()
+        for tier, ids in enumerate((self._prefix_ids(self._code_keys, q.upper(), k), self._prefix_ids(self._name_keys, q, k))):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    hits.append((tier, i))
+        if len(hits) < k:
+            for i in self._substring_ids(q, k - len(hits), seen):
+                seen.add(i)
+                hits.append((2, i))
+        if len(hits) < k and len(q) >= 3 and q.isascii():
+            for i in self._fuzzy_ids(q, k):
+                if i not in seen and len(hits) < k:
+                    seen.add(i)
+                    hits.append((3, i))
+        return hits[:k]
+
+
+def _trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """
+    台股＋美股的股票搜尋索引（於載入股票清單時建立一次）：
+    支援代號前綴、名稱（含中文）子字串，以及英文名稱的容錯模糊比對，回傳依相關度排序的前 k 筆。
+    """
+
+    def __init__(self, taiwan_df, us_df):
+        self._markets = {
+            "台股": _MarketSymbolIndex([str(c) for c in taiwan_df["股票代號"]], [str(n) for n in taiwan_df["公司名稱"]]),
+            "美股": _MarketSymbolIndex([str(c) for c in us_df["Symbol"]], [str(n) for n in us_df["Name"]]),
+        }
+
+    def __len__(self):
+        return sum(len(m.codes) for m in self._markets.values())
+
+    def search(self, keyword, market=None, k=SEARCH_TOP_K):
+        """
+        搜尋股票，回傳依相關度排序的 [(市場, 代號, 名稱)]；market 為 None 時同時搜尋台股與美股。
+        """
+        q = keyword.strip().lower().replace("\t", " ").replace("\n", " ")
+        if not q:
+            return []
+        markets = [market] if market else list(self._markets)
+        hits = []
+        for m in markets:
+            index = self._markets[m]
+            hits.extend((tier, rank, m, index.codes[i], index.names[i]) for rank, (tier, i) in enumerate(index.search(q, k)))
+        hits.sort(key=lambda h: (h[0], h[1]))
+        return [(m, code, name) for _, _, m, code, name in hits[:k]]
+
+    def search_frame(self, keyword, market, k=SEARCH_TOP_K):
+        """
+        以 DataFrame 回傳單一市場的搜尋結果，欄位格式同該市場的股票清單。
+        """
+        import pandas as pd
+
+        columns = TW_STOCK_COLUMNS if market == "台股" else US_STOCK_COLUMNS
+        return pd.DataFrame([(code, name) for _, code, name in self.search(keyword, market, k)], columns=columns)
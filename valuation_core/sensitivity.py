@@ -0,0 +1,74 @@
+"""
+DCF/DDM 估值函式（多階段模型見 cashflows），以及以 NumPy 廣播計算的敏感度網格與蒙地卡羅模擬。
+"""
+import numpy as np
+
+from .cashflows import cash_flow_value, staged_value
+
+SIMULATION_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def eps_dcf_value(eps, growth, discount, years, terminal_growth=None, fade_years=0):
+    """
+    簡易版 DCF：EPS 每年以 growth 成長 years 年（可再接 fade_years 年線性遞減至 terminal_growth 的衰退期），
+    逐年以 discount 折現後加總；有 terminal_growth 時另加永續價值（利率皆為小數）。
+    growth 與 discount 可為任意形狀的陣列，以廣播一次計算所有組合。
+    """
+    if terminal_growth is None:
+        return staged_value(eps, discount, np.nan, growth, years, terminal=False)
+    return staged_value(eps, discount, terminal_growth, growth, years, fade_years)
+
+
+def dcf_value(cash_flows, discount, growth, high_growth=np.nan, high_years=0, fade_years=0):
+    """
+    DCF：逐年折現自由現金流（最後一維為年度，長度不限），可再接高成長期與衰退期，加上 Gordon 永續價值（利率皆為小數）。
+    discount 與 growth 可為陣列，以廣播一次計算；折現率不大於成長率者為 NaN。
+    """
+    return cash_flow_value(cash_flows, discount, growth, high_growth, high_years, fade_years)
+
+
+def ddm_value(dividend, discount, growth, shares=1.0, high_growth=np.nan, high_years=0, fade_years=0):
+    """
+    股利折現模型：沒有高成長期時為 Gordon 模型 dividend / (discount - growth) × shares；
+    有高成長期時 dividend 為下一年度股利，依各階段成長後再永續成長。折現率不大於成長率者為 NaN。
+    """
+    dividend = np.asarray(dividend, dtype=float)
+    return cash_flow_value(dividend[..., None], discount, growth, high_growth, high_years, fade_years) * shares
+
+
+def sensitivity_grid(value_func, discount_rates, growth_rates, **kwargs):
+    """
+    以廣播一次計算「折現率 × 成長率」整個網格，回傳形狀為 (折現率數, 成長率數) 的陣列。
+    """
+    discount = np.asarray(discount_rates, dtype=float)[:, None]
+    growth = np.asarray(growth_rates, dtype=float)[None, :]
+    return value_func(discount=discount, growth=growth, **kwargs)
+
+
+def monte_carlo_valuation(value_func, discount_mean, discount_std, growth_mean, growth_std, n_draws=100_000, seed=None, **kwargs):
+    """
+    蒙地卡羅模擬：折現率與成長率各自由常態分配抽樣 n_draws 次，一次向量化計算所有情境的估值。
+    其餘參數（如現金流、股利）可傳入長度為 n_draws 的抽樣陣列；無效情境（折現率不大於成長率）為 NaN。
+    """
+    rng = np.random.default_rng(seed)
+    discount = rng.normal(discount_mean, discount_std, n_draws)
+    growth = rng.normal(growth_mean, growth_std, n_draws)
+    return value_func(discount=discount, growth=growth, **kwargs)
+
+
+def summarize_simulation(values, bins=60):
+    """
+    彙整模擬結果：有效情境比例、平均、標準差、百分位數，以及直方圖 (次數, 區間邊界)。
+    """
+    values = np.asarray(values, dtype=float)
+    valid = values[np.isfinite(values)]
+    summary = {"draws": len(values), "valid_ratio": len(valid) / len(values) if len(values) else 0.0}
+    if not len(valid):
+        return summary, None
+    summary["mean"] = float(valid.mean())
+    summary["std"] = float(valid.std())
+    for p, q in zip(SIMULATION_PERCENTILES, np.percentile(valid, SIMULATION_PERCENTILES)):
+        summary[f"p{p}"] = float(q)
+    # 直方圖略去兩端 0.5% 的極端值，避免永續模型在 r≈g 附近的長尾壓縮圖形
+    lo, hi = np.percentile(valid, [0.5, 99.5])
+    return summary, np.histogram(valid, bins=bins, range=(lo, hi) if hi > lo else None)
@@ -0,0 +1,155 @@
+"""
+專業版的設定與 session 狀態：預設的欄位、公式與評價方法每個程序只建立一次，為唯讀的共用物件；
+各 session 只保存自己修改過的設定（修改時才建立新物件）與依欄位順序排列的 float64 輸入陣列，
+並可估計每個 session 實際佔用的記憶體（不含共用的預設值與已編譯的公式）。
+"""
+import functools
+import operator
+import sys
+import types
+
+import numpy as np
+
+from .defaults import DEFAULT_FIELDS, DEFAULT_FORMULAS, DEFAULT_METHODS
+from .formulas import CompiledFormula, FormulaEngine
+from .scenarios import formulas_digest
+
+
+class ValuationConfig:
+    """
+    唯讀的評價設定：欄位、公式與評價方法，以及建立時即算好的欄位順序、欄位索引與公式雜湊值，重新執行時不再重建。
+    修改設定一律建立新物件（copy-on-write），原物件可安全地由所有 session 共用。
+    """
+
+    __slots__ = ("fields", "formulas", "methods", "field_keys", "field_index", "formulas_key")
+
+    def __init__(self, fields, formulas, methods):
+        freeze = types.MappingProxyType
+        fields = tuple(freeze(dict(f)) for f in fields)
+        formulas = freeze(dict(formulas))
+        field_keys = tuple(f["key"] for f in fields)
+        for name, value in (
+            ("fields", fields), ("formulas", formulas), ("methods", tuple(freeze(dict(m)) for m in methods)),
+            ("field_keys", field_keys), ("field_index", freeze({key: i for i, key in enumerate(field_keys)})),
+            ("formulas_key", formulas_digest(dict(formulas))),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("評價設定為唯讀物件，請以 with_formulas() 等方法建立新設定")
+
+    def __reduce__(self):
+        data = self.to_dict()
+        return ValuationConfig, (data["fields"], data["formulas"], data["methods"])
+
+    def with_formulas(self, formulas):
+        """
+        回傳只替換公式的新設定；欄位與評價方法沿用原物件（不複製）。
+        """
+        config = ValuationConfig.__new__(ValuationConfig)
+        formulas = types.MappingProxyType(dict(formulas))
+        for name in self.__slots__:
+            object.__setattr__(config, name, getattr(self, name))
+        object.__setattr__(config, "formulas", formulas)
+        object.__setattr__(config, "formulas_key", formulas_digest(dict(formulas)))
+        return config
+
+    def to_dict(self):
+        """
+        轉為可輸出成 JSON 設定檔的一般 dict/list。
+        """
+        return {
+            "fields": [dict(f) for f in self.fields],
+            "formulas": dict(self.formulas),
+            "methods": [dict(m) for m in self.methods],
+        }
+
+    def empty_inputs(self):
+        return np.full(len(self.field_keys), np.nan)
+
+
+@functools.lru_cache(maxsize=None)
+def default_config():
+    """
+    取得整個程序共用的預設設定（唯讀）。
+    """
+    return ValuationConfig(DEFAULT_FIELDS, DEFAULT_FORMULAS, DEFAULT_METHODS)
+
+
+# 估計記憶體時視為共用、不計入 session 的物件類型（程式碼與已編譯的公式由整個程序共用）
+_SHARED_TYPES = (
+    types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.ModuleType, type,
+    CompiledFormula, operator.itemgetter, functools.partial,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_object_ids():
+    # 預設公式集的依賴圖與各公式的依賴集合由所有使用預設公式的引擎共用
+    engine = FormulaEngine(default_config().formulas)
+    ids = set()
+    stack = [default_config(), engine._dependents, engine._blocked, engine._order, *engine._deps.values()]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in ids:
+            continue
+        ids.add(id(obj))
+        stack.extend(_references(obj))
+    return frozenset(ids)
+
+
+def _references(obj):
+    if isinstance(obj, (dict, types.MappingProxyType)):
+        return [*obj.keys(), *obj.values()]
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return list(obj)
+    if isinstance(obj, ValuationConfig):
+        return [getattr(obj, name) for name in obj.__slots__]
+    if hasattr(obj, "__dict__") and not isinstance(obj, _SHARED_TYPES):
+        return [vars(obj)]
+    return []
+
+
+def object_size(obj, shared=frozenset(), seen=None):
+    """
+    估計物件及其參照內容佔用的位元組數：NumPy 陣列計入資料大小、DataFrame 以 memory_usage(deep=True) 計算；
+    shared（物件 id 集合）中的物件與程式碼、已編譯的公式等共用物件不計入。seen 可在多次呼叫間共用，避免重複計算。
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or id(obj) in shared or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            # 檢視（view）只計標頭，資料計入其所參照的原陣列
+            total += sys.getsizeof(obj)
+            if obj.base is not None:
+                stack.append(obj.base)
+        elif hasattr(obj, "memory_usage") and hasattr(obj, "index"):
+            total += int(np.sum(obj.memory_usage(deep=True)))
+        elif isinstance(obj, types.MappingProxyType):
+            # 唯讀包裝本身很小，另計其底層 dict 的大小
+            total += sys.getsizeof(obj) + sys.getsizeof(dict(obj))
+            stack.extend(_references(obj))
+        else:
+            total += sys.getsizeof(obj)
+            stack.extend(_references(obj))
+    return total
+
+
+def session_memory_report(state):
+    """
+    估計 session 中每個項目佔用的位元組數（共用的預設設定不計入，多個項目共同參照的物件只計一次），
+    回傳依大小排序的 [{"key", "type", "bytes"}] 以及共用預設設定的大小。
+    """
+    shared = _default_object_ids()
+    seen = set()
+    rows = [
+        {"key": key, "type": type(value).__name__, "bytes": object_size(value, shared, seen)}
+        for key, value in state.items()
+    ]
+    rows.sort(key=lambda row: row["bytes"], reverse=True)
+    return rows, object_size(default_config())
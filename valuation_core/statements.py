@@ -0,0 +1,151 @@
+"""
+由股票代號的財報自動帶入專業版欄位：年度與季度財報每個 ticker 只抓取一次並快取，
+依最近年度或近四季（TTM）對應到欄位（淨利、股東權益、EBITDA、現金、負債、資產、營收與歷年自由現金流等）。
+股價、股數與股利取自已快取的股票資訊。
+"""
+import numpy as np
+
+from . import instrumentation, market_data
+
+STATEMENT_PERIODS = {"annual": "最近年度", "ttm": "近四季（TTM）"}
+
+# 欄位與財報會計科目的對應（依序取第一個存在的科目）：(財報, 科目...)
+STATEMENT_FIELDS = {
+    "net_income": ("income", "Net Income", "Net Income Common Stockholders"),
+    "ebitda": ("income", "EBITDA", "Normalized EBITDA"),
+    "sales_total": ("income", "Total Revenue", "Operating Revenue"),
+    "eps": ("income", "Diluted EPS", "Basic EPS"),
+    "equity": ("balance", "Stockholders Equity", "Common Stock Equity"),
+    "cash": ("balance", "Cash And Cash Equivalents", "Cash Cash Equivalents And Short Term Investments"),
+    "debt": ("balance", "Total Debt"),
+    "assets": ("balance", "Total Assets"),
+    "liabilities": ("balance", "Total Liabilities Net Minority Interest", "Total Liabilities"),
+    "shares": ("balance", "Ordinary Shares Number", "Share Issued"),
+    "capital": ("balance", "Invested Capital"),
+}
+# 由財報與股票資訊帶入的欄位（另含 fcf1、fcf2…）；載入另一家公司時先清空，避免殘留前一家公司的數值
+TICKER_FIELDS = (*STATEMENT_FIELDS, "nopat", "bvps", "stock_price", "dividend_per_share")
+# 損益表與現金流量表為期間數值，近四季（TTM）時以四季合計；資產負債表取最近一季
+_FLOW_STATEMENTS = ("income", "cashflow")
+
+
+def normalize_ticker(text):
+    """
+    將輸入的代號轉為 yfinance ticker：去除空白並轉大寫，純數字的台股代號加上 .TW。
+    """
+    ticker = text.strip().upper()
+    return f"{ticker}.TW" if ticker.isdigit() else ticker
+
+
+def get_financial_statements(ticker):
+    """
+    取得年度與季度財報（已快取，長 TTL）：同一 ticker 在快取期間內只連網一次。
+    """
+    cache = market_data.get_data_caches()["statements"]
+    key = ("financials", ticker)
+    statements = cache.get(key)
+    if statements is None:
+        with instrumentation.timed("statements.fetch"):
+            statements = market_data.fetch_financial_statements(ticker)
+        if any(not frame.empty for frame in statements.values()):
+            cache.set(key, statements)
+    return statements
+
+
+def _item(frame, names):
+    """
+    取出第一個存在的會計科目，回傳依期末日期由舊到新排序的數列（空白為 NaN）。
+    """
+    import pandas as pd
+
+    for name in names:
+        if frame is not None and not frame.empty and name in frame.index:
+            series = pd.to_numeric(frame.loc[name], errors="coerce")
+            series.index = pd.DatetimeIndex(series.index)
+            return series.sort_index()
+    return pd.Series(dtype=float)
+
+
+def _latest(series, ttm):
+    """
+    最近一期的數值；ttm 時為最近四季的合計（不足四季或有缺值時為 NaN）。
+    """
+    if not len(series):
+        return np.nan, None
+    if ttm:
+        last = series.iloc[-4:]
+        return (float(last.sum()) if len(last) == 4 and last.notna().all() else np.nan), series.index[-1]
+    return float(series.iloc[-1]), series.index[-1]
+
+
+def free_cash_flows(statements):
+    """
+    年度自由現金流（由舊到新）：優先使用 Free Cash Flow 科目，沒有時以營業現金流加上資本支出（負值）計算。
+    """
+    cashflow = statements.get("cashflow")
+    fcf = _item(cashflow, ["Free Cash Flow"])
+    if fcf.notna().any():
+        return fcf.dropna()
+    operating = _item(cashflow, ["Operating Cash Flow", "Cash Flow From Continuing Operating Activities"])
+    capex = _item(cashflow, ["Capital Expenditure"])
+    return (operating + capex).dropna()
+
+
+def map_statements(statements, period="annual", fcf_years=5):
+    """
+    將財報對應到欄位，回傳 ({欄位: 數值}, 期末日期)。period 為 "annual"（最近年度）或 "ttm"（近四季合計，資產負債取最近一季）；
+    fcf1～fcf{fcf_years} 依序帶入最近 fcf_years 個年度的自由現金流（由舊到新）。取不到的欄位不列入。
+    """
+    if period not in STATEMENT_PERIODS:
+        raise ValueError(f"未知的財報期間：{period}")
+    ttm = period == "ttm"
+    values, period_end = {}, None
+    for key, (statement, *names) in STATEMENT_FIELDS.items():
+        name = f"quarterly_{statement}" if ttm else statement
+        value, end = _latest(_item(statements.get(name), names), ttm and statement in _FLOW_STATEMENTS)
+        if np.isfinite(value):
+            values[key] = value
+            period_end = end if period_end is None or (end is not None and end > period_end) else period_end
+
+    # 稅後營運利潤：EBIT ×（1 − 有效稅率）
+    income = statements.get("quarterly_income" if ttm else "income")
+    ebit, _ = _latest(_item(income, ["EBIT", "Operating Income"]), ttm)
+    tax_rate, _ = _latest(_item(income, ["Tax Rate For Calcs"]), False)
+    if np.isfinite(ebit):
+        values["nopat"] = ebit * (1 - (tax_rate if np.isfinite(tax_rate) else 0.0))
+    if values.get("equity") and values.get("shares"):
+        values["bvps"] = values["equity"] / values["shares"]
+
+    fcf = free_cash_flows(statements).to_numpy(dtype=float)[-fcf_years:]
+    for i, x in enumerate(fcf, start=1):
+        values[f"fcf{i}"] = float(x)
+    return values, period_end
+
+
+def load_ticker_fields(ticker, period="annual", fcf_years=5):
+    """
+    以 ticker 的財報與股票資訊取得專業版欄位，回傳 ({欄位: 數值}, 期末日期)。財報對應的結果依 (ticker, 期間, FCF 年數) 快取；
+    股價、股利（及財報沒有的股數）取自 get_stock_info 的快取，每次呼叫時合併。
+    """
+    cache = market_data.get_data_caches()["statements"]
+    key = ("fields", ticker, period, fcf_years)
+    cached = cache.get(key)
+    if cached is None:
+        statements = get_financial_statements(ticker)
+        cached = map_statements(statements, period, fcf_years)
+        if cached[0]:
+            cache.set(key, cached)
+    values, period_end = dict(cached[0]), cached[1]
+
+    try:
+        info = market_data.get_stock_info(ticker) or {}
+    except Exception:
+        # 股價取得失敗時仍回傳財報對應的欄位
+        info = {}
+    for key, field in (("stock_price", "currentPrice"), ("dividend_per_share", "dividendRate"), ("shares", "sharesOutstanding")):
+        value = info.get(field)
+        if key not in values and isinstance(value, (int, float)) and np.isfinite(value):
+            values[key] = float(value)
+    if "eps" not in values and isinstance(info.get("trailingEps"), (int, float)):
+        values["eps"] = float(info["trailingEps"])
+    return values, period_end